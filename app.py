@@ -3,6 +3,8 @@ import os
 from PIL import Image
 from streamlit_option_menu import option_menu
 from tabs import TABS
+from utils.api import get_data
+from utils.frames import memory_report
 
 # --- Page Configuration ---
 assets_dir = os.path.join(os.path.dirname(__file__), "assets")
@@ -24,6 +26,21 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_data(ttl=60)
+def fetch_warehouses():
+    return get_data("warehouse")
+
+def select_warehouse():
+    """Sidebar selector that scopes every tab to one distribution center."""
+    warehouses = [w for w in (fetch_warehouses() or []) if w.get('warehouse_id')]
+    names = {w['warehouse_id']: w.get('name', w['warehouse_id']) for w in warehouses}
+    st.selectbox(
+        "Distribution Center",
+        [None] + list(names),
+        format_func=lambda wid: names.get(wid, wid) if wid else "All",
+        key="warehouse_id",
+    )
+
 def main():
     """Main function to run the Streamlit app."""
     with st.sidebar:
@@ -42,10 +59,14 @@ def main():
             default_index=0,
         )
         
+        st.markdown("---")
+        select_warehouse()
+
         st.markdown("---")
         st.markdown("### User: `admin`")
 
     # Display the selected tab's content
+    st.session_state["frame_memory"] = {}
     if selected_tab in TABS:
         st.markdown(f"<h1 class='main-header'>{selected_tab}</h1>", unsafe_allow_html=True)
         # Call the app function from the TABS dictionary
@@ -53,5 +74,9 @@ def main():
     else:
         st.error("The selected tab could not be found.")
 
+    # Reported after the tab ran so it covers the frames this render built.
+    with st.sidebar:
+        memory_report()
+
 if __name__ == "__main__":
     main()
@@ -1,15 +1,46 @@
 import os
 import datetime
-from fastapi import FastAPI, HTTPException, Depends
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from bson import ObjectId
 from dotenv import load_dotenv
 from typing import List, Optional
+from services import metrics
+from services.slow_queries import SlowQueryListener
+from services.profiling import ProfileStore, SamplingProfiler, follow_sync_endpoints
+from services.admission import AdmissionController, Rejected
+from services import rollups
+from services import low_stock
+from services import indexes
+from services.bins import parse_bin_locations
+from services import slotting
+from services import waves
+from services.eta import EtaRefresher, load_speeds
+from services.leases import Lease
+from services import assignment
+from services import tracking
+from services.snapshots import SnapshotStore
+from services import reservations
+from services.reservations import InsufficientStock
+from services import events
+from services.events import EventLog
+from services import bootstrap
+from services.repositories import open_repository
+import pandas as pd
 
 # --- Environment and DB Setup ---
 load_dotenv()
@@ -18,11 +49,112 @@ MONGODB_DB = os.getenv("MONGODB_DB", "walmart")
 SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_EXPLAINS_PER_MINUTE = int(os.getenv("SLOW_QUERY_EXPLAINS_PER_MINUTE", "6"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))
+ADMISSION_RULES = os.getenv("ADMISSION_RULES", "")
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ETA_REFRESH_SECONDS = float(os.getenv("ETA_REFRESH_SECONDS", "60"))
+ETA_REGION_SPEEDS = os.getenv("ETA_REGION_SPEEDS", "")
+PING_TTL_HOURS = float(os.getenv("PING_TTL_HOURS", "72"))
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "30"))
+SNAPSHOT_IDLE_SECONDS = float(os.getenv("SNAPSHOT_IDLE_SECONDS", "600"))
+# Multi-document transactions need a replica set; without them carts are compensated.
+ORDER_TRANSACTIONS = os.getenv("ORDER_TRANSACTIONS", "0") == "1"
+EVENT_FLUSH_SECONDS = float(os.getenv("EVENT_FLUSH_SECONDS", "1"))
+EVENT_LOG_MB = int(os.getenv("EVENT_LOG_MB", "256"))
+# Per worker: each uvicorn/gunicorn worker opens its own pool of up to MONGODB_MAX_POOL_SIZE connections.
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+MONGODB_TIMEOUT_MS = int(os.getenv("MONGODB_TIMEOUT_MS", "5000"))
+API_VERSION = "1.0.0"
+BOOTSTRAP_LEASE_SECONDS = float(os.getenv("BOOTSTRAP_LEASE_SECONDS", "300"))
+# The startup steps run once per value; set it to a release or commit id to rerun them on every deploy.
+BOOTSTRAP_VERSION = os.getenv("BOOTSTRAP_VERSION", API_VERSION)
+# Singleton background jobs hand over to another worker after this many missed cycles.
+JOB_LEASE_CYCLES = 3
+# Per worker: inventory and warehouse reads may miss other workers' writes for up to the TTL.
+REPOSITORY_CACHE_ENTRIES = int(os.getenv("REPOSITORY_CACHE_ENTRIES", "10000"))
+REPOSITORY_CACHE_TTL = float(os.getenv("REPOSITORY_CACHE_TTL", "2"))
 
-client = MongoClient(MONGODB_URI)
-db = client[MONGODB_DB]
+slow_query_listener = SlowQueryListener(
+    threshold_ms=SLOW_QUERY_MS, explains_per_minute=SLOW_QUERY_EXPLAINS_PER_MINUTE
+)
+# Created by the lifespan handler in each worker, after any fork; nothing
+# touches MongoDB at import time.
+client = None
+db = None
+eta_refresher = None
+event_log = None
+# Keyed reads and writes of users, inventory and warehouses go through these
+# (cached) repositories; aggregations still use db directly.
+users = None
+inventory = None
+warehouses = None
+ready = threading.Event()
+shutting_down = threading.Event()
+
+def connect():
+    return MongoClient(
+        MONGODB_URI,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        readPreference=MONGODB_READ_PREFERENCE,
+        serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS,
+        event_listeners=[metrics.CommandMetricsListener(), slow_query_listener],
+    )
 
-app = FastAPI(title="Walmart Logistics API", version="1.0.0")
+def run_bootstrap():
+    """Runs (or waits for another worker to finish) the one-time startup steps, then marks the worker ready."""
+    steps = [
+        ("indexes", ensure_indexes),
+        ("admin user", ensure_admin_user),
+        ("low-stock view", rebuild_low_stock),
+        ("status counts", seed_status_counts),
+    ]
+    if bootstrap.run(db, steps, shutting_down, BOOTSTRAP_VERSION, BOOTSTRAP_LEASE_SECONDS):
+        ready.set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, eta_refresher, event_log, users, inventory, warehouses
+    client = connect()
+    slow_query_listener.bind(client)
+    db = client[MONGODB_DB]
+    # Users are read uncached, so disabling an account takes effect at once in every worker.
+    users = open_repository(db, "users", "username", cache_entries=0)
+    inventory, warehouses = (
+        open_repository(db, collection, key, REPOSITORY_CACHE_ENTRIES, REPOSITORY_CACHE_TTL)
+        for collection, key in (("inventory", ("warehouse_id", "sku")), ("warehouse", "warehouse_id"))
+    )
+    eta_refresher = EtaRefresher(db.deliveries, ETA_REFRESH_SECONDS, load_speeds(ETA_REGION_SPEEDS),
+                                 Lease(db, "eta-refresh", JOB_LEASE_CYCLES * ETA_REFRESH_SECONDS))
+    snapshots.bind(db.snapshots, Lease(db, "snapshot-refresh", JOB_LEASE_CYCLES * SNAPSHOT_REFRESH_SECONDS))
+    event_log = EventLog(db, EVENT_FLUSH_SECONDS,
+                         lease=Lease(db, "event-compaction", JOB_LEASE_CYCLES * max(EVENT_FLUSH_SECONDS, 1)))
+    ready.clear()
+    shutting_down.clear()
+    # The worker serves requests (and answers /healthz) while the bootstrap runs.
+    startup = threading.Thread(target=run_bootstrap, name="bootstrap", daemon=True)
+    startup.start()
+    event_log.start()
+    eta_refresher.start()
+    snapshots.start()
+    try:
+        yield
+    finally:
+        shutting_down.set()
+        startup.join(timeout=5)
+        snapshots.stop()
+        eta_refresher.stop()
+        event_log.stop()
+        client.close()
+
+app = FastAPI(title="Walmart Logistics API", version=API_VERSION, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +163,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+admission = AdmissionController.from_env(ADMISSION_RULES, ADMISSION_MAX_IN_FLIGHT)
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    try:
+        return await admission(request, call_next)
+    except Rejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    return await metrics.record_request(app, request, call_next)
+
 # --- Pydantic Models ---
 class Order(BaseModel):
     order_id: str
@@ -39,7 +188,13 @@ class Order(BaseModel):
     quantity: int
     delivery_address: str
     status: str
-    order_date: str
+    order_date: datetime.datetime
+    warehouse_id: Optional[str] = None
+
+class OrderBatch(BaseModel):
+    orders: List[Order]
+    # True: a cart, placed only if every line can be reserved. False: a bulk import, placed line by line.
+    all_or_nothing: bool = True
 
 class InventoryItem(BaseModel):
     sku: str
@@ -48,24 +203,59 @@ class InventoryItem(BaseModel):
     quantity: int
     bin_location: str
     min_stock_level: int
+    warehouse_id: Optional[str] = None
+
+class StockAdjustment(BaseModel):
+    delta: int = 0
 
 class Delivery(BaseModel):
     delivery_id: str
     agent_id: str
     region: str
     status: str
-    delivery_date: str
-    eta: str
+    delivery_date: datetime.datetime
+    eta: datetime.datetime
     latitude: float
     longitude: float
+    warehouse_id: Optional[str] = None
+    # Last known position of the agent, used to recompute the ETA.
+    last_latitude: Optional[float] = None
+    last_longitude: Optional[float] = None
 
 class Warehouse(BaseModel):
+    warehouse_id: Optional[str] = None
     name: str
     address: str
     capacity: int
     manager: str
     contact: str
 
+class Agent(BaseModel):
+    agent_id: str
+    name: str
+    region: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    max_load: int = assignment.DEFAULT_MAX_LOAD
+    active: bool = True
+    warehouse_id: Optional[str] = None
+    last_seen: Optional[datetime.datetime] = None
+
+class Ping(BaseModel):
+    agent_id: str
+    latitude: float
+    longitude: float
+    ts: Optional[datetime.datetime] = None
+    delivery_id: Optional[str] = None
+    speed: Optional[float] = None
+
+class PingBatch(BaseModel):
+    pings: List[Ping]
+
+class AssignmentRequest(BaseModel):
+    warehouse_id: Optional[str] = None
+    limit: int = 10000
+
 class User(BaseModel):
     username: str
     full_name: Optional[str] = None
@@ -93,7 +283,7 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 def get_user(username: str):
-    user = db.users.find_one({"username": username})
+    user = users.get(username)
     if user:
         return UserInDB(**user)
     return None
@@ -134,6 +324,52 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+# --- Request Profiling ---
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+
+def profiling_authorized(request: Request):
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+    user = get_user(username) if username else None
+    return user is not None and not user.disabled
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    # Opt in per request with "X-Profile: 1" or "?profile=1" (authenticated callers only),
+    # or sample a share of all requests with PROFILE_SAMPLE_RATE.
+    requested = request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"
+    sampled = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    if not sampled and not (requested and profiling_authorized(request)):
+        return await call_next(request)
+
+    # Async handlers, validation and serialization run on the event loop thread; def
+    # handlers run in the threadpool and are followed there (see follow_sync_endpoints).
+    profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000).start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    profile_id = profile_store.save(profiler)
+    response.headers["X-Profile-Id"] = profile_id
+    response.headers["X-Profile-Duration"] = f"{profiler.duration:.6f}"
+    return response
+
+@app.get("/api/profiles", tags=["Monitoring"])
+async def list_profiles(current_user: User = Depends(get_current_active_user)):
+    return profile_store.list()
+
+@app.get("/api/profiles/{profile_id}", response_class=PlainTextResponse, tags=["Monitoring"])
+async def get_profile(profile_id: str, current_user: User = Depends(get_current_active_user)):
+    profile = profile_store.load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile)
+
 # --- Auth Endpoints ---
 @app.post("/api/login", response_model=Token, tags=["Authentication"])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -151,120 +387,840 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 # --- Utility ---
-def serialize_doc(doc):
-    doc["_id"] = str(doc["_id"])
-    return doc
+ORDER_DATE_FIELDS = ("order_date",)
+DELIVERY_DATE_FIELDS = ("delivery_date", "eta")
+
+def parse_date_fields(patch: dict, fields):
+    """Converts ISO strings in a raw patch to datetimes so they are stored as BSON dates."""
+    for field in fields:
+        if isinstance(patch.get(field), str):
+            try:
+                patch[field] = datetime.datetime.fromisoformat(patch[field].replace("Z", "+00:00"))
+            except ValueError:
+                raise HTTPException(status_code=422, detail=f"Invalid ISO date for '{field}'")
+    return patch
+
+def scoped(query: dict, warehouse_id: Optional[str]):
+    """Restricts a query to one warehouse when a warehouse_id is given."""
+    if warehouse_id:
+        query["warehouse_id"] = warehouse_id
+    return query
+
+def date_range(field: str, start: Optional[datetime.datetime], end: Optional[datetime.datetime]):
+    """Builds an (indexable) half-open [start, end) filter on a date field."""
+    if not start and not end:
+        return {}
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    return {field: bounds}
 
 # --- Orders Endpoints ---
 @app.get("/api/orders", response_model=List[Order], tags=["Orders"])
-async def get_orders():
-    return [order for order in db.orders.find()]
+def get_orders(
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    warehouse_id: Optional[str] = None,
+):
+    return [order for order in db.orders.find(scoped(date_range("order_date", start, end), warehouse_id))]
+
+ORDER_ID_QUERY = re.compile(r"^ORD-[\w-]*$", re.IGNORECASE)
+
+@app.get("/api/orders/search", tags=["Orders"])
+async def search_orders(q: str, page: int = 1, page_size: int = 20):
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query must not be empty")
+    page, page_size = max(page, 1), min(max(page_size, 1), 100)
+    if ORDER_ID_QUERY.match(q):
+        # Order ids are matched by prefix on the order_id index.
+        cursor = db.orders.find(
+            {"order_id": {"$regex": "^" + re.escape(q.upper())}}, {"_id": 0}
+        ).sort("order_id", 1)
+    else:
+        cursor = db.orders.find(
+            {"$text": {"$search": q}}, {"_id": 0, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})])
+    # Fetch one extra row to tell whether another page exists without counting every match.
+    results = list(cursor.skip((page - 1) * page_size).limit(page_size + 1))
+    return {
+        "results": results[:page_size],
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(results) > page_size,
+    }
+
+@app.get("/api/orders/trends", tags=["Orders"])
+async def get_order_trends(
+    granularity: str = "day",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    status: Optional[str] = None,
+    product_id: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+):
+    if granularity not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="granularity must be 'day' or 'week'")
+    series = rollups.series(
+        db, granularity, start, end, status.lower() if status else None, product_id, warehouse_id
+    )
+    return {"granularity": granularity, "series": series}
+
+@app.post("/api/orders/trends/backfill", status_code=204, tags=["Orders"])
+async def backfill_order_trends(current_user: User = Depends(get_current_active_user)):
+    rollups.backfill(db)
+    return
+
+@app.get("/api/orders/waves", tags=["Orders"])
+def get_order_waves(
+    warehouse_id: Optional[str] = None,
+    cart_capacity: int = waves.DEFAULT_CART_CAPACITY,
+    max_orders: int = waves.DEFAULT_MAX_ORDERS,
+    limit: int = 5000,
+):
+    """Groups the oldest pending orders into pick waves with sequenced bin visits."""
+    if cart_capacity < 1 or max_orders < 1:
+        raise HTTPException(status_code=400, detail="cart_capacity and max_orders must be positive")
+    pending = pd.DataFrame(
+        list(db.orders.find(scoped({"status": "pending"}, warehouse_id),
+                            {"_id": 0, "order_id": 1, "product_id": 1, "quantity": 1, "warehouse_id": 1})
+             .sort("order_date", 1).limit(max(limit, 1))),
+        columns=["order_id", "product_id", "quantity", "warehouse_id"],
+    )
+    bins = pd.DataFrame(
+        list(db.inventory.find(scoped({"sku": {"$in": pending["product_id"].unique().tolist()}}, warehouse_id),
+                               {"_id": 0, "sku": 1, "bin_location": 1, "warehouse_id": 1})),
+        columns=["sku", "bin_location", "warehouse_id"],
+    ).drop_duplicates(["warehouse_id", "sku"])
+    lines = pending.merge(bins, left_on=["warehouse_id", "product_id"], right_on=["warehouse_id", "sku"], how="left")
+    located = lines["bin_location"].notna()
+    return {
+        "orders": int(located.sum()),
+        "waves": waves.plan_waves(lines[located], cart_capacity, max_orders),
+        # Orders whose SKU has no bin in their warehouse cannot be picked yet.
+        "unlocated": lines.loc[~located, "order_id"].tolist(),
+    }
+
+@app.post("/api/orders/waves/dispatch", tags=["Orders"])
+async def dispatch_wave(payload: dict):
+    """Marks the pending orders of a wave as shipped."""
+    dispatched, transitions = [], []
+    for order_id in payload.get("order_ids", []):
+        before = db.orders.find_one_and_update(
+            {"order_id": order_id, "status": "pending"}, {"$set": {"status": "shipped"}}
+        )
+        if before is not None:
+            rollups.apply_order_change(db, before, {**before, "status": "shipped"})
+            transitions.append(events.transition("order", before, {**before, "status": "shipped"}, {"status": "shipped"}))
+            dispatched.append(order_id)
+    event_log.extend(transitions)
+    return {"dispatched": dispatched}
+
+def resolve_warehouses(orders: List[dict]):
+    """
+    Fills in the warehouse of orders placed without one from the single
+    warehouse that stocks their SKU. Unknown SKUs are left alone; a SKU stocked
+    in several warehouses is ambiguous and rejected with 422.
+    """
+    skus = {order["product_id"] for order in orders if not order.get("warehouse_id")}
+    if not skus:
+        return orders
+    stocked_in = {}
+    for doc in db.inventory.find({"sku": {"$in": list(skus)}}, {"_id": 0, "sku": 1, "warehouse_id": 1}):
+        stocked_in.setdefault(doc["sku"], set()).add(doc.get("warehouse_id"))
+    for order in orders:
+        if order.get("warehouse_id"):
+            continue
+        warehouse_ids = stocked_in.get(order["product_id"], set())
+        if len(warehouse_ids) > 1:
+            raise HTTPException(status_code=422, detail=(
+                f"SKU {order['product_id']} is stocked in several warehouses; pass warehouse_id"))
+        if warehouse_ids:
+            order["warehouse_id"] = next(iter(warehouse_ids))
+    return orders
 
 @app.post("/api/orders", response_model=Order, status_code=201, tags=["Orders"])
 async def add_order(order: Order):
-    order_dict = order.dict()
+    order_dict = resolve_warehouses([order.dict()])[0]
     db.orders.insert_one(order_dict)
+    rollups.apply_order(db, order_dict)
+    event_log.record("order", None, order_dict, order_dict)
     return order
 
+# --- Order Placement ---
+# Placing an order reserves its stock: see services/reservations.py. Placed
+# orders are stored with reserved=True; the reservation is consumed when the
+# order ships and returned to stock when it is cancelled or deleted before that.
+RELEASED_STATUSES = ("shipped", "delivered", "cancelled")
+
+def stock_error(e: InsufficientStock):
+    if e.available is None:
+        return HTTPException(status_code=404, detail=f"SKU {e.sku} not found")
+    return HTTPException(status_code=409, detail=str(e))
+
+def record_placed(orders: List[dict], stock_docs):
+    """Updates the derived views once orders are stored and their stock is reserved."""
+    rollups.apply_orders(db, orders)
+    event_log.extend([events.transition("order", None, order, order) for order in orders])
+    for doc in stock_docs:
+        sync_low_stock((doc.get("warehouse_id"), doc["sku"]), doc)
+
+def reserved_keys(orders: List[dict]):
+    # Reservations write db.inventory directly; evict the items from the repository cache.
+    return [(order.get("warehouse_id"), order["product_id"]) for order in orders]
+
+def store_reserved(orders: List[dict]):
+    """Inserts orders whose stock is reserved; if that fails, none of them stays stored or reserved."""
+    for order in orders:
+        order["reserved"] = True
+    try:
+        db.orders.insert_many(orders)
+    except Exception:
+        # insert_many stamps every document with its _id before sending, so the
+        # orders that were written before the failure can be removed exactly.
+        db.orders.delete_many({"_id": {"$in": [order["_id"] for order in orders if "_id" in order]}})
+        reservations.give_back(db.inventory, reservations.demand(orders))
+        raise
+
+def release_reservation(order: dict):
+    """Returns the stock of an order that still holds its reservation."""
+    if not order.get("reserved") or order.get("status") in RELEASED_STATUSES:
+        return
+    try:
+        docs = reservations.give_back(db.inventory, reservations.demand([order]))
+    finally:
+        inventory.invalidate(*reserved_keys([order]))
+    for doc in docs:
+        if doc is not None:
+            sync_low_stock((doc.get("warehouse_id"), doc["sku"]), doc)
+
+def place_cart(orders: List[dict]):
+    """Reserves and stores every order or none; returns the updated inventory documents."""
+    try:
+        return reserve_and_store_cart(orders)
+    finally:
+        inventory.invalidate(*reserved_keys(orders))
+
+def reserve_and_store_cart(orders: List[dict]):
+    if ORDER_TRANSACTIONS:
+        def transaction(session):
+            docs = reservations.reserve_all(db.inventory, orders, session)
+            for order in orders:
+                order["reserved"] = True
+            db.orders.insert_many(orders, session=session)
+            return docs
+        with client.start_session() as session:
+            docs = session.with_transaction(transaction)
+    else:
+        docs = reservations.reserve_all(db.inventory, orders)
+        store_reserved(orders)
+    record_placed(orders, docs.values())
+    return docs
+
+@app.post("/api/orders/place", response_model=Order, status_code=201, tags=["Orders"])
+def place_order(order: Order):
+    """Places one order, reserving its quantity from inventory."""
+    order_dict = resolve_warehouses([order.dict()])[0]
+    try:
+        place_cart([order_dict])
+    except InsufficientStock as e:
+        raise stock_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return order_dict
+
+@app.post("/api/orders/batch", tags=["Orders"])
+def place_order_batch(batch: OrderBatch):
+    """
+    Places many orders. A cart (all_or_nothing) fails with 409 if any line is
+    short; otherwise every order that fits is placed and the rest are reported.
+    """
+    orders = resolve_warehouses([order.dict() for order in batch.orders])
+    try:
+        if batch.all_or_nothing:
+            place_cart(orders)
+            return {"placed": [o["order_id"] for o in orders], "rejected": []}
+        try:
+            accepted, rejected, docs = reservations.reserve_each(db.inventory, orders)
+        finally:
+            inventory.invalidate(*reserved_keys(orders))
+    except InsufficientStock as e:
+        raise stock_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    placed = [orders[i] for i in accepted]
+    if placed:
+        store_reserved(placed)
+        record_placed(placed, docs.values())
+    return {
+        "placed": [o["order_id"] for o in placed],
+        "rejected": [
+            {"order_id": orders[i]["order_id"], "reason": "unknown SKU" if e.available is None else "insufficient stock"}
+            for i, e in sorted(rejected.items())
+        ],
+    }
+
 @app.patch("/api/orders/{order_id}", status_code=204, tags=["Orders"])
 async def patch_order(order_id: str, patch: dict):
     if "status" in patch:
         patch["status"] = patch["status"].lower()
-    result = db.orders.update_one({"order_id": order_id}, {"$set": patch})
-    if result.matched_count == 0:
+    parse_date_fields(patch, ORDER_DATE_FIELDS)
+    cancelling = patch.get("status") == "cancelled"
+    # Cleared in the same update, so only the request that cancels the order returns its stock.
+    update = dict(patch, reserved=False) if cancelling else patch
+    before = db.orders.find_one_and_update({"order_id": order_id}, {"$set": update})
+    if before is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    if cancelling:
+        release_reservation(before)
+    rollups.apply_order_change(db, before, {**before, **patch})
+    event_log.record("order", before, {**before, **patch}, patch)
     return
 
 @app.delete("/api/orders/{order_id}", status_code=204, tags=["Orders"])
 async def delete_order(order_id: str):
-    result = db.orders.delete_one({"order_id": order_id})
-    if result.deleted_count == 0:
+    deleted = db.orders.find_one_and_delete({"order_id": order_id})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    release_reservation(deleted)
+    rollups.apply_order(db, deleted, -1)
+    event_log.record("order", deleted, None)
     return
 
+# --- Low Stock View ---
+# Every inventory write updates only the low_stock entry of the item it touched.
+def sync_low_stock(key: tuple, item: Optional[dict]):
+    low_stock.sync(db, key, item)
+
+def rebuild_low_stock():
+    """Recomputes the whole low-stock view; used at startup and after bulk imports."""
+    low_stock.rebuild(db)
+
 # --- Inventory Endpoints ---
 @app.get("/api/inventory", response_model=List[InventoryItem], tags=["Inventory"])
-async def get_inventory():
-    return [item for item in db.inventory.find()]
+def get_inventory(warehouse_id: Optional[str] = None):
+    return [item for item in db.inventory.find(scoped({}, warehouse_id))]
+
+@app.get("/api/inventory/low_stock", tags=["Inventory"])
+async def get_low_stock(limit: int = 100, warehouse_id: Optional[str] = None):
+    query = scoped({}, warehouse_id)
+    items = list(db.low_stock.find(query, {"_id": 0}).sort("shortfall", -1).limit(limit))
+    by_category = {
+        row["_id"]: row["count"]
+        for row in db.low_stock.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        ])
+    }
+    return {"count": sum(by_category.values()), "by_category": by_category, "items": items}
+
+def inventory_key(sku: str, warehouse_id: Optional[str]):
+    """
+    (warehouse_id, sku) of an inventory item. Without a warehouse_id the SKU
+    must be stocked in exactly one warehouse.
+    """
+    if warehouse_id:
+        return warehouse_id, sku
+    found = list(db.inventory.find({"sku": sku}, {"_id": 0, "warehouse_id": 1}).limit(2))
+    if not found:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    if len(found) > 1:
+        raise HTTPException(status_code=422, detail=f"SKU {sku} is stocked in several warehouses; pass warehouse_id")
+    return found[0].get("warehouse_id"), sku
+
+@app.get("/api/inventory/{sku}", response_model=InventoryItem, tags=["Inventory"])
+def get_inventory_item(sku: str, warehouse_id: Optional[str] = None):
+    item = inventory.get(inventory_key(sku, warehouse_id))
+    if item is None:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    return item
+
+@app.post("/api/inventory/low_stock/rebuild", status_code=204, tags=["Inventory"])
+async def post_rebuild_low_stock(current_user: User = Depends(get_current_active_user)):
+    rebuild_low_stock()
+    return
 
 @app.post("/api/inventory", response_model=InventoryItem, status_code=201, tags=["Inventory"])
 async def add_inventory(item: InventoryItem):
     item_dict = item.dict()
-    db.inventory.insert_one(item_dict)
+    try:
+        inventory.insert(item_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="SKU already stocked in this warehouse")
+    sync_low_stock((item.warehouse_id, item.sku), item_dict)
     return item
 
 @app.patch("/api/inventory/{sku}", status_code=204, tags=["Inventory"])
-async def patch_inventory(sku: str, patch: dict):
-    result = db.inventory.update_one({"sku": sku}, {"$set": patch})
-    if result.matched_count == 0:
+def patch_inventory(sku: str, patch: dict, warehouse_id: Optional[str] = None):
+    key = inventory_key(sku, warehouse_id)
+    updated = inventory.update(key, patch)
+    if updated is None:
         raise HTTPException(status_code=404, detail="SKU not found")
+    sync_low_stock(key, updated)
     return
 
+@app.post("/api/inventory/{sku}/adjust", response_model=InventoryItem, tags=["Inventory"])
+def adjust_inventory(sku: str, payload: StockAdjustment, warehouse_id: Optional[str] = None):
+    key = inventory_key(sku, warehouse_id)
+    delta = payload.delta
+    # The minimum makes the increment conditional, so concurrent adjustments cannot go negative.
+    updated = inventory.increment(key, "quantity", delta, minimum=0)
+    if updated is None:
+        if not inventory.exists(key):
+            raise HTTPException(status_code=404, detail="SKU not found")
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+    sync_low_stock(key, updated)
+    return updated
+
 @app.delete("/api/inventory/{sku}", status_code=204, tags=["Inventory"])
-async def delete_inventory(sku: str):
-    result = db.inventory.delete_one({"sku": sku})
-    if result.deleted_count == 0:
+def delete_inventory(sku: str, warehouse_id: Optional[str] = None):
+    key = inventory_key(sku, warehouse_id)
+    if inventory.delete(key) is None:
         raise HTTPException(status_code=404, detail="SKU not found")
+    sync_low_stock(key, None)
     return
 
 # --- Deliveries Endpoints ---
 @app.get("/api/deliveries", response_model=List[Delivery], tags=["Deliveries"])
-async def get_deliveries():
-    return [delivery for delivery in db.deliveries.find()]
+def get_deliveries(
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    status: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+):
+    query = scoped(date_range("delivery_date", start, end), warehouse_id)
+    if status:
+        query["status"] = status.lower()
+    return [delivery for delivery in db.deliveries.find(query)]
 
 @app.post("/api/deliveries", response_model=Delivery, status_code=201, tags=["Deliveries"])
 async def add_delivery(delivery: Delivery):
     delivery_dict = delivery.dict()
     db.deliveries.insert_one(delivery_dict)
+    event_log.record("delivery", None, delivery_dict, delivery_dict)
     return delivery
 
+@app.post("/api/deliveries/etas/refresh", tags=["Deliveries"])
+def refresh_delivery_etas(current_user: User = Depends(get_current_active_user)):
+    """Recomputes every in-transit ETA now instead of waiting for the next cycle."""
+    return eta_refresher.run_once()
+
+ASSIGNABLE_STATUSES = ["pending", "rescheduled"]
+
+@app.post("/api/deliveries/assign", tags=["Deliveries"])
+def assign_deliveries(payload: AssignmentRequest):
+    """
+    Assigns pending and rescheduled deliveries to the nearest active agents in
+    their region, keeping each agent's in-transit load under its max_load.
+    """
+    warehouse_id = payload.warehouse_id
+    limit = max(payload.limit, 1)
+    agents = list(db.agents.find(
+        scoped({"active": {"$ne": False}, "latitude": {"$ne": None}, "longitude": {"$ne": None}}, warehouse_id),
+        {"_id": 0, "agent_id": 1, "region": 1, "latitude": 1, "longitude": 1, "max_load": 1},
+    ))
+    deliveries = list(db.deliveries.find(
+        scoped({"status": {"$in": ASSIGNABLE_STATUSES}}, warehouse_id),
+        {"_id": 1, "delivery_id": 1, "agent_id": 1, "region": 1, "latitude": 1, "longitude": 1},
+    ).limit(limit))
+    load = {row["_id"]: row["count"] for row in db.deliveries.aggregate([
+        {"$match": {"status": "in-transit", "agent_id": {"$in": [a["agent_id"] for a in agents]}}},
+        {"$group": {"_id": "$agent_id", "count": {"$sum": 1}}},
+    ])}
+    capacity = [max(a.get("max_load", assignment.DEFAULT_MAX_LOAD) - load.get(a["agent_id"], 0), 0) for a in agents]
+
+    chosen = assignment.assign(
+        [d["latitude"] for d in deliveries], [d["longitude"] for d in deliveries], [d.get("region") for d in deliveries],
+        [a["latitude"] for a in agents], [a["longitude"] for a in agents], [a.get("region") for a in agents],
+        capacity,
+    )
+    updates, unassigned = [], []
+    for delivery, agent_index in zip(deliveries, chosen.tolist()):
+        if agent_index < 0:
+            unassigned.append(delivery["delivery_id"])
+        elif agents[agent_index]["agent_id"] != delivery.get("agent_id"):
+            updates.append(UpdateOne({"_id": delivery["_id"]}, {"$set": {"agent_id": agents[agent_index]["agent_id"]}}))
+    if updates:
+        db.deliveries.bulk_write(updates, ordered=False)
+    return {
+        "deliveries": len(deliveries),
+        "assigned": len(deliveries) - len(unassigned),
+        "changed": len(updates),
+        "unassigned": unassigned,
+    }
+
 @app.patch("/api/deliveries/{delivery_id}", status_code=204, tags=["Deliveries"])
 async def patch_delivery(delivery_id: str, patch: dict):
     if "status" in patch:
         patch["status"] = patch["status"].lower()
-    result = db.deliveries.update_one({"delivery_id": delivery_id}, {"$set": patch})
-    if result.matched_count == 0:
+    parse_date_fields(patch, DELIVERY_DATE_FIELDS)
+    before = db.deliveries.find_one_and_update({"delivery_id": delivery_id}, {"$set": patch})
+    if before is None:
         raise HTTPException(status_code=404, detail="Delivery not found")
+    event_log.record("delivery", before, {**before, **patch}, patch)
     return
 
 @app.delete("/api/deliveries/{delivery_id}", status_code=204, tags=["Deliveries"])
 async def delete_delivery(delivery_id: str):
-    result = db.deliveries.delete_one({"delivery_id": delivery_id})
-    if result.deleted_count == 0:
+    deleted = db.deliveries.find_one_and_delete({"delivery_id": delivery_id})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Delivery not found")
+    event_log.record("delivery", deleted, None)
+    return
+
+# --- Agents Endpoints ---
+@app.get("/api/agents", response_model=List[Agent], tags=["Agents"])
+async def get_agents(region: Optional[str] = None, warehouse_id: Optional[str] = None):
+    query = scoped({}, warehouse_id)
+    if region:
+        query["region"] = region
+    return [agent for agent in db.agents.find(query)]
+
+@app.post("/api/agents", response_model=Agent, status_code=201, tags=["Agents"])
+async def add_agent(agent: Agent):
+    db.agents.insert_one(agent.dict())
+    return agent
+
+@app.post("/api/agents/pings", tags=["Agents"])
+def ingest_pings(batch: PingBatch):
+    """Stores a batch of GPS pings and refreshes each agent's latest position."""
+    return {"accepted": tracking.ingest(db, [ping.dict() for ping in batch.pings])}
+
+@app.get("/api/agents/{agent_id}/track", tags=["Agents"])
+def get_agent_track(
+    agent_id: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    tolerance_m: float = 20.0,
+    max_points: int = 2000,
+):
+    """The agent's breadcrumb track (default: last 12 hours), simplified for drawing."""
+    end = end or datetime.datetime.utcnow()
+    start = start or end - datetime.timedelta(hours=12)
+    return tracking.track(db, agent_id, start, end, max(tolerance_m, 0.0), max(max_points, 2))
+
+@app.patch("/api/agents/{agent_id}", status_code=204, tags=["Agents"])
+async def patch_agent(agent_id: str, patch: dict):
+    result = db.agents.update_one({"agent_id": agent_id}, {"$set": patch})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Agent not found")
     return
 
 # --- Warehouse Endpoints ---
 @app.get("/api/warehouse", response_model=List[Warehouse], tags=["Warehouse"])
 async def get_warehouses():
-    return [serialize_doc(w) for w in db.warehouse.find()]
+    return warehouses.find()
+
+@app.get("/api/warehouse/stats", tags=["Warehouse"])
+def get_warehouse_stats(warehouse_id: Optional[str] = None):
+    """Per-warehouse stock, utilization, low-stock and open-order counts."""
+    query = scoped({}, warehouse_id)
+    stock = {
+        row["_id"]: row
+        for row in db.inventory.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$warehouse_id", "total_items": {"$sum": "$quantity"}, "skus": {"$sum": 1}}},
+        ])
+    }
+    low_stock = {
+        row["_id"]: row["count"]
+        for row in db.low_stock.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$warehouse_id", "count": {"$sum": 1}}},
+        ])
+    }
+    pending_orders = {
+        row["_id"]: row["count"]
+        for row in db.orders.aggregate([
+            {"$match": dict(query, status="pending")},
+            {"$group": {"_id": "$warehouse_id", "count": {"$sum": 1}}},
+        ])
+    }
+    stats = []
+    for warehouse in warehouses.find(query):
+        wid = warehouse.get("warehouse_id")
+        totals = stock.get(wid, {})
+        capacity = warehouse.get("capacity", 0)
+        total_items = totals.get("total_items", 0)
+        stats.append({
+            "warehouse_id": wid,
+            "name": warehouse.get("name"),
+            "capacity": capacity,
+            "total_items": total_items,
+            "skus": totals.get("skus", 0),
+            "utilization": round(total_items / capacity * 100, 2) if capacity else 0.0,
+            "low_stock": low_stock.get(wid, 0),
+            "pending_orders": pending_orders.get(wid, 0),
+        })
+    return stats
+
+@app.get("/api/warehouse/heatmap", tags=["Warehouse"])
+def get_warehouse_heatmap(warehouse_id: Optional[str] = None):
+    # Quantities are summed per bin in Mongo, so only one row per bin leaves the database.
+    # Bin labels repeat across distribution centers, so bins are keyed by warehouse too.
+    bins = list(db.inventory.aggregate([
+        {"$match": scoped({}, warehouse_id)},
+        {"$group": {"_id": {"warehouse_id": {"$ifNull": ["$warehouse_id", None]}, "bin": "$bin_location"},
+                    "quantity": {"$sum": "$quantity"}, "skus": {"$sum": 1}}},
+    ]))
+    rows, cols = parse_bin_locations(b["_id"]["bin"] for b in bins)
+    return {
+        "warehouse_ids": [b["_id"]["warehouse_id"] for b in bins],
+        "bins": [b["_id"]["bin"] for b in bins],
+        "rows": rows.tolist(),
+        "cols": cols.tolist(),
+        "quantity": [b["quantity"] for b in bins],
+        "skus": [b["skus"] for b in bins],
+        "shape": [int(rows.max()) + 1, int(cols.max()) + 1] if bins else [0, 0],
+    }
+
+@app.get("/api/warehouse/slotting", tags=["Warehouse"])
+def get_warehouse_slotting(warehouse_id: Optional[str] = None, days: int = 90, limit: int = 100):
+    """ABC classes and proposed bin reassignments from recent pick velocity."""
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=max(days, 1))
+    # Order lines are grouped per SKU in Mongo; only one row per SKU reaches pandas.
+    velocity = pd.DataFrame(list(db.orders.aggregate([
+        {"$match": scoped({"order_date": {"$gte": since}, "status": {"$ne": "cancelled"}}, warehouse_id)},
+        {"$group": {"_id": {"warehouse_id": "$warehouse_id", "sku": "$product_id"},
+                    "picks": {"$sum": 1}, "units": {"$sum": "$quantity"}}},
+        {"$project": {"_id": 0, "warehouse_id": "$_id.warehouse_id", "sku": "$_id.sku",
+                      "picks": 1, "units": 1}},
+    ])), columns=["warehouse_id", "sku", "picks", "units"])
+    inventory = pd.DataFrame(
+        list(db.inventory.find(scoped({}, warehouse_id), {"_id": 0, "warehouse_id": 1, "sku": 1, "bin_location": 1})),
+        columns=["warehouse_id", "sku", "bin_location"],
+    )
+    proposal = slotting.propose_slotting(inventory, velocity)
+    return dict(slotting.summarize(proposal, limit=max(limit, 0)), days=days)
 
 @app.post("/api/warehouse", response_model=Warehouse, status_code=201, tags=["Warehouse"])
 async def add_warehouse(warehouse: Warehouse):
-    warehouse_dict = warehouse.dict()
-    db.warehouse.insert_one(warehouse_dict)
+    if not warehouse.warehouse_id:
+        warehouse.warehouse_id = f"WH-{uuid.uuid4().hex[:8].upper()}"
+    warehouses.insert(warehouse.dict())
     return warehouse
 
 # --- Optimizer Endpoint ---
 @app.post("/api/optimize_route", tags=["Optimizer"])
-async def optimize_route(payload: dict):
+def optimize_route(payload: dict):
     addresses = payload.get("addresses", [])
+    # Optional location the vehicle leaves from (not a stop), e.g. the last stop of the previous batch.
+    start = payload.get("start")
     # Dummy implementation
     route = [(i + 1, addr) for i, addr in enumerate(addresses)]
     return {
         "success": True,
         "route": route,
+        "start": start,
         "total_distance": len(addresses) * 5,
         "total_time": len(addresses) * 5 / 30,
         "co2_emissions": len(addresses) * 5 * 0.12,
         "coordinates": [[40.0 + i * 0.01, -74.0 + i * 0.01] for i in range(len(addresses))]
     }
 
-# --- Create a default user if none exists ---
-if not db.users.find_one({"username": "admin"}):
-    db.users.insert_one({
+# --- Event Log ---
+# Status transitions of orders and deliveries; see services/events.py.
+EVENT_SOURCES = events.SOURCES
+MAX_EVENT_WAIT_SECONDS = 30
+# Long polls wake at once on this worker's flushes and poll for other workers' events.
+EVENT_POLL_SECONDS = 0.5
+
+def serialize_event(event):
+    return dict(event, _id=str(event["_id"]))
+
+@app.get("/api/events", tags=["Events"])
+def get_events(after: int = 0, entity: Optional[str] = None, limit: int = 100, wait: float = 0):
+    """
+    Events after the `after` cursor (a sequence number), oldest first. With
+    `wait`, blocks up to that many seconds for new events when there are none
+    yet (long polling).
+    """
+    limit = max(limit, 1)
+    deadline = time.monotonic() + min(max(wait, 0), MAX_EVENT_WAIT_SECONDS)
+    found, cursor = events.feed(db, after, entity, limit)
+    while not found and time.monotonic() < deadline:
+        event_log.wait(min(EVENT_POLL_SECONDS, deadline - time.monotonic()))
+        found, cursor = events.feed(db, cursor, entity, limit)
+    return {"events": [serialize_event(e) for e in found], "cursor": cursor}
+
+@app.get("/api/events/counts", tags=["Events"])
+def get_event_counts(entity: str, warehouse_id: Optional[str] = None):
+    """Current {status: count} for orders or deliveries, compacted from the event log."""
+    if entity not in EVENT_SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown entity '{entity}'")
+    return {"entity": entity, "warehouse_id": warehouse_id, "counts": events.status_counts(db, entity, warehouse_id)}
+
+@app.post("/api/events/compact", tags=["Events"])
+def compact_events(current_user: User = Depends(get_current_active_user)):
+    """Flushes buffered events and folds everything since the checkpoint into the counters now."""
+    event_log.flush()
+    return {"applied": events.compact(db)}
+
+@app.post("/api/events/counts/rebuild", status_code=204, tags=["Events"])
+def rebuild_event_counts(current_user: User = Depends(get_current_active_user)):
+    """Recounts statuses from the collections; run after bulk loads that bypass the API."""
+    event_log.flush()
+    events.compact(db)
+    events.rebuild_counts(db, EVENT_SOURCES)
+    return
+
+# --- Dashboard Snapshots ---
+# Each builder returns the compact payload a tab needs for its first paint.
+def utc_today():
+    """The current UTC day, the day rollup buckets and stored (naive UTC) dates use."""
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+def orders_snapshot(warehouse_id):
+    today = utc_today().isoformat()
+    since = (utc_today() - datetime.timedelta(days=29)).isoformat()
+    scope = scoped({}, warehouse_id)
+    by_status = {
+        row["_id"]: row["orders"]
+        for row in db[rollups.ROLLUP_COLLECTION].aggregate([
+            {"$match": scope},
+            {"$group": {"_id": "$status", "orders": {"$sum": "$orders"}}},
+        ])
+    }
+    trend = rollups.series(db, "day", since, today, warehouse_id=warehouse_id)
+    top_products = list(db[rollups.ROLLUP_COLLECTION].aggregate([
+        {"$match": dict(scope, day={"$gte": since})},
+        {"$group": {"_id": "$product_id", "orders": {"$sum": "$orders"}, "units": {"$sum": "$units"}}},
+        {"$sort": {"units": -1}},
+        {"$limit": 10},
+        {"$project": {"_id": 0, "product_id": "$_id", "orders": 1, "units": 1}},
+    ]))
+    return {
+        "kpis": {
+            "orders_today": trend[-1]["orders"] if trend and trend[-1]["period"] == today else 0,
+            "pending": by_status.get("pending", 0),
+            "delivered": by_status.get("delivered", 0),
+        },
+        "by_status": by_status,
+        "trend": trend,
+        "top_products": top_products,
+    }
+
+def inventory_snapshot(warehouse_id):
+    by_category = list(db.inventory.aggregate([
+        {"$match": scoped({}, warehouse_id)},
+        {"$group": {"_id": "$category", "skus": {"$sum": 1}, "units": {"$sum": "$quantity"}}},
+        {"$sort": {"skus": -1}},
+    ]))
+    low_stock = scoped({}, warehouse_id)
+    return {
+        "kpis": {
+            "skus": sum(row["skus"] for row in by_category),
+            "units": sum(row["units"] for row in by_category),
+            "low_stock": db.low_stock.count_documents(low_stock),
+        },
+        "by_category": {row["_id"]: row["skus"] for row in by_category},
+        "low_stock_top": list(db.low_stock.find(low_stock, {"_id": 0}).sort("shortfall", -1).limit(10)),
+    }
+
+def deliveries_snapshot(warehouse_id):
+    today = datetime.datetime.combine(utc_today(), datetime.time())
+    scope = scoped({}, warehouse_id)
+    by_status = events.status_counts(db, "delivery", warehouse_id)
+    return {
+        "kpis": {
+            "in_transit": by_status.get("in-transit", 0),
+            "today": db.deliveries.count_documents(
+                dict(scope, **date_range("delivery_date", today, today + datetime.timedelta(days=1)))
+            ),
+            "failed": by_status.get("failed", 0),
+            "late": db.deliveries.count_documents(
+                dict(scope, status="in-transit", **{"$expr": {"$gt": ["$eta", "$delivery_date"]}})
+            ),
+        },
+        "by_status": by_status,
+    }
+
+def warehouse_snapshot(warehouse_id):
+    stats = get_warehouse_stats(warehouse_id)
+    total_items = sum(s["total_items"] for s in stats)
+    capacity = sum(s["capacity"] for s in stats)
+    return {
+        "kpis": {
+            "total_items": total_items,
+            "capacity": capacity,
+            "utilization": round(total_items / capacity * 100, 2) if capacity else 0,
+        },
+        "stats": stats,
+        "heatmap": get_warehouse_heatmap(warehouse_id),
+    }
+
+snapshots = SnapshotStore(
+    {
+        "orders": orders_snapshot,
+        "inventory": inventory_snapshot,
+        "deliveries": deliveries_snapshot,
+        "warehouse": warehouse_snapshot,
+    },
+    interval=SNAPSHOT_REFRESH_SECONDS,
+    idle_timeout=SNAPSHOT_IDLE_SECONDS,
+)
+
+@app.get("/api/snapshots/{page}", tags=["Dashboard"])
+def get_snapshot(page: str, request: Request, warehouse_id: Optional[str] = None):
+    """The latest precomputed payload for a dashboard page; revalidate with If-None-Match."""
+    try:
+        snapshot = snapshots.get(page, warehouse_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown snapshot page")
+    etag = f'"{snapshot["version"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(jsonable_encoder(snapshot), headers={"ETag": etag})
+
+# --- Monitoring Endpoint ---
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the worker is up and serving."""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    """Readiness: MongoDB answers and the startup bootstrap has finished."""
+    checks = {"bootstrap": ready.is_set()}
+    try:
+        client.admin.command("ping")
+        checks["mongodb"] = True
+    except PyMongoError:
+        checks["mongodb"] = False
+    ok = all(checks.values())
+    return JSONResponse(status_code=200 if ok else 503, content={"ready": ok, "checks": checks})
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/slow_queries", tags=["Monitoring"])
+async def get_slow_queries(limit: int = 50, current_user: User = Depends(get_current_active_user)):
+    limit = min(max(limit, 1), slow_query_listener.recent.maxlen)
+    return list(slow_query_listener.recent)[-limit:][::-1]
+
+# Must run after the last route is added.
+follow_sync_endpoints(app)
+
+# --- Startup ---
+def ensure_admin_user():
+    """Creates the default admin user if none exists; the unique username index makes concurrent upserts safe."""
+    users.insert_missing({
         "username": "admin",
         "full_name": "Administrator",
         "hashed_password": get_password_hash("admin"),
         "disabled": False
-    }) 
\ No newline at end of file
+    })
+
+def seed_status_counts():
+    if not events.has_checkpoint(db):
+        events.rebuild_counts(db, EVENT_SOURCES)
+
+# --- Indexes and derived views ---
+def ensure_indexes():
+    indexes.ensure(db)
+    tracking.ensure_collection(db, int(PING_TTL_HOURS * 3600))
+    events.ensure_collections(db, EVENT_LOG_MB * 1024 * 1024)
+    rollups.ensure_indexes(db)
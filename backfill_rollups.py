@@ -0,0 +1,18 @@
+from pymongo import MongoClient
+import os
+from services import rollups
+
+def backfill_rollups():
+    """
+    Rebuilds the daily order rollups used by the Orders trend charts from every order.
+    Run it after bulk-loading orders outside the API.
+    """
+    mongodb_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+    mongodb_db = os.getenv("MONGODB_DB", "walmart")
+    db = MongoClient(mongodb_uri)[mongodb_db]
+
+    rollups.backfill(db)
+    print(f"Rebuilt {db[rollups.ROLLUP_COLLECTION].count_documents({}):,} order rollup documents.")
+
+if __name__ == "__main__":
+    backfill_rollups()
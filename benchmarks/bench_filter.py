@@ -0,0 +1,84 @@
+"""
+Benchmarks utils.helpers.filter_dataframe on a large orders-like frame.
+
+Compares the single-mask implementation (object and categorical columns, with
+and without the mask cache) against the previous copy-per-filter approach.
+
+Usage:
+    python benchmarks/bench_filter.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.helpers import filter_dataframe  # noqa: E402
+
+
+def copy_per_filter(df, filters):
+    """The previous implementation: one full copy per applied filter."""
+    filtered_df = df.copy()
+    for column, value in filters.items():
+        if isinstance(value, list):
+            filtered_df = filtered_df[filtered_df[column].isin(value)]
+        elif isinstance(value, tuple):
+            filtered_df = filtered_df[(filtered_df[column] >= value[0]) & (filtered_df[column] <= value[1])]
+        else:
+            filtered_df = filtered_df[filtered_df[column].str.contains(str(value), case=False, na=False)]
+    return filtered_df
+
+
+def make_frame(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "status": rng.choice(["pending", "shipped", "delivered", "cancelled"], rows),
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "quantity": rng.integers(1, 6, rows),
+        "order_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit="s"),
+    })
+
+
+def timed(label, func, repeat):
+    best = min(_run(func) for _ in range(repeat))
+    print(f"{label:<40} {best * 1000:9.1f} ms")
+
+
+def _run(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.seed)
+    categorical = df.astype({"status": "category", "region": "category"})
+    filters = {
+        "status": ["pending", "shipped"],
+        "region": "north",
+        "quantity": (2, 4),
+        "order_date": (pd.Timestamp("2024-03-01"), pd.Timestamp("2024-09-01")),
+    }
+
+    expected = copy_per_filter(df, filters)
+    assert filter_dataframe(df, filters).index.equals(expected.index)
+    assert filter_dataframe(categorical, filters).index.equals(expected.index)
+
+    print(f"{args.rows:,} rows, {len(expected):,} matches")
+    timed("copy per filter (previous)", lambda: copy_per_filter(df, filters), args.repeat)
+    timed("single mask, object columns", lambda: filter_dataframe(df, filters), args.repeat)
+    timed("single mask, categorical columns", lambda: filter_dataframe(categorical, filters), args.repeat)
+    timed("single mask, cached masks", lambda: filter_dataframe(categorical, filters, cache_key="v1"), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmarks the read-through repository cache offline.
+
+Runs a skewed mix of SKU lookups and stock adjustments against the in-memory
+repository, once directly and once behind CachedRepository at a few cache
+sizes. A fixed delay per call stands in for the database round trip, so no
+MongoDB is needed. Every read is checked against the uncached store, so a
+missed invalidation fails the run.
+
+Usage:
+    python benchmarks/bench_repositories.py --skus 100000 --ops 200000 --round-trip-ms 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.repositories import CachedRepository, MemoryRepository  # noqa: E402
+
+
+class RoundTrip:
+    """Adds a fixed latency to every call of a repository."""
+
+    def __init__(self, inner, seconds):
+        self.inner = inner
+        self.key = inner.key
+        self.seconds = seconds
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.inner, name)
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            deadline = time.perf_counter() + self.seconds
+            while time.perf_counter() < deadline:
+                pass
+            return method(*args, **kwargs)
+        return call
+
+
+def make_store(skus):
+    store = MemoryRepository("sku")
+    for i in range(skus):
+        store.insert({"sku": f"SKU{i:06d}", "quantity": 1000, "warehouse_id": f"WH-{i % 8 + 1:02d}"})
+    return store
+
+
+def make_ops(skus, ops, write_share, seed):
+    rng = np.random.default_rng(seed)
+    keys = (skus * rng.random(ops) ** 4).astype(np.int64)
+    writes = rng.random(ops) < write_share
+    return [(f"SKU{k:06d}", w) for k, w in zip(keys.tolist(), writes.tolist())]
+
+
+def run(label, repository, truth, ops, round_trip):
+    start = time.perf_counter()
+    for sku, write in ops:
+        if write:
+            repository.increment(sku, "quantity", -1, minimum=0)
+        else:
+            doc = repository.get(sku)
+            assert doc["quantity"] == truth[sku], f"stale read for {sku}"
+            continue
+        truth[sku] -= 1
+    elapsed = time.perf_counter() - start
+    hit_rate = ""
+    if isinstance(repository, CachedRepository):
+        hit_rate = f"   hit rate {repository.hits / max(repository.hits + repository.misses, 1):6.1%}"
+    print(f"{label:<24} {len(ops) / elapsed:10,.0f} ops/s   {round_trip.calls:9,} round trips{hit_rate}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--skus", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--write-share", type=float, default=0.05)
+    parser.add_argument("--round-trip-ms", type=float, default=0.3)
+    parser.add_argument("--cache-sizes", default="1000,10000,100000")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ops = make_ops(args.skus, args.ops, args.write_share, args.seed)
+    print(f"{args.skus:,} SKUs, {args.ops:,} ops ({args.write_share:.0%} writes), "
+          f"{args.round_trip_ms} ms per round trip")
+
+    backend = RoundTrip(make_store(args.skus), args.round_trip_ms / 1000)
+    run("uncached", backend, {f"SKU{i:06d}": 1000 for i in range(args.skus)}, ops, backend)
+    for size in (int(s) for s in args.cache_sizes.split(",")):
+        backend = RoundTrip(make_store(args.skus), args.round_trip_ms / 1000)
+        # A TTL longer than the run: only write invalidation keeps reads fresh.
+        cached = CachedRepository(backend, max_entries=size, ttl=3600)
+        run(f"cached, {size:,} entries", cached, {f"SKU{i:06d}": 1000 for i in range(args.skus)}, ops, backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmarks services.reservations with many concurrent buyers on a few hot SKUs.
+
+Runs each placement mode against a scratch database: single orders, carts
+(compensated, and in transactions with --transactions, which needs a replica
+set) and bulk batches. Buyers pick SKUs with a skewed popularity, so most of
+them fight over the same documents. After each mode the benchmark checks that
+no SKU went negative and that the stock removed equals the units accepted.
+
+Usage:
+    python benchmarks/bench_reservations.py --buyers 32 --requests 20000 --skus 20
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import reservations  # noqa: E402
+from services.reservations import InsufficientStock  # noqa: E402
+
+
+def make_requests(count, size, skus, seed):
+    """`count` requests of `size` order lines each, SKUs skewed towards the first few."""
+    rng = np.random.default_rng(seed)
+    products = (skus * rng.random((count, size)) ** 3).astype(np.int64)
+    quantities = rng.integers(1, 4, (count, size))
+    return [
+        [{"product_id": f"HOT{p:03d}", "quantity": int(q)} for p, q in zip(row_p, row_q)]
+        for row_p, row_q in zip(products.tolist(), quantities.tolist())
+    ]
+
+
+def reset(inventory, skus, stock):
+    inventory.drop()
+    inventory.insert_many([{"sku": f"HOT{i:03d}", "quantity": stock} for i in range(skus)])
+    inventory.create_index("sku")
+
+
+def run_mode(label, place, requests, buyers, inventory, skus, stock):
+    reset(inventory, skus, stock)
+    accepted, latencies, lock = [0], [], threading.Lock()
+
+    def buyer(lines):
+        start = time.perf_counter()
+        units = place(lines)
+        elapsed = time.perf_counter() - start
+        with lock:
+            accepted[0] += units
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=buyers) as pool:
+        list(pool.map(buyer, requests))
+    elapsed = time.perf_counter() - start
+
+    remaining = {doc["sku"]: doc["quantity"] for doc in inventory.find({}, {"_id": 0})}
+    assert min(remaining.values()) >= 0, "stock went negative"
+    assert skus * stock - sum(remaining.values()) == accepted[0], "stock removed != units accepted"
+    lines = sum(len(r) for r in requests)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{label:<28} {lines / elapsed:10,.0f} lines/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms"
+          f"   {accepted[0]:,} units sold, {sum(1 for v in remaining.values() if v == 0)} SKUs sold out")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="bench_reservations")
+    parser.add_argument("--buyers", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--skus", type=int, default=20)
+    parser.add_argument("--stock", type=int, default=10000, help="Initial units per SKU")
+    parser.add_argument("--cart-size", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--transactions", action="store_true", help="Also run carts in transactions")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, maxPoolSize=args.buyers + 4)
+    inventory = client[args.db].inventory
+
+    def single(lines):
+        try:
+            reservations.reserve_all(inventory, lines)
+            return lines[0]["quantity"]
+        except InsufficientStock:
+            return 0
+
+    def cart(lines):
+        try:
+            reservations.reserve_all(inventory, lines)
+            return sum(line["quantity"] for line in lines)
+        except InsufficientStock:
+            return 0
+
+    def cart_transaction(lines):
+        with client.start_session() as session:
+            try:
+                session.with_transaction(lambda s: reservations.reserve_all(inventory, lines, s))
+                return sum(line["quantity"] for line in lines)
+            except InsufficientStock:
+                return 0
+
+    def bulk(lines):
+        accepted, _, _ = reservations.reserve_each(inventory, lines)
+        return sum(lines[i]["quantity"] for i in accepted)
+
+    common = (args.buyers, inventory, args.skus, args.stock)
+    print(f"{args.buyers} buyers, {args.skus} SKUs x {args.stock:,} units")
+    run_mode("single orders", single, make_requests(args.requests, 1, args.skus, args.seed), *common)
+    carts = make_requests(args.requests // args.cart_size, args.cart_size, args.skus, args.seed)
+    run_mode(f"carts of {args.cart_size} (compensated)", cart, carts, *common)
+    if args.transactions:
+        run_mode(f"carts of {args.cart_size} (transactions)", cart_transaction, carts, *common)
+    batches = make_requests(args.requests // args.batch_size, args.batch_size, args.skus, args.seed)
+    run_mode(f"bulk batches of {args.batch_size}", bulk, batches, *common)
+    client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmarks services.slotting on a synthetic warehouse.
+
+Generates order lines with a skewed product popularity, then times the pick
+velocity group-by and the slotting proposal separately.
+
+Usage:
+    python benchmarks/bench_slotting.py --skus 100000 --lines 5000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import slotting  # noqa: E402
+
+
+def make_data(skus, lines, warehouses, seed):
+    rng = np.random.default_rng(seed)
+    sku_ids = np.array([f"SKU{i:06d}" for i in range(skus)], dtype=object)
+    warehouse_ids = np.array([f"WH-{i + 1:02d}" for i in range(warehouses)], dtype=object)
+    slot = np.arange(skus) // warehouses
+    inventory = pd.DataFrame({
+        "warehouse_id": warehouse_ids[np.arange(skus) % warehouses],
+        "sku": sku_ids,
+        "bin_location": [chr(65 + s % 26) + str(s // 26 + 1) for s in slot],
+    })
+    products = (skus * rng.random(lines) ** 3).astype(np.int64)
+    order_lines = pd.DataFrame({
+        "warehouse_id": inventory["warehouse_id"].to_numpy()[products],
+        "product_id": sku_ids[products],
+        "quantity": rng.integers(1, 6, lines),
+    })
+    return inventory, order_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--lines", type=int, default=5_000_000)
+    parser.add_argument("--warehouses", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    inventory, order_lines = make_data(args.skus, args.lines, args.warehouses, args.seed)
+    print(f"{args.skus:,} SKUs, {args.lines:,} order lines, {args.warehouses} warehouses")
+
+    start = time.perf_counter()
+    velocity = pd.concat(
+        slotting.pick_velocity(lines).assign(warehouse_id=wid)
+        for wid, lines in order_lines.groupby("warehouse_id", sort=False)
+    )
+    print(f"{'pick velocity':<24} {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    start = time.perf_counter()
+    proposal = slotting.propose_slotting(inventory, velocity)
+    summary = slotting.summarize(proposal, limit=10)
+    print(f"{'slotting proposal':<24} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    print(f"{summary['moves']:,} moves, {summary['savings_pct']}% travel saved, classes {summary['class_counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Converts ISO-string dates in existing collections to native BSON dates.
+
+The migration walks each collection in _id order in batches, rewrites the
+string fields with a single bulk_write per batch and records its progress in
+db.migrations, so an interrupted run resumes where it stopped.
+
+Usage:
+    python migrate_dates.py
+    python migrate_dates.py --batch-size 5000 --collection orders
+    python migrate_dates.py --reset   # start over from the first document
+"""
+import argparse
+import datetime
+import os
+
+from pymongo import MongoClient, UpdateOne
+
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+MONGODB_DB = os.getenv("MONGODB_DB", "walmart")
+
+DATE_FIELDS = {
+    "orders": ["order_date"],
+    "deliveries": ["delivery_date", "eta"],
+}
+
+def parse_iso(value):
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def migrate_collection(db, collection, fields, batch_size, dry_run=False):
+    """Converts one collection; returns (converted, unparseable) document counts."""
+    checkpoint_id = f"dates:{collection}"
+    checkpoint = db.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    converted, unparseable = checkpoint.get("converted", 0), checkpoint.get("unparseable", 0)
+
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    while True:
+        batch_query = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        batch = list(db[collection].find(batch_query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            changes = {}
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    parsed = parse_iso(doc[field])
+                    if parsed is not None:
+                        changes[field] = parsed
+            if changes:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+            else:
+                unparseable += 1
+        if updates and not dry_run:
+            db[collection].bulk_write(updates, ordered=False)
+        converted += len(updates)
+        last_id = batch[-1]["_id"]
+
+        if not dry_run:
+            db.migrations.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "converted": converted, "unparseable": unparseable,
+                          "updated_at": datetime.datetime.utcnow()}},
+                upsert=True,
+            )
+        print(f"{collection}: {converted:,} converted, {unparseable:,} unparseable", end="\r", flush=True)
+    print(f"{collection}: {converted:,} converted, {unparseable:,} unparseable")
+    return converted, unparseable
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate ISO-string dates to BSON dates.")
+    parser.add_argument("--collection", choices=sorted(DATE_FIELDS), action="append",
+                        help="Collection to migrate (repeatable, default: all)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per bulk_write")
+    parser.add_argument("--reset", action="store_true", help="Ignore saved progress and start over")
+    parser.add_argument("--dry-run", action="store_true", help="Count convertible documents without writing")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(MONGODB_URI)[MONGODB_DB]
+    for collection in args.collection or sorted(DATE_FIELDS):
+        if args.reset:
+            db.migrations.delete_one({"_id": f"dates:{collection}"})
+        migrate_collection(db, collection, DATE_FIELDS[collection], max(args.batch_size, 1), args.dry_run)
+
+if __name__ == "__main__":
+    main()
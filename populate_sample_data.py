@@ -1,119 +1,324 @@
-from pymongo import MongoClient
+"""
+Generates internally consistent sample data for the Walmart Logistics Dashboard.
+
+Orders reference generated SKUs, deliveries reference a pool of agents and carry
+coordinates around real cities in their region, and every record is derived from
+a seeded RNG so the same arguments always produce the same dataset.
+
+Usage:
+    python populate_sample_data.py
+    python populate_sample_data.py --orders 5000000 --skus 100000 --deliveries 500000 --workers 8
+    python populate_sample_data.py --orders 1000000 --ndjson bench_data/
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
 import os
+import random
+import string
+
+from pymongo import MongoClient
+
+from services import events, indexes, low_stock, rollups
 
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 MONGODB_DB = os.getenv("MONGODB_DB", "walmart")
-client = MongoClient(MONGODB_URI)
-db = client[MONGODB_DB]
-
-# Sample Orders
-db.orders.delete_many({})  # Clear existing
-orders = [
-    {
-        "order_id": "ORD-1001",
-        "customer_name": "Alice Smith",
-        "product_id": "SKU-2001",
-        "quantity": 2,
-        "delivery_address": "123 Main St, Springfield",
-        "status": "pending",
-        "order_date": "2024-06-25T10:30:00"
-    },
-    {
-        "order_id": "ORD-1002",
-        "customer_name": "Bob Johnson",
-        "product_id": "SKU-2002",
-        "quantity": 1,
-        "delivery_address": "456 Oak Ave, Metropolis",
-        "status": "shipped",
-        "order_date": "2024-06-24T14:15:00"
-    },
-    {
-        "order_id": "ORD-1003",
-        "customer_name": "Carol Lee",
-        "product_id": "SKU-2003",
-        "quantity": 3,
-        "delivery_address": "789 Pine Rd, Gotham",
-        "status": "delivered",
-        "order_date": "2024-06-23T09:00:00"
-    }
-]
-db.orders.insert_many(orders)
-
-# Sample Inventory
-db.inventory.delete_many({})
-inventory = [
-    {
-        "sku": "SKU-2001",
-        "name": "Laptop",
-        "category": "Electronics",
-        "quantity": 10,
-        "bin_location": "A1",
-        "min_stock_level": 3
-    },
-    {
-        "sku": "SKU-2002",
-        "name": "Wireless Mouse",
-        "category": "Electronics",
-        "quantity": 5,
-        "bin_location": "B2",
-        "min_stock_level": 2
-    },
-    {
-        "sku": "SKU-2003",
-        "name": "Office Chair",
-        "category": "Furniture",
-        "quantity": 2,
-        "bin_location": "C3",
-        "min_stock_level": 5
-    }
-]
-db.inventory.insert_many(inventory)
-
-# Sample Deliveries
-db.deliveries.delete_many({})
-deliveries = [
-    {
-        "delivery_id": "DEL-5001",
-        "agent_id": "AG-01",
-        "region": "North",
-        "status": "in-transit",
-        "delivery_date": "2024-06-25T12:00:00",
-        "eta": "2024-06-25T14:00:00",
-        "latitude": 40.7128,
-        "longitude": -74.0060
-    },
-    {
-        "delivery_id": "DEL-5002",
-        "agent_id": "AG-02",
-        "region": "South",
-        "status": "delivered",
-        "delivery_date": "2024-06-24T10:00:00",
-        "eta": "2024-06-24T12:00:00",
-        "latitude": 34.0522,
-        "longitude": -118.2437
-    },
-    {
-        "delivery_id": "DEL-5003",
-        "agent_id": "AG-03",
-        "region": "East",
-        "status": "failed",
-        "delivery_date": "2024-06-23T09:00:00",
-        "eta": "2024-06-23T11:00:00",
-        "latitude": 41.8781,
-        "longitude": -87.6298
-    }
-]
-db.deliveries.insert_many(deliveries)
-
-# Sample Warehouse
-db.warehouse.delete_many({})
-warehouse = {
-    "name": "Main Warehouse",
-    "address": "123 Main St, City",
-    "capacity": 1000,
-    "manager": "John Doe",
-    "contact": "555-1234"
+
+# --- Reference Data ---
+CATEGORIES = {
+    "Electronics": ["Laptop", "Wireless Mouse", "Tablet", "Headphones", "Monitor", "Keyboard"],
+    "Furniture": ["Office Chair", "Desk", "Bookshelf", "Sofa", "Bed Frame"],
+    "Grocery": ["Coffee Beans", "Olive Oil", "Rice", "Cereal", "Pasta", "Snack Pack"],
+    "Apparel": ["T-Shirt", "Jeans", "Jacket", "Sneakers", "Socks"],
+    "Home": ["Vacuum", "Blender", "Towel Set", "Lamp", "Cookware Set"],
+    "Toys": ["Puzzle", "Board Game", "Action Figure", "Doll", "Building Blocks"],
 }
-db.warehouse.insert_one(warehouse)
+CATEGORY_NAMES = list(CATEGORIES)
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Emma", "Frank", "Grace", "Henry", "Isla", "Jack",
+               "Karen", "Liam", "Maria", "Noah", "Olivia", "Paul", "Quinn", "Rosa", "Sam", "Tina"]
+LAST_NAMES = ["Smith", "Johnson", "Lee", "Brown", "Garcia", "Miller", "Davis", "Wilson", "Moore",
+              "Taylor", "Anderson", "Thomas", "Martin", "Clark", "Lewis", "Walker", "Young", "King"]
+STREETS = ["Main St", "Oak Ave", "Pine Rd", "Maple Dr", "Cedar Ln", "Elm St", "Lake Blvd",
+           "Hill Rd", "Park Ave", "River Rd", "Sunset Blvd", "2nd St", "Washington Ave"]
+
+# Cities per region as (name, latitude, longitude); deliveries are scattered around them.
+REGIONS = {
+    "North": [("Chicago", 41.8781, -87.6298), ("Minneapolis", 44.9778, -93.2650), ("Detroit", 42.3314, -83.0458)],
+    "South": [("Houston", 29.7604, -95.3698), ("Atlanta", 33.7490, -84.3880), ("Dallas", 32.7767, -96.7970)],
+    "East": [("New York", 40.7128, -74.0060), ("Boston", 42.3601, -71.0589), ("Philadelphia", 39.9526, -75.1652)],
+    "West": [("Los Angeles", 34.0522, -118.2437), ("Seattle", 47.6062, -122.3321), ("San Francisco", 37.7749, -122.4194)],
+}
+REGION_NAMES = list(REGIONS)
+
+ORDER_STATUSES = (["pending", "shipped", "delivered", "cancelled"], [20, 25, 50, 5])
+DELIVERY_STATUSES = (["pending", "in-transit", "delivered", "failed", "rescheduled"], [15, 25, 50, 6, 4])
+
+BIN_ROWS = string.ascii_uppercase
+
+# --- Identifiers ---
+def sku_id(index):
+    return f"SKU-{index:07d}"
+
+def order_id(index):
+    return f"ORD-{index:08d}"
+
+def delivery_id(index):
+    return f"DEL-{index:08d}"
+
+def agent_id(index):
+    return f"AG-{index:04d}"
+
+def warehouse_id(index):
+    return f"WH-{index + 1:02d}"
+
+def bin_location(index):
+    """Bins fill a row-major grid of 26 lettered rows: A1..Z1, A2..Z2, ..."""
+    return f"{BIN_ROWS[index % len(BIN_ROWS)]}{index // len(BIN_ROWS) + 1}"
+
+# --- Record Generators ---
+def chunk_rng(seed, kind, chunk_index):
+    # String seeds are hashed deterministically, so a chunk's records do not
+    # depend on how many workers there are or which one generates it.
+    return random.Random(f"{seed}:{kind}:{chunk_index}")
+
+def random_address(rng, region):
+    city = rng.choice(REGIONS[region])[0]
+    return f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {city}"
+
+def random_point(rng, region):
+    _, lat, lng = rng.choice(REGIONS[region])
+    return round(rng.gauss(lat, 0.15), 6), round(rng.gauss(lng, 0.15), 6)
+
+def random_timestamp(rng, end, days):
+    return end - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+
+def sku_warehouse(sku_index, opts):
+    """SKUs are spread round-robin over warehouses; each warehouse fills its own bin grid."""
+    return sku_index % opts["warehouses"], sku_index // opts["warehouses"]
+
+def region_warehouses(region, opts):
+    # Warehouse i serves REGION_NAMES[i % 4]; regions without one share all warehouses.
+    local = [w for w in range(opts["warehouses"]) if REGION_NAMES[w % len(REGION_NAMES)] == region]
+    return local or list(range(opts["warehouses"]))
+
+def generate_inventory(rng, start, stop, opts):
+    items = []
+    for i in range(start, stop):
+        warehouse_index, bin_index = sku_warehouse(i, opts)
+        category = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+        min_stock_level = rng.randint(2, 25)
+        items.append({
+            "sku": sku_id(i),
+            "name": f"{rng.choice(CATEGORIES[category])} {i}",
+            "category": category,
+            # Roughly one SKU in ten starts below its minimum stock level.
+            "quantity": rng.randint(0, min_stock_level) if rng.random() < 0.1 else rng.randint(min_stock_level, 500),
+            "bin_location": bin_location(bin_index),
+            "min_stock_level": min_stock_level,
+            "warehouse_id": warehouse_id(warehouse_index),
+        })
+    return items
+
+def generate_orders(rng, start, stop, opts):
+    orders = []
+    for i in range(start, stop):
+        region = rng.choice(REGION_NAMES)
+        # Skewed popularity: a small share of SKUs receives most of the orders.
+        product_index = int(opts["skus"] * rng.random() ** 3)
+        orders.append({
+            "order_id": order_id(i),
+            "customer_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "product_id": sku_id(product_index),
+            "quantity": rng.randint(1, 5),
+            "delivery_address": random_address(rng, region),
+            "status": rng.choices(*ORDER_STATUSES)[0],
+            "order_date": random_timestamp(rng, opts["end_date"], opts["days"]),
+            # Orders ship from the warehouse that stocks the product.
+            "warehouse_id": warehouse_id(sku_warehouse(product_index, opts)[0]),
+        })
+    return orders
+
+def generate_deliveries(rng, start, stop, opts):
+    deliveries = []
+    for i in range(start, stop):
+        agent_index = rng.randrange(opts["agents"])
+        # Agents work a single region so their deliveries stay geographically coherent.
+        region = REGION_NAMES[agent_index % len(REGION_NAMES)]
+        local_warehouses = region_warehouses(region, opts)
+        latitude, longitude = random_point(rng, region)
+        delivery_date = random_timestamp(rng, opts["end_date"], opts["days"])
+        eta = delivery_date + datetime.timedelta(minutes=rng.randint(30, 360))
+        status = rng.choices(*DELIVERY_STATUSES)[0]
+        delivery = {
+            "delivery_id": delivery_id(i),
+            "agent_id": agent_id(agent_index),
+            "region": region,
+            "status": status,
+            "delivery_date": delivery_date,
+            "eta": eta,
+            "latitude": latitude,
+            "longitude": longitude,
+            "warehouse_id": warehouse_id(local_warehouses[agent_index % len(local_warehouses)]),
+        }
+        if status == "in-transit":
+            delivery["last_latitude"], delivery["last_longitude"] = random_point(rng, region)
+        deliveries.append(delivery)
+    return deliveries
+
+def generate_agents(rng, start, stop, opts):
+    agents = []
+    for i in range(start, stop):
+        # Same region and warehouse as the deliveries generated for this agent index.
+        region = REGION_NAMES[i % len(REGION_NAMES)]
+        local_warehouses = region_warehouses(region, opts)
+        latitude, longitude = random_point(rng, region)
+        agents.append({
+            "agent_id": agent_id(i),
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "region": region,
+            "latitude": latitude,
+            "longitude": longitude,
+            "max_load": rng.randint(10, 30),
+            "active": rng.random() < 0.9,
+            "warehouse_id": warehouse_id(local_warehouses[i % len(local_warehouses)]),
+        })
+    return agents
+
+def generate_warehouses(rng, start, stop, opts):
+    warehouses = []
+    for i in range(start, stop):
+        region = REGION_NAMES[i % len(REGION_NAMES)]
+        warehouses.append({
+            "warehouse_id": warehouse_id(i),
+            "name": f"{region} Distribution Center {i + 1}",
+            "address": random_address(rng, region),
+            "capacity": rng.randint(50, 200) * 1000,
+            "manager": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "contact": f"555-{rng.randint(1000, 9999)}",
+        })
+    return warehouses
+
+# Collection name -> (generator, option holding the record count)
+COLLECTIONS = {
+    "warehouse": (generate_warehouses, "warehouses"),
+    "inventory": (generate_inventory, "skus"),
+    "orders": (generate_orders, "orders"),
+    "deliveries": (generate_deliveries, "deliveries"),
+    "agents": (generate_agents, "agents"),
+}
+
+# --- Workers ---
+_worker_db = None
+
+def _init_worker(write_to_db):
+    global _worker_db
+    if write_to_db:
+        # Each process opens its own client; MongoClient must not be shared across a fork.
+        _worker_db = MongoClient(MONGODB_URI)[MONGODB_DB]
+
+def _json_default(value):
+    # Dates are stored as BSON dates in MongoDB and as ISO strings in NDJSON.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(timespec="seconds")
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _run_chunk(task):
+    collection, chunk_index, start, stop, opts = task
+    generator, _ = COLLECTIONS[collection]
+    docs = generator(chunk_rng(opts["seed"], collection, chunk_index), start, stop, opts)
+    if _worker_db is not None:
+        _worker_db[collection].insert_many(docs, ordered=False)
+        return collection, len(docs), None
+    return collection, len(docs), "".join(json.dumps(doc, default=_json_default) + "\n" for doc in docs)
+
+def build_tasks(opts):
+    tasks = []
+    for collection, (_, count_key) in COLLECTIONS.items():
+        total = opts[count_key]
+        for chunk_index, start in enumerate(range(0, total, opts["batch_size"])):
+            tasks.append((collection, chunk_index, start, min(start + opts["batch_size"], total), opts))
+    return tasks
+
+def populate(opts, ndjson_dir=None, append=False):
+    """
+    Generates every collection in batches across worker processes and either
+    inserts them into MongoDB with unordered bulk inserts or streams them to
+    one NDJSON file per collection. Once the MongoDB inserts finish, the
+    indexes are recreated and derived collections (order rollups, the
+    low-stock view, event status counts) are rebuilt.
+    """
+    tasks = build_tasks(opts)
+    totals = {collection: 0 for collection in COLLECTIONS}
+
+    if ndjson_dir:
+        os.makedirs(ndjson_dir, exist_ok=True)
+        files = {c: open(os.path.join(ndjson_dir, f"{c}.ndjson"), "w") for c in COLLECTIONS}
+    else:
+        files = None
+        db = MongoClient(MONGODB_URI)[MONGODB_DB]
+        if not append:
+            for collection in COLLECTIONS:
+                db[collection].drop()
+            # Current states of the dropped orders and deliveries.
+            db[events.STATE_COLLECTION].drop()
+
+    try:
+        with multiprocessing.Pool(opts["workers"], initializer=_init_worker, initargs=(files is None,)) as pool:
+            # imap keeps chunk order so NDJSON output is byte-for-byte reproducible.
+            for collection, count, payload in pool.imap(_run_chunk, tasks):
+                if files is not None:
+                    files[collection].write(payload)
+                totals[collection] += count
+    finally:
+        if files is not None:
+            for f in files.values():
+                f.close()
+    if files is None:
+        # Dropping the collections dropped their indexes; the API bootstrap does not run again to restore them.
+        indexes.ensure(db)
+        rollups.backfill(db)
+        low_stock.rebuild(db)
+        # The inserts bypass the event log; recount and move the compaction checkpoint past it.
+        events.rebuild_counts(db)
+    return totals
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate sample logistics data.")
+    parser.add_argument("--orders", type=int, default=200, help="Number of orders")
+    parser.add_argument("--skus", type=int, default=50, help="Number of inventory SKUs")
+    parser.add_argument("--deliveries", type=int, default=100, help="Number of deliveries")
+    parser.add_argument("--warehouses", type=int, default=3, help="Number of warehouses")
+    parser.add_argument("--agents", type=int, default=None, help="Delivery agents (default: deliveries / 50)")
+    parser.add_argument("--days", type=int, default=365, help="Spread order and delivery dates over this many days")
+    parser.add_argument("--end-date", default=None, help="Latest generated timestamp (ISO, default: now)")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Documents per insert batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--ndjson", metavar="DIR", default=None, help="Write NDJSON files instead of MongoDB")
+    parser.add_argument("--append", action="store_true", help="Keep existing documents instead of dropping collections")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    end_date = datetime.datetime.fromisoformat(args.end_date) if args.end_date else datetime.datetime.now()
+    opts = {
+        "orders": args.orders,
+        "skus": max(args.skus, 1),
+        "deliveries": args.deliveries,
+        "warehouses": max(args.warehouses, 1),
+        "agents": args.agents or max(len(REGION_NAMES), args.deliveries // 50),
+        "days": max(args.days, 1),
+        "end_date": end_date.replace(microsecond=0),
+        "seed": args.seed,
+        "batch_size": max(args.batch_size, 1),
+        "workers": max(args.workers, 1),
+    }
+    totals = populate(opts, ndjson_dir=args.ndjson, append=args.append)
+    target = f"NDJSON files in {args.ndjson}" if args.ndjson else f"MongoDB database '{MONGODB_DB}'"
+    summary = ", ".join(f"{count:,} {collection}" for collection, count in totals.items())
+    print(f"Sample data written to {target}: {summary}.")
 
-print("Sample data inserted into orders, inventory, deliveries, and warehouse collections.") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
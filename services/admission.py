@@ -0,0 +1,148 @@
+"""
+Admission control for the API.
+
+Requests are matched to a rule by method and path. Each rule has its own
+concurrency limit and bounded wait queue, and a priority that decides how early
+the rule is shed when the whole worker is busy:
+
+- critical (auth and writes) is never shed and has no limits by default,
+- normal is shed once the worker is nearly full,
+- heavy (full-collection reads and rebuilds, route optimization, delivery
+  assignment, warehouse planning) is shed first.
+
+Rejections are immediate: 429 when a rule's queue is full, 503 when the worker
+is overloaded or a queued request waited too long, both with Retry-After.
+"""
+import asyncio
+import collections
+import json
+import math
+import re
+import time
+
+# Share of ADMISSION_MAX_IN_FLIGHT each priority may fill before it is shed.
+PRIORITY_HEADROOM = {"critical": None, "normal": 0.9, "heavy": 0.5}
+
+# First match wins. max_concurrency/max_queue of 0 mean unlimited/no queue.
+DEFAULT_RULES = [
+    {"name": "health", "methods": ["GET"], "path": r"^/(healthz|readyz)$", "priority": "critical"},
+    {"name": "login", "methods": ["POST"], "path": r"^/api/login$", "priority": "critical"},
+    {"name": "optimize_route", "methods": ["POST"], "path": r"^/api/optimize_route$",
+     "priority": "heavy", "max_concurrency": 2, "max_queue": 8, "queue_timeout": 10},
+    {"name": "delivery_assignment", "methods": ["POST"], "path": r"^/api/deliveries/assign$",
+     "priority": "heavy", "max_concurrency": 2, "max_queue": 4, "queue_timeout": 10},
+    # Whole-collection rebuilds; one at a time is plenty.
+    {"name": "rebuilds", "methods": ["POST"],
+     "path": r"^/api/(orders/trends/backfill|inventory/low_stock/rebuild|events/counts/rebuild"
+             r"|events/compact|deliveries/etas/refresh)$",
+     "priority": "heavy", "max_concurrency": 1, "max_queue": 2, "queue_timeout": 30},
+    {"name": "writes", "methods": ["POST", "PATCH", "PUT", "DELETE"], "path": r"^/api/",
+     "priority": "critical"},
+    {"name": "collection_reads", "methods": ["GET"], "path": r"^/api/(orders|inventory|deliveries)$",
+     "priority": "heavy", "max_concurrency": 4, "max_queue": 16, "queue_timeout": 5},
+    {"name": "warehouse_planning", "methods": ["GET"], "path": r"^/api/(warehouse/slotting|orders/waves)$",
+     "priority": "heavy", "max_concurrency": 2, "max_queue": 4, "queue_timeout": 10},
+    # Long polls hold a worker thread for up to 30s each.
+    {"name": "event_feed", "methods": ["GET"], "path": r"^/api/events$", "priority": "normal",
+     "max_concurrency": 16, "max_queue": 0},
+]
+
+
+class Rejected(Exception):
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RouteLimiter:
+    """Concurrency limit with a bounded FIFO wait queue for one rule."""
+
+    def __init__(self, name, methods, path, priority="normal", max_concurrency=0,
+                 max_queue=0, queue_timeout=5.0):
+        if priority not in PRIORITY_HEADROOM:
+            raise ValueError(f"Unknown admission priority '{priority}'")
+        self.name = name
+        self.methods = {m.upper() for m in methods}
+        self.pattern = re.compile(path)
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.latency = 0.1  # EWMA of handler time, used to estimate Retry-After
+        self._waiters = collections.deque()
+
+    def matches(self, method, path):
+        return method in self.methods and self.pattern.match(path) is not None
+
+    def retry_after(self):
+        slots = max(self.max_concurrency, 1)
+        return max(1, math.ceil(self.latency * (len(self._waiters) + 1) / slots))
+
+    async def acquire(self):
+        if not self.max_concurrency or self.active < self.max_concurrency:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Rejected(429, f"Too many concurrent '{self.name}' requests", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(503, f"Timed out waiting for a '{self.name}' slot", self.retry_after())
+        except asyncio.CancelledError:
+            # The client went away after the slot was handed over; pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, elapsed):
+        self.latency = 0.8 * self.latency + 0.2 * elapsed
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; `active` stays the same.
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    def __init__(self, rules=None, max_in_flight=64):
+        self.limiters = [RouteLimiter(**rule) for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.default = RouteLimiter("default", [], r"^$")
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls, rules_json, max_in_flight):
+        """Builds a controller from an ADMISSION_RULES JSON list (inline or a file path)."""
+        if not rules_json:
+            return cls(max_in_flight=max_in_flight)
+        if not rules_json.lstrip().startswith("["):
+            with open(rules_json) as f:
+                rules_json = f.read()
+        return cls(json.loads(rules_json), max_in_flight=max_in_flight)
+
+    def limiter_for(self, method, path):
+        return next((l for l in self.limiters if l.matches(method, path)), self.default)
+
+    async def __call__(self, request, call_next):
+        limiter = self.limiter_for(request.method, request.url.path)
+        headroom = PRIORITY_HEADROOM[limiter.priority]
+        if headroom is not None and self.max_in_flight and self.in_flight >= self.max_in_flight * headroom:
+            raise Rejected(503, "Server is busy, try again shortly", limiter.retry_after())
+        await limiter.acquire()
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            self.in_flight -= 1
+            limiter.release(time.perf_counter() - start)
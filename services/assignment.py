@@ -0,0 +1,99 @@
+"""
+Bulk assignment of deliveries to agents.
+
+Agents are bucketed into a uniform lat/lng grid. Each delivery gets candidate
+agents from the grid cells around it (same region only), all candidate pairs
+are ranked by great-circle distance and taken greedily while agents have spare
+capacity. Deliveries left over, because every nearby agent filled up, are
+retried with a wider search window, and finally against every agent in their
+region that still has capacity.
+"""
+import numpy as np
+
+from services.geo import haversine_km
+
+DEFAULT_CELL_DEGREES = 0.1  # about 11 km north-south
+DEFAULT_MAX_LOAD = 20
+MAX_GRID_RADIUS = 8  # cells; beyond this the remaining deliveries are matched exhaustively
+
+
+class GridIndex:
+    """Sorted cell keys over points; neighbourhood lookups are binary searches."""
+
+    OFFSET = 1 << 20
+
+    def __init__(self, lat, lng, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        cells = self._cells(lat, lng)
+        self.order = np.argsort(cells, kind="stable")
+        self.keys = cells[self.order]
+
+    def _cells(self, lat, lng):
+        row = np.floor(np.asarray(lat, dtype=np.float64) / self.cell_degrees).astype(np.int64)
+        col = np.floor(np.asarray(lng, dtype=np.float64) / self.cell_degrees).astype(np.int64)
+        return (row + self.OFFSET) * (2 * self.OFFSET) + (col + self.OFFSET)
+
+    def candidates(self, lat, lng, radius):
+        """(query index, point index) pairs for points within `radius` cells of each query point."""
+        base = self._cells(lat, lng)
+        queries, points = [], []
+        for d_row in range(-radius, radius + 1):
+            for d_col in range(-radius, radius + 1):
+                keys = base + d_row * (2 * self.OFFSET) + d_col
+                lo = np.searchsorted(self.keys, keys, side="left")
+                counts = np.searchsorted(self.keys, keys, side="right") - lo
+                total = int(counts.sum())
+                if not total:
+                    continue
+                query = np.repeat(np.arange(len(keys)), counts)
+                # Position within each query's run of matching points.
+                within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                queries.append(query)
+                points.append(self.order[np.repeat(lo, counts) + within])
+        if not queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(queries), np.concatenate(points)
+
+
+def assign(delivery_lat, delivery_lng, delivery_region, agent_lat, agent_lng, agent_region, capacity,
+           cell_degrees=DEFAULT_CELL_DEGREES):
+    """
+    Returns an array with the chosen agent index for every delivery (-1 when no
+    agent in its region has capacity left). `capacity` is the number of
+    additional deliveries each agent can take.
+    """
+    delivery_lat, delivery_lng = np.asarray(delivery_lat, dtype=np.float64), np.asarray(delivery_lng, dtype=np.float64)
+    agent_lat, agent_lng = np.asarray(agent_lat, dtype=np.float64), np.asarray(agent_lng, dtype=np.float64)
+    delivery_region, agent_region = np.asarray(delivery_region, dtype=object), np.asarray(agent_region, dtype=object)
+    remaining = np.asarray(capacity, dtype=np.int64).copy()
+    chosen = np.full(len(delivery_lat), -1, dtype=np.int64)
+    if not len(agent_lat) or not len(delivery_lat):
+        return chosen
+
+    def take(deliveries, agents):
+        keep = (delivery_region[deliveries] == agent_region[agents]) & (remaining[agents] > 0)
+        deliveries, agents = deliveries[keep], agents[keep]
+        distance = haversine_km(delivery_lat[deliveries], delivery_lng[deliveries], agent_lat[agents], agent_lng[agents])
+        for pair in np.argsort(distance, kind="stable").tolist():
+            delivery, agent = deliveries[pair], agents[pair]
+            if chosen[delivery] < 0 and remaining[agent] > 0:
+                chosen[delivery] = agent
+                remaining[agent] -= 1
+
+    index = GridIndex(agent_lat, agent_lng, cell_degrees)
+    radius = 1
+    while radius <= MAX_GRID_RADIUS:
+        open_deliveries = np.flatnonzero(chosen < 0)
+        if not len(open_deliveries) or not remaining.any():
+            return chosen
+        query, agents = index.candidates(delivery_lat[open_deliveries], delivery_lng[open_deliveries], radius)
+        take(open_deliveries[query], agents)
+        radius *= 2
+
+    open_deliveries = np.flatnonzero(chosen < 0)
+    for region in set(delivery_region[open_deliveries].tolist()):
+        region_deliveries = open_deliveries[delivery_region[open_deliveries] == region]
+        free_agents = np.flatnonzero((agent_region == region) & (remaining > 0))
+        if len(free_agents):
+            take(np.repeat(region_deliveries, len(free_agents)), np.tile(free_agents, len(region_deliveries)))
+    return chosen
@@ -0,0 +1,31 @@
+"""
+Warehouse bin coordinates.
+
+Bin locations look like "A1" or "B12": the letters name the aisle row and the
+number is the position along it. Multi-letter rows ("AA7") continue the
+sequence after "Z" like spreadsheet columns. Parsing is vectorized so it can
+run over every bin of a large warehouse at once.
+"""
+import numpy as np
+import pandas as pd
+
+
+def parse_bin_locations(locations):
+    """
+    Returns (rows, cols) integer arrays for an iterable of bin location strings.
+    Row "A" is 0; the column is the bin number. Missing parts default to 0.
+    """
+    series = pd.Series(list(locations), dtype="object").astype("string").str.upper()
+    letters = series.str.extract(r"([A-Z]+)", expand=False).fillna("A")
+    digits = series.str.extract(r"(\d+)", expand=False).fillna("0")
+
+    # Base-26 with A=1..Z=26, evaluated one character position at a time.
+    rows = np.zeros(len(series), dtype=np.int64)
+    lengths = letters.str.len().to_numpy(dtype=np.int64)
+    for position in range(int(lengths.max()) if len(series) else 0):
+        has_char = lengths > position
+        chars = letters.str[position].fillna("A").to_numpy(dtype=object)
+        values = np.frombuffer("".join(chars).encode("ascii"), dtype=np.uint8).astype(np.int64) - 64
+        rows = np.where(has_char, rows * 26 + values, rows)
+    return rows - 1, digits.astype(np.int64).to_numpy()
+
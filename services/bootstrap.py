@@ -0,0 +1,78 @@
+"""
+One-time startup work shared by every API worker.
+
+Index creation and rebuilding derived views only need to run once per
+version, not once per worker or per restart. Each worker tries to claim a
+lease document in db.bootstrap; the one that gets it runs the steps and marks
+the document completed for its version, the others wait for it to finish. The
+marker does not expire: restarts skip the steps until a worker with another
+version starts. The lease itself expires after `lease_seconds`, so a worker
+that dies mid-bootstrap is taken over by another one.
+"""
+import datetime
+import logging
+
+from services import leases
+from services.leases import worker_id
+
+logger = logging.getLogger("walmart.bootstrap")
+
+BOOTSTRAP_ID = "startup"
+DEFAULT_LEASE_SECONDS = 300
+
+
+def _completed_query(version):
+    return {"version": version, "completed_at": {"$ne": None}}
+
+
+def claim(db, owner, version, lease_seconds=DEFAULT_LEASE_SECONDS, now=None):
+    """True if this worker now holds the bootstrap lease; never once `version` has completed."""
+    return leases.acquire(db.bootstrap, BOOTSTRAP_ID, owner, lease_seconds, now,
+                          {"version": version, "completed_at": None},
+                          {"$nor": [_completed_query(version)]})
+
+
+def complete(db, owner):
+    """Marks the claimed version completed and frees the lease for the next version at once."""
+    db.bootstrap.update_one(
+        {"_id": BOOTSTRAP_ID, "owner": owner},
+        {"$set": {"completed_at": datetime.datetime.utcnow(), "expires_at": datetime.datetime.min}},
+    )
+
+
+def completed(db, version):
+    """True once some worker has finished the bootstrap of this version."""
+    return db.bootstrap.count_documents(dict(_completed_query(version), _id=BOOTSTRAP_ID), limit=1) > 0
+
+
+def run_once(db, steps, version, owner=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Runs the (name, callable) steps if this worker wins the lease. Returns True
+    if it ran them, False if another worker is responsible or already did.
+    """
+    owner = owner or worker_id()
+    if not claim(db, owner, version, lease_seconds):
+        return False
+    for name, step in steps:
+        logger.info("Bootstrap %s: %s", version, name)
+        step()
+    complete(db, owner)
+    return True
+
+
+def run(db, steps, stop, version, lease_seconds=DEFAULT_LEASE_SECONDS, poll_seconds=2.0):
+    """
+    Blocks until the bootstrap is done, by this worker or another one. A worker
+    that loses the race polls until the holder completes, and takes over if the
+    holder's lease expires first. Failed steps are retried. `stop` is a
+    threading.Event that abandons the wait on shutdown.
+    """
+    owner = worker_id()
+    while not stop.is_set():
+        try:
+            if run_once(db, steps, version, owner, lease_seconds) or completed(db, version):
+                return True
+        except Exception:
+            logger.exception("Bootstrap failed; retrying in %ss", poll_seconds)
+        stop.wait(poll_seconds)
+    return False
@@ -0,0 +1,139 @@
+"""
+Batch ETA recomputation for in-transit deliveries.
+
+Each cycle loads every in-transit delivery that has a last known position,
+computes the remaining great-circle distance to its drop-off point, divides it
+by the region's speed for the current hour (plus a fixed handover time) and
+writes the ETAs that moved by more than a threshold back in one bulk_write.
+"""
+import datetime
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+from pymongo import UpdateOne
+
+from services.geo import haversine_km
+
+logger = logging.getLogger("walmart.eta")
+
+IN_TRANSIT = "in-transit"
+DEFAULT_SPEED_KMH = 30.0
+# Average road speed per region; great-circle distances are stretched by ROAD_FACTOR.
+REGION_SPEEDS_KMH = {"North": 32.0, "South": 38.0, "East": 26.0, "West": 34.0}
+ROAD_FACTOR = 1.3
+HANDOVER_MINUTES = 5
+REGION_UTC_OFFSETS = {"North": -6, "South": -6, "East": -5, "West": -8}
+# Speed multiplier per local hour of day: rush hours are slower.
+HOURLY_SPEED_FACTORS = np.array([
+    1.2, 1.2, 1.2, 1.2, 1.2, 1.1, 0.9, 0.7, 0.65, 0.8, 0.9, 0.9,
+    0.9, 0.9, 0.9, 0.85, 0.7, 0.65, 0.75, 0.9, 1.0, 1.1, 1.1, 1.2,
+])
+
+PROJECTION = {"_id": 1, "region": 1, "eta": 1, "latitude": 1, "longitude": 1,
+              "last_latitude": 1, "last_longitude": 1}
+
+
+def load_speeds(speeds_json=""):
+    """Region speeds from a JSON object such as '{"East": 22}', merged over the defaults."""
+    speeds = dict(REGION_SPEEDS_KMH)
+    if speeds_json:
+        speeds.update({region: float(kmh) for region, kmh in json.loads(speeds_json).items()})
+    return speeds
+
+
+def compute_etas(regions, last_lat, last_lng, dest_lat, dest_lng, now, speeds=REGION_SPEEDS_KMH):
+    """ETAs as numpy datetime64[s] for parallel arrays of deliveries; `now` is naive UTC."""
+    distance_km = haversine_km(last_lat, last_lng, dest_lat, dest_lng) * ROAD_FACTOR
+    regions = np.asarray(regions, dtype=object)
+    region_speed = np.full(len(regions), DEFAULT_SPEED_KMH)
+    utc_offset = np.zeros(len(regions), dtype=np.int64)
+    for name, kmh in speeds.items():
+        region_speed[regions == name] = kmh
+    for name, offset in REGION_UTC_OFFSETS.items():
+        utc_offset[regions == name] = offset
+    region_speed *= HOURLY_SPEED_FACTORS[(now.hour + utc_offset) % 24]
+    seconds = distance_km / region_speed * 3600 + HANDOVER_MINUTES * 60
+    return np.datetime64(now.replace(tzinfo=None), "s") + seconds.astype("timedelta64[s]")
+
+
+def refresh_etas(collection, now=None, speeds=REGION_SPEEDS_KMH, min_change_seconds=60):
+    """Recomputes ETAs for every in-transit delivery; returns cycle statistics."""
+    started = time.perf_counter()
+    now = now or datetime.datetime.utcnow()
+    docs = list(collection.find(
+        {"status": IN_TRANSIT, "last_latitude": {"$ne": None}, "last_longitude": {"$ne": None}}, PROJECTION
+    ))
+    updated = 0
+    if docs:
+        def column(field):
+            return np.array([doc.get(field) for doc in docs], dtype=np.float64)
+
+        etas = compute_etas(
+            [doc.get("region") for doc in docs],
+            column("last_latitude"), column("last_longitude"), column("latitude"), column("longitude"),
+            now, speeds,
+        )
+        # ETAs stored as strings or missing count as changed.
+        current = np.array(
+            [doc["eta"] if isinstance(doc.get("eta"), datetime.datetime) else np.datetime64("NaT") for doc in docs],
+            dtype="datetime64[s]",
+        )
+        delta = np.abs((etas - current).astype(np.float64))
+        changed = np.flatnonzero(np.isnan(delta) | (delta >= min_change_seconds))
+        eta_values = etas.astype(datetime.datetime)
+        updates = [UpdateOne({"_id": docs[i]["_id"]}, {"$set": {"eta": eta_values[i]}}) for i in changed]
+        if updates:
+            collection.bulk_write(updates, ordered=False)
+        updated = len(updates)
+    return {
+        "deliveries": len(docs),
+        "updated": updated,
+        "seconds": round(time.perf_counter() - started, 3),
+        "computed_at": now,
+    }
+
+
+class EtaRefresher:
+    """
+    Runs refresh_etas every `interval` seconds on a daemon thread; with a
+    services.leases.Lease, only in the worker holding it.
+    """
+
+    def __init__(self, collection, interval, speeds=REGION_SPEEDS_KMH, lease=None):
+        self.collection = collection
+        self.interval = interval
+        self.speeds = speeds
+        self.lease = lease
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="eta-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+            if self.lease is not None:
+                self.lease.release()
+
+    def run_once(self):
+        self.last_run = refresh_etas(self.collection, speeds=self.speeds)
+        return self.last_run
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.lease is not None and not self.lease.acquire():
+                    continue  # Another worker runs the refresh.
+                stats = self.run_once()
+                logger.info("ETA refresh: %(updated)d of %(deliveries)d deliveries in %(seconds)ss", stats)
+            except Exception:
+                logger.exception("ETA refresh failed")
@@ -0,0 +1,305 @@
+"""
+Append-only log of order and delivery status transitions.
+
+Every write that creates, deletes or changes the status of an order or a
+delivery records an event (entity, entity_id, warehouse_id, from_status,
+to_status, ts and the fields that changed). Events are buffered in memory and
+written with one insert_many per batch into a capped collection, so the log is
+append-only by construction and can be followed with a tailable cursor by
+consumers that read MongoDB directly. HTTP consumers long-poll /api/events with
+the sequence number of the last event they saw.
+
+Every flush takes a range of sequence numbers from a $inc counter and stamps
+them on its batch, so seq orders events by when they were logged across all
+workers. Batches can still become visible out of order (a worker that took
+seq 1-10 may insert after one that took 11-20), so readers only move past a
+gap in the sequence once it is older than SETTLE_SECONDS; after that the
+missing events are taken as lost (a worker died between taking and writing
+them).
+
+Compaction folds the log, in seq order from a stored checkpoint, into
+entity_state (the current status of every entity) and status_counts (entities
+per entity type, warehouse and status), so dashboards read a few counters
+instead of grouping whole collections. One worker compacts at a time under a
+lease, and each batch is claimed by moving the checkpoint with a
+compare-and-set before it is applied, so no batch is counted twice. A crash
+between the claim and the writes loses that batch until rebuild_counts runs.
+"""
+import datetime
+import logging
+import threading
+
+from pymongo import ASCENDING, DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger("walmart.events")
+
+EVENTS_COLLECTION = "events"
+STATE_COLLECTION = "entity_state"
+COUNTS_COLLECTION = "status_counts"
+CHECKPOINTS_COLLECTION = "event_checkpoints"
+CHECKPOINT_ID = "compaction"
+SEQUENCE_ID = "sequence"  # The seq counter lives next to the checkpoint.
+DEFAULT_LOG_BYTES = 256 * 1024 * 1024
+COMPACT_BATCH = 5000
+SETTLE_SECONDS = 30.0
+FEED_SCAN = 5000  # events an entity-filtered feed looks through per call
+SOURCES = {"order": "orders", "delivery": "deliveries"}
+
+
+def has_checkpoint(db):
+    return db[CHECKPOINTS_COLLECTION].count_documents({"_id": CHECKPOINT_ID}, limit=1) > 0
+
+
+def ensure_collections(db, size_bytes=DEFAULT_LOG_BYTES):
+    if EVENTS_COLLECTION not in db.list_collection_names():
+        db.create_collection(EVENTS_COLLECTION, capped=True, size=size_bytes)
+    db[EVENTS_COLLECTION].create_index("seq", unique=True)
+    db[EVENTS_COLLECTION].create_index([("entity", ASCENDING), ("entity_id", ASCENDING)])
+    db[COUNTS_COLLECTION].create_index(
+        [("entity", ASCENDING), ("warehouse_id", ASCENDING), ("status", ASCENDING)], unique=True)
+
+
+def transition(entity, before, after, changes=None, now=None):
+    """
+    The event for one write (before/after are the documents, None for a create
+    or delete), or None when the status did not change.
+    """
+    from_status = before.get("status") if before else None
+    to_status = after.get("status") if after else None
+    if before and after and from_status == to_status:
+        return None
+    current = after or before
+    return {
+        "entity": entity,
+        "entity_id": current[f"{entity}_id"],
+        "warehouse_id": current.get("warehouse_id"),
+        "from_status": from_status,
+        "to_status": to_status,
+        "ts": now or datetime.datetime.utcnow(),
+        "changes": {k: v for k, v in (changes or {}).items() if k != "_id"},
+    }
+
+
+def next_seqs(db, count):
+    """Reserves `count` consecutive sequence numbers; returns the first."""
+    counter = db[CHECKPOINTS_COLLECTION].find_one_and_update(
+        {"_id": SEQUENCE_ID}, {"$inc": {"seq": count}}, upsert=True, return_document=ReturnDocument.AFTER)
+    return counter["seq"] - count + 1
+
+
+class EventLog:
+    """
+    Buffers events and writes them in batches: when batch_size is reached or
+    every `interval` seconds on a daemon thread, which also runs compaction
+    (with a services.leases.Lease, only in the worker holding it).
+    """
+
+    def __init__(self, db, interval=1.0, batch_size=500, lease=None):
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lease = lease
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, entity, before, after, changes=None):
+        event = transition(entity, before, after, changes)
+        if event is not None:
+            self.extend([event])
+
+    def extend(self, events):
+        with self._lock:
+            self._buffer.extend(events)
+            full = len(self._buffer) >= self.batch_size
+        # Without the background thread every write is flushed immediately.
+        if full or self._thread is None:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Event log flush failed; %d events stay buffered", len(self._buffer))
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        try:
+            # Events put back after a failed insert keep their seq, so the gap they left fills in.
+            fresh = [event for event in batch if "seq" not in event]
+            if fresh:
+                first, logged_at = next_seqs(self.db, len(fresh)), datetime.datetime.utcnow()
+                for offset, event in enumerate(fresh):
+                    event["seq"], event["logged_at"] = first + offset, logged_at
+            self.db[EVENTS_COLLECTION].insert_many(batch, ordered=True)
+        except Exception as e:
+            # An ordered insert stops at the first error; only the events it did not write go back.
+            written = e.details.get("nInserted", 0) if isinstance(e, BulkWriteError) else 0
+            with self._lock:
+                self._buffer[:0] = batch[written:]
+            raise
+        with self._flushed:
+            self._flushed.notify_all()
+        return len(batch)
+
+    def wait(self, timeout):
+        """Blocks until the next flush of this worker or timeout; used by long-polling feeds."""
+        with self._flushed:
+            return self._flushed.wait(timeout)
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+            if self.lease is not None:
+                self.lease.release()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+                if self.lease is None or self.lease.acquire():
+                    compact(self.db)
+            except Exception:
+                logger.exception("Event log flush or compaction failed")
+
+
+def settled(events, after, now=None, settle_seconds=SETTLE_SECONDS):
+    """
+    The leading events of a seq-ordered list that follow `after` without an
+    unsettled gap: a missing seq is only skipped once the event after it was
+    logged more than settle_seconds ago.
+    """
+    horizon = (now or datetime.datetime.utcnow()) - datetime.timedelta(seconds=settle_seconds)
+    expected = after + 1
+    for index, event in enumerate(events):
+        if event["seq"] != expected and event["logged_at"] > horizon:
+            return events[:index]
+        expected = event["seq"] + 1
+    return events
+
+
+def feed(db, after=0, entity=None, limit=100, now=None):
+    """
+    (events, cursor): events with seq greater than `after`, oldest first, up
+    to the first unsettled gap, and the seq to pass as `after` next time.
+    """
+    query = {"seq": {"$gt": after}}
+    if not entity:
+        found = settled(list(db[EVENTS_COLLECTION].find(query).sort("seq", ASCENDING).limit(limit)), after, now)
+        return found, found[-1]["seq"] if found else after
+    # Gaps are judged on the whole log, so the scan covers every entity; the
+    # cursor then moves past the other entities' events too.
+    scanned = settled(list(
+        db[EVENTS_COLLECTION].find(query, {"seq": 1, "logged_at": 1, "entity": 1}).sort("seq", ASCENDING).limit(FEED_SCAN)
+    ), after, now)
+    matching = [event["seq"] for event in scanned if event["entity"] == entity][:limit]
+    if len(matching) == limit:
+        cursor = matching[-1]
+    else:
+        cursor = scanned[-1]["seq"] if scanned else after
+    found = list(db[EVENTS_COLLECTION].find({"seq": {"$in": matching}}).sort("seq", ASCENDING)) if matching else []
+    return found, cursor
+
+
+def _claim(db, checkpoint, last_seq):
+    """
+    Moves the checkpoint from the value read (None when it has none yet) to
+    last_seq; False if another compactor moved or created it first.
+    """
+    try:
+        result = db[CHECKPOINTS_COLLECTION].update_one(
+            {"_id": CHECKPOINT_ID, "last_seq": checkpoint.get("last_seq")}, {"$set": {"last_seq": last_seq}},
+            upsert=not checkpoint)
+    except DuplicateKeyError:
+        return False
+    return result.upserted_id is not None or result.modified_count == 1
+
+
+def compact(db, batch=COMPACT_BATCH, now=None):
+    """Folds events after the checkpoint into current state and counters; returns events applied."""
+    applied = 0
+    while True:
+        checkpoint = db[CHECKPOINTS_COLLECTION].find_one({"_id": CHECKPOINT_ID}) or {}
+        previous = checkpoint.get("last_seq") or 0
+        events = settled(list(
+            db[EVENTS_COLLECTION].find({"seq": {"$gt": previous}}).sort("seq", ASCENDING).limit(batch)
+        ), previous, now)
+        if not events:
+            return applied
+        if not _claim(db, checkpoint, events[-1]["seq"]):
+            logger.warning("Event checkpoint moved by another compactor; stopping this run")
+            return applied
+        counts, state = {}, {}
+        for event in events:
+            for status, delta in ((event["from_status"], -1), (event["to_status"], 1)):
+                if status is not None:
+                    key = (event["entity"], event["warehouse_id"], status)
+                    counts[key] = counts.get(key, 0) + delta
+            state[f"{event['entity']}:{event['entity_id']}"] = event
+        counter_updates = [
+            UpdateOne({"entity": entity, "warehouse_id": warehouse_id, "status": status},
+                      {"$inc": {"count": delta}}, upsert=True)
+            for (entity, warehouse_id, status), delta in counts.items() if delta
+        ]
+        state_updates = [
+            DeleteOne({"_id": key}) if event["to_status"] is None else UpdateOne(
+                {"_id": key},
+                {"$set": {"entity": event["entity"], "entity_id": event["entity_id"],
+                          "warehouse_id": event["warehouse_id"], "status": event["to_status"],
+                          "updated_at": event["ts"], "last_seq": event["seq"]}},
+                upsert=True,
+            )
+            for key, event in state.items()
+        ]
+        if counter_updates:
+            db[COUNTS_COLLECTION].bulk_write(counter_updates, ordered=False)
+        db[STATE_COLLECTION].bulk_write(state_updates, ordered=False)
+        applied += len(events)
+
+
+def rebuild_counts(db, sources=SOURCES):
+    """
+    Recomputes status_counts from the source collections ({entity: collection
+    name}) and moves the checkpoint to the newest event; used at startup and
+    after bulk loads that bypass the API.
+    """
+    latest = db[EVENTS_COLLECTION].find_one({}, {"seq": 1}, sort=[("seq", -1)])
+    counts = []
+    for entity, collection in sources.items():
+        for row in db[collection].aggregate([
+            {"$group": {"_id": {"warehouse_id": {"$ifNull": ["$warehouse_id", None]}, "status": "$status"},
+                        "count": {"$sum": 1}}},
+        ]):
+            counts.append({"entity": entity, "warehouse_id": row["_id"]["warehouse_id"],
+                           "status": row["_id"]["status"], "count": row["count"]})
+    db[COUNTS_COLLECTION].delete_many({})
+    if counts:
+        db[COUNTS_COLLECTION].insert_many(counts)
+    db[CHECKPOINTS_COLLECTION].update_one(
+        {"_id": CHECKPOINT_ID}, {"$set": {"last_seq": latest.get("seq", 0) if latest else 0}}, upsert=True)
+
+
+def status_counts(db, entity, warehouse_id=None):
+    """{status: count} for an entity type, across warehouses unless one is given."""
+    match = {"entity": entity, "count": {"$ne": 0}}
+    if warehouse_id:
+        match["warehouse_id"] = warehouse_id
+    return {
+        row["_id"]: row["count"]
+        for row in db[COUNTS_COLLECTION].aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$status", "count": {"$sum": "$count"}}},
+        ])
+        if row["_id"] is not None and row["count"]
+    }
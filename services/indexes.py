@@ -0,0 +1,32 @@
+"""
+Indexes of the core collections.
+
+Created by the API bootstrap and again by populate_sample_data.py, which drops
+and reloads these collections (and their indexes with them). Every call is
+idempotent.
+"""
+
+
+def ensure(db):
+    db.users.create_index("username", unique=True)
+    db.warehouse.create_index("warehouse_id", unique=True, sparse=True)
+    # One item per (warehouse_id, sku); indexes created before it was unique are replaced.
+    if not db.inventory.index_information().get("warehouse_id_1_sku_1", {"unique": True}).get("unique"):
+        db.inventory.drop_index("warehouse_id_1_sku_1")
+    db.inventory.create_index([("warehouse_id", 1), ("sku", 1)], unique=True)
+    db.inventory.create_index([("warehouse_id", 1), ("bin_location", 1)])
+    db.orders.create_index("order_id")
+    db.orders.create_index("order_date")
+    db.orders.create_index([("warehouse_id", 1), ("status", 1), ("order_date", 1)])
+    db.orders.create_index([("status", 1), ("order_date", 1)])
+    db.orders.create_index(
+        [("order_id", "text"), ("customer_name", "text"), ("delivery_address", "text")],
+        name="orders_text",
+        weights={"order_id": 10, "customer_name": 5, "delivery_address": 1},
+        default_language="none",
+    )
+    db.deliveries.create_index("delivery_date")
+    db.deliveries.create_index([("status", 1), ("delivery_date", 1)])
+    db.deliveries.create_index([("warehouse_id", 1), ("status", 1), ("delivery_date", 1)])
+    db.deliveries.create_index([("agent_id", 1), ("status", 1)])
+    db.agents.create_index("agent_id", unique=True)
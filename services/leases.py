@@ -0,0 +1,63 @@
+"""
+Leader leases for background jobs that must run in one API worker at a time.
+
+Every worker starts the same daemon threads, but jobs that write shared state
+(ETA refresh, event compaction, snapshot rebuilds) should only run in one of
+them. Before each cycle a job calls Lease.acquire(): the first worker to claim
+a lease document in db.leases holds it and renews it every cycle; the others
+skip their cycle until the holder stops renewing and the lease expires. Leases
+should outlive a few cycles so that one slow cycle does not hand the job over.
+"""
+import datetime
+import os
+import socket
+
+from pymongo.errors import DuplicateKeyError
+
+LEASES_COLLECTION = "leases"
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire(collection, name, owner, seconds, now=None, fields=None, query=None):
+    """
+    Claims the lease `name` for `seconds` if it is free, expired or already
+    held by owner; True if owner holds it afterwards. `fields` are set on the
+    lease document along with the claim; an existing document must also match
+    `query` to be claimed.
+    """
+    now = now or datetime.datetime.utcnow()
+    try:
+        collection.update_one(
+            dict(query or {}, _id=name, **{"$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]}),
+            {"$set": dict(fields or {}, owner=owner, claimed_at=now,
+                          expires_at=now + datetime.timedelta(seconds=seconds))},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease; the upsert collided with its document.
+        return False
+    return True
+
+
+def release(collection, name, owner):
+    """Expires the lease if owner holds it, so another worker can take over at once."""
+    collection.update_one({"_id": name, "owner": owner}, {"$set": {"expires_at": datetime.datetime.min}})
+
+
+class Lease:
+    """One named lease held on behalf of this worker."""
+
+    def __init__(self, db, name, seconds, owner=None):
+        self.collection = db[LEASES_COLLECTION]
+        self.name = name
+        self.seconds = seconds
+        self.owner = owner or worker_id()
+
+    def acquire(self):
+        return acquire(self.collection, self.name, self.owner, self.seconds)
+
+    def release(self):
+        release(self.collection, self.name, self.owner)
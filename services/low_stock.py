@@ -0,0 +1,48 @@
+"""
+Materialized low-stock view.
+
+db.low_stock holds one document per (warehouse_id, sku) whose quantity is below
+its min_stock_level, with the shortfall. Every inventory write updates only the
+item it touched with `sync`, and `rebuild` recomputes the whole view from
+db.inventory in one aggregation (at startup and after bulk loads).
+"""
+LOW_STOCK_COLLECTION = "low_stock"
+FIELDS = ["sku", "name", "category", "quantity", "bin_location", "min_stock_level", "warehouse_id"]
+
+
+def stock_item(key):
+    warehouse_id, sku = key
+    return {"warehouse_id": warehouse_id, "sku": sku}
+
+
+def sync(db, key, item):
+    """Adds, refreshes or removes the low-stock entry for one (warehouse_id, sku) after a write."""
+    view = db[LOW_STOCK_COLLECTION]
+    new_key = (item.get("warehouse_id"), item["sku"]) if item is not None else key
+    if item is not None and item.get("quantity", 0) < item.get("min_stock_level", 0):
+        entry = {field: item.get(field) for field in FIELDS}
+        entry["shortfall"] = item["min_stock_level"] - item["quantity"]
+        view.replace_one(stock_item(new_key), entry, upsert=True)
+        if new_key != key:
+            view.delete_one(stock_item(key))
+    else:
+        view.delete_one(stock_item(key))
+        if new_key != key:
+            view.delete_one(stock_item(new_key))
+
+
+def rebuild(db):
+    """Recomputes the whole view from db.inventory."""
+    view = db[LOW_STOCK_COLLECTION]
+    projection = {field: 1 for field in FIELDS}
+    projection.update({"_id": 0, "shortfall": {"$subtract": ["$min_stock_level", "$quantity"]}})
+    # $out keeps the target's indexes; the old unique index on sku alone rejects SKUs stocked in several warehouses.
+    if "sku_1" in view.index_information():
+        view.drop_index("sku_1")
+    db.inventory.aggregate([
+        {"$match": {"$expr": {"$lt": ["$quantity", "$min_stock_level"]}}},
+        {"$project": projection},
+        {"$out": LOW_STOCK_COLLECTION},
+    ])
+    view.create_index([("warehouse_id", 1), ("sku", 1)], unique=True)
+    view.create_index([("warehouse_id", 1), ("shortfall", -1)])
@@ -0,0 +1,139 @@
+"""
+On-demand sampling profiler for API requests.
+
+While a request is being profiled, a background thread samples at a fixed
+interval the stack of the thread running the event loop and of any threadpool
+thread running the request's sync (def) handler. Samples are written in the
+collapsed-stack format ("frame;frame;frame count") understood by flamegraph.pl,
+speedscope and most flame-graph viewers.
+"""
+import collections
+import contextvars
+import datetime
+import functools
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+DEFAULT_MAX_PROFILES = 500
+
+# The profiler of the request being handled; copied into threadpool threads with the context.
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of the followed threads every `interval` seconds until stopped."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._token = _active_profiler.set(self)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        _active_profiler.reset(self._token)
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Returns the samples in collapsed-stack format, heaviest stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def follow_thread(func):
+    """
+    Wraps a sync endpoint so that, while its request is profiled, the
+    threadpool thread running it is sampled too.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profiler.thread_ids.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.thread_ids.discard(thread_id)
+    return wrapper
+
+
+def follow_sync_endpoints(app):
+    """Applies follow_thread to every def endpoint of a FastAPI app; call after all routes are added."""
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None and dependant.call is not None and not inspect.iscoroutinefunction(dependant.call):
+            dependant.call = follow_thread(dependant.call)
+
+
+class ProfileStore:
+    """Keeps the newest `max_files` profile artifacts as .folded files in a directory."""
+
+    def __init__(self, directory, max_files=DEFAULT_MAX_PROFILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, profiler):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{datetime.datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        with open(self._path(profile_id), "w") as f:
+            f.write(profiler.collapsed())
+        self.prune()
+        return profile_id
+
+    def prune(self):
+        """Deletes the oldest profiles beyond max_files; ids sort by creation time."""
+        for profile_id in self.list()[self.max_files:]:
+            try:
+                os.remove(self._path(profile_id))
+            except FileNotFoundError:
+                pass  # Removed concurrently by another worker.
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((n for n in os.listdir(self.directory) if n.endswith(".folded")), reverse=True)
+        return [n[: -len(".folded")] for n in names]
+
+    def load(self, profile_id):
+        if not PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(self._path(profile_id)):
+            return None
+        with open(self._path(profile_id)) as f:
+            return f.read()
+
+    def _path(self, profile_id):
+        return os.path.join(self.directory, f"{profile_id}.folded")
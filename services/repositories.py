@@ -0,0 +1,266 @@
+"""
+Keyed document repositories with an optional read-through cache.
+
+A repository stores documents of one collection under a unique key (inventory
+by (warehouse_id, sku), warehouses by warehouse_id, users by username) and
+offers get/find/insert/update/increment/delete. A key made of several fields is
+given as a tuple of field names, and its values as tuples in the same order.
+MongoRepository wraps a collection; MemoryRepository keeps documents in a dict
+for tests and offline benchmarks. The API only uses MongoRepository: its
+aggregations read the collections directly, so a separate store would diverge
+from them.
+
+CachedRepository puts an LRU in front of any repository: get() is served from
+memory after the first read, find() results are cached per filter, and every
+write through the repository evicts the key and all cached find() results.
+Writes that bypass the repository (other workers, bulk scripts, aggregation
+pipelines) are only picked up when an entry expires after `ttl` seconds, or
+when the caller invalidates the key.
+"""
+import collections
+import copy
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+DEFAULT_CACHE_ENTRIES = 10000
+DEFAULT_CACHE_TTL = 2.0
+
+
+def _matches(doc, filters):
+    return all(doc.get(field) == value for field, value in filters.items())
+
+
+def key_query(fields, key):
+    """Filter selecting the document with a key value."""
+    if isinstance(fields, tuple):
+        return dict(zip(fields, key))
+    return {fields: key}
+
+
+def key_of(fields, doc):
+    """Key value of a document; missing fields of a compound key are None."""
+    if isinstance(fields, tuple):
+        return tuple(doc.get(field) for field in fields)
+    return doc[fields]
+
+
+def changed_key(fields, key, changes):
+    """Key value after applying changes to the document with the given key."""
+    if isinstance(fields, tuple):
+        return tuple(changes.get(field, value) for field, value in zip(fields, key))
+    return changes.get(fields, key)
+
+
+class MongoRepository:
+    def __init__(self, collection, key):
+        self.collection = collection
+        self.key = key
+
+    def get(self, key):
+        return self.collection.find_one(key_query(self.key, key), {"_id": 0})
+
+    def find(self, filters=None):
+        return list(self.collection.find(dict(filters or {}), {"_id": 0}))
+
+    def insert(self, doc):
+        self.collection.insert_one(dict(doc))
+        return doc
+
+    def insert_missing(self, doc):
+        """Inserts doc unless its key exists; an upsert, so concurrent callers cannot duplicate it."""
+        self.collection.update_one(key_query(self.key, key_of(self.key, doc)), {"$setOnInsert": doc}, upsert=True)
+
+    def update(self, key, changes):
+        """Sets fields on a document; returns it after the update, or None if missing."""
+        return self.collection.find_one_and_update(
+            key_query(self.key, key), {"$set": changes}, {"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+    def increment(self, key, field, delta, minimum=None):
+        """
+        Adds delta to a numeric field, refusing (None) when the result would drop
+        below minimum. Missing documents also return None.
+        """
+        query = key_query(self.key, key)
+        if minimum is not None:
+            query[field] = {"$gte": minimum - delta}
+        return self.collection.find_one_and_update(
+            query, {"$inc": {field: delta}}, {"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+    def delete(self, key):
+        return self.collection.find_one_and_delete(key_query(self.key, key), {"_id": 0})
+
+    def exists(self, key):
+        return self.collection.count_documents(key_query(self.key, key), limit=1) > 0
+
+    def invalidate(self, *keys):
+        """Nothing is cached here; see CachedRepository."""
+
+
+class MemoryRepository:
+    """Dict-backed repository; documents are copied in and out so callers cannot alias them."""
+
+    def __init__(self, key):
+        self.key = key
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            doc = self._docs.get(key)
+            return copy.deepcopy(doc) if doc is not None else None
+
+    def find(self, filters=None):
+        with self._lock:
+            return [copy.deepcopy(doc) for doc in self._docs.values() if _matches(doc, filters or {})]
+
+    def insert(self, doc):
+        with self._lock:
+            self._docs[key_of(self.key, doc)] = copy.deepcopy(doc)
+        return doc
+
+    def insert_missing(self, doc):
+        with self._lock:
+            self._docs.setdefault(key_of(self.key, doc), copy.deepcopy(doc))
+
+    def update(self, key, changes):
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is None:
+                return None
+            doc.update(copy.deepcopy(changes))
+            if key_of(self.key, doc) != key:
+                self._docs[key_of(self.key, doc)] = self._docs.pop(key)
+            return copy.deepcopy(doc)
+
+    def increment(self, key, field, delta, minimum=None):
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is None or (minimum is not None and doc.get(field, 0) + delta < minimum):
+                return None
+            doc[field] = doc.get(field, 0) + delta
+            return copy.deepcopy(doc)
+
+    def delete(self, key):
+        with self._lock:
+            return self._docs.pop(key, None)
+
+    def exists(self, key):
+        with self._lock:
+            return key in self._docs
+
+    def invalidate(self, *keys):
+        """Nothing is cached here; see CachedRepository."""
+
+
+class CachedRepository:
+    """Read-through LRU with write invalidation in front of another repository."""
+
+    def __init__(self, inner, max_entries=DEFAULT_CACHE_ENTRIES, ttl=DEFAULT_CACHE_TTL):
+        self.inner = inner
+        self.key = inner.key
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()  # key -> (expires, doc)
+        self._finds = collections.OrderedDict()  # frozen filters -> (expires, docs)
+        # Bumped by every invalidation: a read that raced a write must not repopulate the cache.
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, table, key):
+        """(hit, value, generation) for a cache table; expired entries are dropped."""
+        with self._lock:
+            entry = table.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                table.move_to_end(key)
+                self.hits += 1
+                return True, entry[1], self._generation
+            if entry is not None:
+                del table[key]
+            self.misses += 1
+            return False, None, self._generation
+
+    def _store(self, table, key, value, generation):
+        """Caches value unless an invalidation happened since the read; evicts least recently used entries."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            table[key] = (time.monotonic() + self.ttl, value)
+            table.move_to_end(key)
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+
+    def get(self, key):
+        found, doc, generation = self._lookup(self._entries, key)
+        if not found:
+            doc = self.inner.get(key)
+            # Missing keys are cached too, so lookups of unknown SKUs stay cheap.
+            self._store(self._entries, key, doc, generation)
+        # Shallow copy: callers may add or pop fields on the result.
+        return dict(doc) if doc is not None else None
+
+    def find(self, filters=None):
+        cache_key = frozenset((filters or {}).items())
+        found, docs, generation = self._lookup(self._finds, cache_key)
+        if not found:
+            docs = self.inner.find(filters)
+            # Filters can come from request parameters, so this table is bounded like the one for keys.
+            self._store(self._finds, cache_key, docs, generation)
+        return [dict(doc) for doc in docs]
+
+    def invalidate(self, *keys):
+        """Evicts keys (all of them when none are given) and every cached find()."""
+        with self._lock:
+            self._generation += 1
+            if keys:
+                for key in keys:
+                    self._entries.pop(key, None)
+            else:
+                self._entries.clear()
+            self._finds.clear()
+
+    def insert(self, doc):
+        try:
+            return self.inner.insert(doc)
+        finally:
+            self.invalidate(key_of(self.key, doc))
+
+    def insert_missing(self, doc):
+        try:
+            self.inner.insert_missing(doc)
+        finally:
+            self.invalidate(key_of(self.key, doc))
+
+    def update(self, key, changes):
+        try:
+            return self.inner.update(key, changes)
+        finally:
+            self.invalidate(key, changed_key(self.key, key, changes))
+
+    def increment(self, key, field, delta, minimum=None):
+        try:
+            return self.inner.increment(key, field, delta, minimum)
+        finally:
+            self.invalidate(key)
+
+    def delete(self, key):
+        try:
+            return self.inner.delete(key)
+        finally:
+            self.invalidate(key)
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+
+def open_repository(db, collection, key, cache_entries=DEFAULT_CACHE_ENTRIES, cache_ttl=DEFAULT_CACHE_TTL):
+    """Repository for one collection, behind a read-through cache unless cache_entries is 0."""
+    repository = MongoRepository(db[collection], key)
+    if cache_entries > 0:
+        repository = CachedRepository(repository, cache_entries, cache_ttl)
+    return repository
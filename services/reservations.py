@@ -0,0 +1,159 @@
+"""
+Inventory reservation for order placement.
+
+An order line reserves stock with a conditional $inc on its inventory document:
+the filter requires quantity >= the amount taken, so concurrent buyers of the
+same SKU can never drive it below zero and no read-then-write race exists.
+Lines of one request are summed per SKU first, so a batch touches each hot
+document once instead of once per order.
+
+A cart is all-or-nothing. Outside a transaction, stock already taken for
+earlier SKUs is given back when a later one runs short; inside a transaction
+the abort undoes it. SKUs are always reserved in sorted order so concurrent
+carts touch shared documents in the same order.
+"""
+from pymongo import ReturnDocument
+
+MAX_BATCH_ATTEMPTS = 5  # re-reads of a contended SKU before falling back to per-line reservations
+
+
+class InsufficientStock(Exception):
+    """Raised when a SKU cannot cover a request; available is None for an unknown SKU."""
+
+    def __init__(self, sku, requested, available):
+        super().__init__(f"Insufficient stock for {sku}: requested {requested}, available {available}")
+        self.sku = sku
+        self.requested = requested
+        self.available = available
+
+
+def stock_key(line):
+    """(sku, warehouse_id) an order line draws from."""
+    return line["product_id"], line.get("warehouse_id")
+
+
+def _query(key):
+    sku, warehouse_id = key
+    return {"sku": sku, "warehouse_id": warehouse_id} if warehouse_id else {"sku": sku}
+
+
+def _sorted_keys(keys):
+    return sorted(keys, key=lambda key: (key[0], key[1] or ""))
+
+
+def _line_quantity(line):
+    value = int(line["quantity"])
+    if value <= 0:
+        raise ValueError(f"Order quantity must be positive, got {value}")
+    return value
+
+
+def demand(lines):
+    """Units requested per stock key."""
+    totals = {}
+    for line in lines:
+        totals[stock_key(line)] = totals.get(stock_key(line), 0) + _line_quantity(line)
+    return totals
+
+
+def take(inventory, key, quantity, session=None):
+    """Removes quantity from a SKU if it has that much; returns the updated document or None."""
+    return inventory.find_one_and_update(
+        dict(_query(key), quantity={"$gte": quantity}),
+        {"$inc": {"quantity": -quantity}},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+
+
+def available(inventory, key, session=None):
+    """Current quantity of a SKU, or None if it does not exist."""
+    doc = inventory.find_one(_query(key), {"_id": 0, "quantity": 1}, session=session)
+    return None if doc is None else doc.get("quantity", 0)
+
+
+def give_back(inventory, amounts, session=None):
+    """Returns reserved units ({key: quantity}) to stock; returns the updated documents."""
+    return [
+        inventory.find_one_and_update(
+            _query(key), {"$inc": {"quantity": quantity}},
+            return_document=ReturnDocument.AFTER, session=session,
+        )
+        for key, quantity in amounts.items() if quantity
+    ]
+
+
+def reserve_all(inventory, lines, session=None):
+    """
+    Reserves every line or none of them. Returns the updated inventory documents
+    by key; raises InsufficientStock for the first SKU that runs short.
+    """
+    totals = demand(lines)
+    reserved, docs = {}, {}
+    try:
+        for key in _sorted_keys(totals):
+            doc = take(inventory, key, totals[key], session)
+            if doc is None:
+                raise InsufficientStock(key[0], totals[key], available(inventory, key, session))
+            reserved[key], docs[key] = totals[key], doc
+    except Exception:
+        if session is None:
+            give_back(inventory, reserved)
+        raise
+    return docs
+
+
+def _fill(quantities, stock):
+    """Indices of the lines that fit in stock, first come first served."""
+    chosen = []
+    for index, quantity in quantities:
+        if quantity <= stock:
+            chosen.append(index)
+            stock -= quantity
+    return chosen
+
+
+def reserve_each(inventory, lines, session=None):
+    """
+    Reserves lines independently, as many as stock allows in input order.
+    Returns (accepted line indices, rejections {index: InsufficientStock},
+    updated inventory documents by key).
+    """
+    by_key = {}
+    for index, line in enumerate(lines):
+        by_key.setdefault(stock_key(line), []).append((index, _line_quantity(line)))
+    accepted, rejected, docs = [], {}, {}
+
+    for key in _sorted_keys(by_key):
+        quantities = by_key[key]
+        chosen = [index for index, _ in quantities]
+        doc = take(inventory, key, sum(q for _, q in quantities), session)
+        attempts = 0
+        while doc is None and attempts < MAX_BATCH_ATTEMPTS:
+            # Not enough for every line: size the reservation to what is there now.
+            stock = available(inventory, key, session)
+            chosen = _fill(quantities, stock or 0)
+            if not chosen:
+                break
+            attempts += 1
+            picked = set(chosen)
+            doc = take(inventory, key, sum(q for i, q in quantities if i in picked), session)
+        if doc is None and attempts == MAX_BATCH_ATTEMPTS:
+            # Stock keeps moving under us; reserve line by line instead.
+            chosen = []
+            for index, amount in quantities:
+                line_doc = take(inventory, key, amount, session)
+                if line_doc is not None:
+                    chosen.append(index)
+                    doc = line_doc
+        if doc is None:
+            chosen = []
+        else:
+            docs[key] = doc
+        accepted.extend(chosen)
+        kept = set(chosen)
+        left = doc["quantity"] if doc is not None else available(inventory, key, session)
+        for index, amount in quantities:
+            if index not in kept:
+                rejected[index] = InsufficientStock(key[0], amount, left)
+    return sorted(accepted), rejected, docs
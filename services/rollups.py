@@ -0,0 +1,152 @@
+"""
+Pre-aggregated daily order rollups.
+
+db.order_rollups holds one document per (day, status, product_id, warehouse_id) with the
+number of orders and units. Order writes adjust the affected rollups with
+upserted $inc updates, and `backfill` rebuilds them from db.orders in one
+aggregation, so trend queries only read a few documents per day.
+"""
+import datetime
+
+from pymongo import UpdateOne
+
+ROLLUP_COLLECTION = "order_rollups"
+
+
+def order_day(order_date):
+    """
+    Returns the UTC YYYY-MM-DD day of an order date given as a datetime or ISO
+    string, matching the day $dateToString computes in backfill. Naive
+    datetimes are taken as UTC, as pymongo stores them.
+    """
+    if isinstance(order_date, str):
+        try:
+            order_date = datetime.datetime.fromisoformat(order_date)
+        except ValueError:
+            return order_date[:10]
+    if isinstance(order_date, datetime.datetime) and order_date.tzinfo is not None:
+        order_date = order_date.astimezone(datetime.timezone.utc)
+    if isinstance(order_date, (datetime.datetime, datetime.date)):
+        return order_date.strftime("%Y-%m-%d")
+    return str(order_date or "")[:10]
+
+
+def ensure_indexes(db):
+    db[ROLLUP_COLLECTION].create_index(
+        [("day", 1), ("status", 1), ("product_id", 1), ("warehouse_id", 1)], unique=True)
+    db[ROLLUP_COLLECTION].create_index([("product_id", 1), ("day", 1)])
+    db[ROLLUP_COLLECTION].create_index([("warehouse_id", 1), ("day", 1)])
+
+
+def apply_order(db, order, sign=1):
+    """Adds (sign=1) or removes (sign=-1) one order from its rollup bucket."""
+    db[ROLLUP_COLLECTION].update_one(
+        {"day": order_day(order.get("order_date")), "status": order.get("status"),
+         "product_id": order.get("product_id"), "warehouse_id": order.get("warehouse_id")},
+        {"$inc": {"orders": sign, "units": sign * int(order.get("quantity") or 0)}},
+        upsert=True,
+    )
+
+
+def apply_orders(db, orders, sign=1):
+    """apply_order for many orders: one upsert per touched bucket in a single bulk_write."""
+    buckets = {}
+    for order in orders:
+        key = (order_day(order.get("order_date")), order.get("status"),
+               order.get("product_id"), order.get("warehouse_id"))
+        counts = buckets.setdefault(key, [0, 0])
+        counts[0] += sign
+        counts[1] += sign * int(order.get("quantity") or 0)
+    if buckets:
+        db[ROLLUP_COLLECTION].bulk_write([
+            UpdateOne(
+                {"day": day, "status": status, "product_id": product_id, "warehouse_id": warehouse_id},
+                {"$inc": {"orders": orders_delta, "units": units_delta}},
+                upsert=True,
+            )
+            for (day, status, product_id, warehouse_id), (orders_delta, units_delta) in buckets.items()
+        ], ordered=False)
+
+
+def apply_order_change(db, before, after):
+    """Moves an order between buckets when a patch changes any rollup key or its quantity."""
+    fields = ("order_date", "status", "product_id", "warehouse_id", "quantity")
+    if any(before.get(f) != after.get(f) for f in fields):
+        apply_order(db, before, -1)
+        apply_order(db, after, 1)
+
+
+def backfill(db):
+    """Rebuilds the rollup collection from every order."""
+    db.orders.aggregate([
+        {"$group": {
+            "_id": {
+                # Dates not yet converted by migrate_dates.py are still ISO strings, possibly with
+                # an offset; parse them so they land on the same UTC day as converted dates.
+                "day": {"$let": {
+                    "vars": {"date": {"$cond": [
+                        {"$eq": [{"$type": "$order_date"}, "date"]},
+                        "$order_date",
+                        {"$dateFromString": {"dateString": "$order_date", "onError": None, "onNull": None}},
+                    ]}},
+                    "in": {"$cond": [
+                        {"$eq": ["$$date", None]},
+                        {"$substrBytes": ["$order_date", 0, 10]},
+                        {"$dateToString": {"format": "%Y-%m-%d", "date": "$$date"}},
+                    ]},
+                }},
+                "status": "$status",
+                "product_id": "$product_id",
+                "warehouse_id": {"$ifNull": ["$warehouse_id", None]},
+            },
+            "orders": {"$sum": 1},
+            "units": {"$sum": "$quantity"},
+        }},
+        {"$project": {"_id": 0, "day": "$_id.day", "status": "$_id.status",
+                      "product_id": "$_id.product_id", "warehouse_id": "$_id.warehouse_id",
+                      "orders": 1, "units": 1}},
+        {"$out": ROLLUP_COLLECTION},
+    ], allowDiskUse=True)
+    ensure_indexes(db)
+
+
+def week_start(day):
+    date = datetime.date.fromisoformat(day)
+    return (date - datetime.timedelta(days=date.weekday())).isoformat()
+
+
+def series(db, granularity="day", start=None, end=None, status=None, product_id=None, warehouse_id=None):
+    """
+    Returns order and unit totals per day (or per ISO week, keyed by its Monday)
+    with a per-status breakdown, oldest period first.
+    """
+    match = {}
+    if start or end:
+        match["day"] = {}
+        if start:
+            match["day"]["$gte"] = start
+        if end:
+            match["day"]["$lte"] = end
+    if status:
+        match["status"] = status
+    if product_id:
+        match["product_id"] = product_id
+    if warehouse_id:
+        match["warehouse_id"] = warehouse_id
+    rows = db[ROLLUP_COLLECTION].aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"day": "$day", "status": "$status"},
+                    "orders": {"$sum": "$orders"}, "units": {"$sum": "$units"}}},
+    ])
+
+    periods = {}
+    for row in rows:
+        day = row["_id"]["day"]
+        period = week_start(day) if granularity == "week" else day
+        bucket = periods.setdefault(period, {"period": period, "orders": 0, "units": 0, "by_status": {}})
+        bucket["orders"] += row["orders"]
+        bucket["units"] += row["units"]
+        by_status = bucket["by_status"]
+        by_status[row["_id"]["status"]] = by_status.get(row["_id"]["status"], 0) + row["orders"]
+    # Buckets emptied by status changes keep a zero count; leave them out.
+    return [periods[p] for p in sorted(periods) if periods[p]["orders"]]
@@ -0,0 +1,126 @@
+"""
+ABC slotting optimizer.
+
+SKUs are ranked by pick velocity (order lines) and classified A/B/C by their
+cumulative share of picks. Travel is modelled as a round trip from the dock to
+the bin along the warehouse grid (Manhattan distance), so expected travel is
+sum(picks * distance). By the rearrangement inequality that sum is minimized by
+giving the fastest movers the closest bins, which is what the proposal does
+over the bins the SKUs already occupy. Everything is vectorized so 100k SKUs
+and millions of order lines compute in seconds.
+"""
+import numpy as np
+import pandas as pd
+
+from services.bins import parse_bin_locations
+
+DEFAULT_CLASS_SHARES = (0.8, 0.95)  # cumulative pick share closing classes A and B
+
+
+def pick_velocity(order_lines):
+    """Groups order lines (product_id, quantity) into picks and units per SKU."""
+    grouped = order_lines.groupby("product_id", sort=False)["quantity"].agg(["size", "sum"])
+    return grouped.rename(columns={"size": "picks", "sum": "units"}).rename_axis("sku").reset_index()
+
+
+def abc_classes(picks, groups=None, shares=DEFAULT_CLASS_SHARES):
+    """
+    A/B/C label per SKU from its picks, ranked within each group (warehouse).
+    The SKU crossing a threshold stays in the faster class.
+    """
+    picks = pd.Series(np.asarray(picks, dtype=np.float64))
+    groups = pd.Series(np.zeros(len(picks), dtype=np.int64) if groups is None else np.asarray(groups))
+    order = np.lexsort((-picks.to_numpy(), groups.to_numpy()))
+    ranked, ranked_groups = picks.iloc[order].reset_index(drop=True), groups.iloc[order].reset_index(drop=True)
+    totals = ranked.groupby(ranked_groups).transform("sum").to_numpy()
+    cumulative = ranked.groupby(ranked_groups).cumsum().to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share_before = np.where(totals > 0, (cumulative - ranked.to_numpy()) / totals, 1.0)
+    labels = np.empty(len(picks), dtype=object)
+    labels[order] = np.where(share_before < shares[0], "A", np.where(share_before < shares[1], "B", "C"))
+    return labels
+
+
+def propose_slotting(inventory, velocity, dock=(0, 0), shares=DEFAULT_CLASS_SHARES):
+    """
+    inventory: DataFrame with sku and bin_location; velocity: DataFrame with sku,
+    picks and units. When both carry a warehouse_id, SKUs are classified and
+    reassigned within their own warehouse. Returns a DataFrame with one row per
+    SKU including its class, current and proposed bin and the travel saved.
+    """
+    keys = ["warehouse_id", "sku"] if "warehouse_id" in inventory and "warehouse_id" in velocity else ["sku"]
+    df = inventory[keys + ["bin_location"]].merge(velocity, on=keys, how="left")
+    # An empty velocity frame (no orders in the window) merges in object columns.
+    df[["picks", "units"]] = df[["picks", "units"]].apply(pd.to_numeric).fillna(0).astype(np.int64)
+    rows, cols = parse_bin_locations(df["bin_location"])
+    df["distance"] = np.abs(rows - dock[0]) + np.abs(cols - dock[1])
+    if not df["picks"].any():
+        # Nothing was picked: every SKU is class C and stays where it is.
+        return df.assign(abc_class="C", proposed_bin=df["bin_location"], proposed_distance=df["distance"],
+                         current_travel=0, proposed_travel=0, travel_saved=0)
+    groups = pd.factorize(df["warehouse_id"])[0] if len(keys) > 1 else np.zeros(len(df), dtype=np.int64)
+    df["abc_class"] = abc_classes(df["picks"].to_numpy(), groups, shares)
+
+    # Within each warehouse, the k-th fastest SKU takes the k-th closest bin. Ties
+    # on picks keep SKUs that are already close near the front so they move less.
+    distance = df["distance"].to_numpy()
+    sku_order = np.lexsort((distance, -df["picks"].to_numpy(), groups))
+    bin_order = np.lexsort((distance, groups))
+    proposed_bin = np.empty(len(df), dtype=object)
+    proposed_distance = np.empty(len(df), dtype=np.int64)
+    proposed_bin[sku_order] = df["bin_location"].to_numpy(dtype=object)[bin_order]
+    proposed_distance[sku_order] = distance[bin_order]
+
+    blocks = pd.factorize(pd.MultiIndex.from_arrays([groups, df["picks"].to_numpy()]))[0]
+    df["proposed_bin"], df["proposed_distance"] = _keep_ties_in_place(
+        blocks, df["bin_location"].to_numpy(dtype=object), distance, proposed_bin, proposed_distance
+    )
+    # Round trip dock -> bin -> dock per pick.
+    df["current_travel"] = 2 * df["picks"] * df["distance"]
+    df["proposed_travel"] = 2 * df["picks"] * df["proposed_distance"]
+    df["travel_saved"] = df["current_travel"] - df["proposed_travel"]
+    return df
+
+
+def _keep_ties_in_place(blocks, bins, distance, proposed_bin, proposed_distance):
+    """
+    SKUs with equal picks in the same warehouse are interchangeable, so any SKU
+    whose current bin went to its tie block keeps it and only the rest move.
+    Travel is unchanged; the number of physical moves drops.
+    """
+    current = pd.DataFrame({"block": blocks, "bin": bins, "distance": distance})
+    current["occurrence"] = current.groupby(["block", "bin"]).cumcount()
+    proposed = pd.DataFrame({"block": blocks, "bin": proposed_bin, "distance": proposed_distance})
+    proposed["occurrence"] = proposed.groupby(["block", "bin"]).cumcount()
+
+    keys = ["block", "bin", "occurrence"]
+    stays = current.set_index(keys).index.isin(proposed.set_index(keys).index)
+    taken = proposed.set_index(keys).index.isin(current.set_index(keys).index)
+
+    # Each block has as many leftover SKUs as leftover bins; pair them closest first.
+    movers = current[~stays].sort_values(["block", "distance"], kind="stable").index.to_numpy()
+    free = proposed[~taken].sort_values(["block", "distance"], kind="stable")
+    new_bin, new_distance = bins.copy(), distance.copy()
+    new_bin[movers] = free["bin"].to_numpy()
+    new_distance[movers] = free["distance"].to_numpy()
+    return new_bin, new_distance
+
+
+def summarize(proposal, limit=100):
+    """JSON-ready summary: totals, class counts and the most valuable moves."""
+    current = float(proposal["current_travel"].sum())
+    proposed = float(proposal["proposed_travel"].sum())
+    moves = proposal[proposal["proposed_bin"] != proposal["bin_location"]]
+    top = moves.nlargest(limit, "travel_saved") if limit else moves.sort_values("travel_saved", ascending=False)
+    columns = ["sku", "abc_class", "picks", "units", "bin_location", "proposed_bin", "travel_saved"]
+    if "warehouse_id" in proposal.columns:
+        columns.insert(0, "warehouse_id")
+    return {
+        "skus": int(len(proposal)),
+        "moves": int(len(moves)),
+        "current_travel": current,
+        "proposed_travel": proposed,
+        "savings_pct": round((current - proposed) / current * 100, 2) if current else 0.0,
+        "class_counts": {k: int(v) for k, v in proposal["abc_class"].value_counts().sort_index().items()},
+        "top_moves": top[columns].astype({"picks": int, "units": int, "travel_saved": float}).to_dict("records"),
+    }
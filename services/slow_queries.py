@@ -0,0 +1,193 @@
+"""
+Slow-query log for MongoDB commands.
+
+A pymongo command listener flags commands slower than a threshold and logs them
+with their collection, redacted filter shape, duration and documents returned.
+An explain() summary (plan stages, indexes used, documents examined) is captured
+on a background thread, rate-limited and cached per query shape so the logging
+itself cannot turn into load on the database.
+"""
+import collections
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import monitoring
+
+from services.metrics import command_collection, documents_returned
+
+logger = logging.getLogger("walmart.slow_queries")
+
+# Commands that MongoDB can explain, mapped to where their filter lives.
+EXPLAINABLE = {
+    "find": lambda cmd: cmd.get("filter", {}),
+    "count": lambda cmd: cmd.get("query", {}),
+    "distinct": lambda cmd: cmd.get("query", {}),
+    "findAndModify": lambda cmd: cmd.get("query", {}),
+    "aggregate": lambda cmd: next((s["$match"] for s in cmd.get("pipeline", []) if "$match" in s), {}),
+    "update": lambda cmd: (cmd.get("updates") or [{}])[0].get("q", {}),
+    "delete": lambda cmd: (cmd.get("deletes") or [{}])[0].get("q", {}),
+}
+
+# Session and routing fields that must not be replayed inside an explain command.
+_COMMAND_METADATA = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber",
+                     "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+
+def redact(value):
+    """Replaces literal values with "?" while keeping field names and operators."""
+    if isinstance(value, dict):
+        return {k: redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Keep the structure of $and/$or clauses; collapse lists of literals.
+        return [redact(v) for v in value] if value and all(isinstance(v, dict) for v in value) else "?"
+    return "?"
+
+
+def summarize_explain(explain):
+    """Reduces explain() output to the plan stages, indexes and execution counters."""
+    planner, stats = _find_key(explain, "queryPlanner"), _find_key(explain, "executionStats")
+    stages, indexes = [], []
+    plan = (planner or {}).get("winningPlan", {})
+    while plan:
+        stage = plan.get("stage") or plan.get("queryPlan", {}).get("stage")
+        if stage:
+            stages.append(stage)
+        if plan.get("indexName"):
+            indexes.append(plan["indexName"])
+        plan = plan.get("inputStage") or plan.get("queryPlan", {}).get("inputStage") or {}
+    stats = stats or {}
+    return {
+        "plan": stages,
+        "indexes": indexes,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "n_returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+def _find_key(doc, key):
+    # Aggregate explains nest the find-layer plan under stages[0]["$cursor"].
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        values = doc.values()
+    elif isinstance(doc, list):
+        values = doc
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+class RateLimiter:
+    """Token bucket allowing `per_minute` operations with a burst of the same size."""
+
+    def __init__(self, per_minute):
+        self.capacity = max(per_minute, 0)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """pymongo command listener that logs and explains slow commands."""
+
+    def __init__(self, threshold_ms=100, explains_per_minute=6, explain_ttl=300, history=200,
+                 max_explained=500):
+        self.threshold_micros = threshold_ms * 1000
+        self.explain_ttl = explain_ttl
+        self.max_explained = max_explained
+        self.recent = collections.deque(maxlen=history)
+        self._client = None
+        self._limiter = RateLimiter(explains_per_minute)
+        self._explained = collections.OrderedDict()  # query shape -> (explained at, summary), LRU
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+    def bind(self, client):
+        """Sets the client used to run explain commands."""
+        self._client = client
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            with self._lock:
+                self._pending[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None or event.duration_micros < self.threshold_micros:
+            return
+        database, command = pending
+        shape = redact(EXPLAINABLE[event.command_name](command))
+        entry = {
+            "time": time.time(),
+            "collection": command_collection(event.command_name, command),
+            "command": event.command_name,
+            "filter": shape,
+            "duration_ms": round(event.duration_micros / 1000, 2),
+            "docs_returned": documents_returned(event.reply),
+            "explain": None,
+        }
+        key = (database, entry["collection"], entry["command"], json.dumps(shape, sort_keys=True))
+        cached = self._cached_explain(key)
+        if cached is not None:
+            entry["explain"] = cached
+            self._record(entry)
+        elif self._client is not None and self._limiter.allow():
+            self._executor.submit(self._explain_and_record, key, database, command, entry)
+        else:
+            self._record(entry)
+
+    def failed(self, event):
+        with self._lock:
+            self._pending.pop((event.connection_id, event.request_id), None)
+
+    def _cached_explain(self, key):
+        with self._lock:
+            cached = self._explained.get(key)
+            if cached is None:
+                return None
+            if time.monotonic() - cached[0] >= self.explain_ttl:
+                del self._explained[key]
+                return None
+            self._explained.move_to_end(key)
+            return cached[1]
+
+    def _explain_and_record(self, key, database, command, entry):
+        try:
+            explainable = {k: v for k, v in command.items() if k not in _COMMAND_METADATA}
+            explain = self._client[database].command(
+                {"explain": explainable, "verbosity": "executionStats"})
+            entry["explain"] = summarize_explain(explain)
+            with self._lock:
+                self._explained[key] = (time.monotonic(), entry["explain"])
+                self._explained.move_to_end(key)
+                while len(self._explained) > self.max_explained:
+                    self._explained.popitem(last=False)
+        except Exception as e:
+            entry["explain"] = {"error": str(e)}
+        self._record(entry)
+
+    def _record(self, entry):
+        self.recent.append(entry)
+        logger.warning("Slow query: %s", json.dumps(entry, default=str))
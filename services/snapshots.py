@@ -0,0 +1,157 @@
+"""
+Precomputed dashboard snapshots.
+
+Each dashboard page registers a builder that turns the database into a small
+JSON-ready payload (KPIs, aggregates, top-N tables). Snapshots are built on
+first request for a (page, warehouse_id) pair and then rebuilt by a background
+thread for as long as someone keeps asking for them, so every session reads the
+same in-memory payload instead of recomputing it.
+
+With a collection bound (see bind), the snapshots are shared by every API
+worker: only the worker holding the refresh lease rebuilds them and stores
+them in the collection, the others reload their copies from it each interval.
+Workers record which snapshots are still requested in the collection, so the
+leader rebuilds the snapshots any worker serves. Without a collection each
+worker builds its own.
+
+The version of a snapshot is a hash of its content: it only changes when the
+data does, which lets clients revalidate with If-None-Match.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("walmart.snapshots")
+
+
+def _version(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def _doc_id(page, warehouse_id):
+    return f"{page}:{warehouse_id or ''}"
+
+
+class SnapshotStore:
+    def __init__(self, builders, interval=30.0, idle_timeout=600.0):
+        self.builders = builders
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._snapshots = {}
+        self._last_requested = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.collection = None
+        self.lease = None
+
+    def bind(self, collection, lease=None):
+        """Shares snapshots through a collection; with a services.leases.Lease only its holder rebuilds them."""
+        self.collection = collection
+        self.lease = lease
+
+    def get(self, page, warehouse_id=None):
+        """Returns the snapshot for a page, building it now if it has never been built."""
+        if page not in self.builders:
+            raise KeyError(page)
+        key = (page, warehouse_id)
+        with self._lock:
+            self._last_requested[key] = time.monotonic()
+            snapshot = self._snapshots.get(key)
+        if snapshot is None and self.collection is not None:
+            snapshot = self._load([key]).get(key)
+        return snapshot or self.build(page, warehouse_id)
+
+    def build(self, page, warehouse_id=None):
+        started = time.perf_counter()
+        data = self.builders[page](warehouse_id)
+        snapshot = {
+            "page": page,
+            "warehouse_id": warehouse_id,
+            "version": _version(data),
+            "built_at": datetime.datetime.utcnow(),
+            "build_seconds": round(time.perf_counter() - started, 3),
+            "data": data,
+        }
+        with self._lock:
+            # The lease holder also builds snapshots only other workers serve; it does not keep those.
+            if (page, warehouse_id) in self._last_requested or self.collection is None:
+                self._snapshots[(page, warehouse_id)] = snapshot
+        if self.collection is not None:
+            self.collection.update_one(
+                {"_id": _doc_id(page, warehouse_id)},
+                {"$set": snapshot, "$setOnInsert": {"requested_at": snapshot["built_at"]}},
+                upsert=True,
+            )
+        return snapshot
+
+    def _load(self, keys):
+        """Copies the stored snapshots of keys into this worker; returns {key: snapshot} of those found."""
+        found = {}
+        for doc in self.collection.find({"_id": {"$in": [_doc_id(*key) for key in keys]}}, {"requested_at": 0}):
+            doc.pop("_id")
+            found[(doc["page"], doc["warehouse_id"])] = doc
+        with self._lock:
+            for key, snapshot in found.items():
+                if key in self._last_requested:
+                    self._snapshots[key] = snapshot
+        return found
+
+    def refresh(self):
+        """Rebuilds every snapshot requested within idle_timeout and forgets the rest."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, seen in self._last_requested.items() if now - seen > self.idle_timeout]
+            for key in idle:
+                self._last_requested.pop(key)
+                self._snapshots.pop(key, None)
+            keys = list(self._last_requested)
+        if self.collection is not None:
+            keys = self._refresh_shared(keys)
+        for page, warehouse_id in keys:
+            try:
+                self.build(page, warehouse_id)
+            except Exception:
+                logger.exception("Snapshot build failed for %s (warehouse %s)", page, warehouse_id)
+
+    def _refresh_shared(self, keys):
+        """
+        Records this worker's requested keys, then returns the keys to rebuild:
+        every key requested by any worker for the lease holder, none otherwise.
+        """
+        now = datetime.datetime.utcnow()
+        if keys:
+            self.collection.update_many({"_id": {"$in": [_doc_id(*key) for key in keys]}},
+                                        {"$set": {"requested_at": now}})
+        if self.lease is not None and not self.lease.acquire():
+            if keys:
+                self._load(keys)
+            return []
+        cutoff = now - datetime.timedelta(seconds=self.idle_timeout)
+        self.collection.delete_many({"requested_at": {"$lt": cutoff}})
+        return [(doc["page"], doc["warehouse_id"]) for doc in self.collection.find({}, {"page": 1, "warehouse_id": 1})]
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="snapshot-builder", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+            if self.lease is not None:
+                self.lease.release()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Snapshot refresh failed")
@@ -0,0 +1,122 @@
+"""
+GPS breadcrumbs for delivery agents.
+
+Devices post pings in batches. Every ping is stored in a MongoDB time-series
+collection keyed by agent_id (the metaField, so each agent's pings share
+buckets) and expires after a TTL. The newest ping per agent in a batch also
+refreshes the agent's position and the last known position of its in-transit
+deliveries, which feed agent assignment and ETA recomputation.
+
+Tracks are simplified with Douglas-Peucker before they leave the server, so a
+day of one-second pings draws as a few hundred points.
+"""
+import datetime
+
+import numpy as np
+from pymongo import UpdateMany, UpdateOne
+
+from services.geo import EARTH_RADIUS_KM
+
+PINGS_COLLECTION = "agent_pings"
+DEFAULT_TTL_SECONDS = 72 * 3600
+
+
+def ensure_collection(db, ttl_seconds=DEFAULT_TTL_SECONDS):
+    """Creates the time-series collection, or updates its TTL if it already exists."""
+    if PINGS_COLLECTION in db.list_collection_names():
+        db.command("collMod", PINGS_COLLECTION, expireAfterSeconds=ttl_seconds)
+    else:
+        db.create_collection(
+            PINGS_COLLECTION,
+            timeseries={"timeField": "ts", "metaField": "agent_id", "granularity": "seconds"},
+            expireAfterSeconds=ttl_seconds,
+        )
+    db[PINGS_COLLECTION].create_index([("agent_id", 1), ("ts", 1)])
+
+
+def ingest(db, pings, now=None):
+    """
+    Stores a batch of ping dicts (agent_id, latitude, longitude and optional
+    ts, delivery_id, speed) and refreshes latest positions. Returns the number
+    of pings stored.
+    """
+    now = now or datetime.datetime.utcnow()
+    docs, latest = [], {}
+    for ping in pings:
+        doc = {k: v for k, v in ping.items() if v is not None}
+        doc.setdefault("ts", now)
+        if doc["ts"].tzinfo is not None:
+            doc["ts"] = doc["ts"].astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        docs.append(doc)
+        if doc["agent_id"] not in latest or doc["ts"] >= latest[doc["agent_id"]]["ts"]:
+            latest[doc["agent_id"]] = doc
+    if not docs:
+        return 0
+    db[PINGS_COLLECTION].insert_many(docs, ordered=False)
+
+    agent_updates, delivery_updates = [], []
+    for agent_id, doc in latest.items():
+        agent_updates.append(UpdateOne(
+            {"agent_id": agent_id},
+            {"$set": {"latitude": doc["latitude"], "longitude": doc["longitude"], "last_seen": doc["ts"]}},
+        ))
+        delivery_updates.append(UpdateMany(
+            {"agent_id": agent_id, "status": "in-transit"},
+            {"$set": {"last_latitude": doc["latitude"], "last_longitude": doc["longitude"]}},
+        ))
+    db.agents.bulk_write(agent_updates, ordered=False)
+    db.deliveries.bulk_write(delivery_updates, ordered=False)
+    return len(docs)
+
+
+def douglas_peucker(x, y, tolerance):
+    """Boolean mask of the points kept by Douglas-Peucker at `tolerance` (same units as x/y)."""
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length = np.hypot(dx, dy)
+        # Distance to the chord, or to its start point when the chord has no length.
+        distance = np.abs(px * dy - py * dx) / length if length > 0 else np.hypot(px, py)
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def simplify_track(latitudes, longitudes, tolerance_m):
+    """Douglas-Peucker on an equirectangular projection in metres; returns the kept-point mask."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    if not len(lat):
+        return np.zeros(0, dtype=bool)
+    radius_m = EARTH_RADIUS_KM * 1000
+    return douglas_peucker(lng * np.cos(lat.mean()) * radius_m, lat * radius_m, tolerance_m)
+
+
+def track(db, agent_id, start, end, tolerance_m=20.0, max_points=2000):
+    """Simplified [latitude, longitude, ts] points of one agent's pings in [start, end)."""
+    pings = list(db[PINGS_COLLECTION].find(
+        {"agent_id": agent_id, "ts": {"$gte": start, "$lt": end}},
+        {"_id": 0, "latitude": 1, "longitude": 1, "ts": 1},
+    ).sort("ts", 1))
+    keep = np.flatnonzero(simplify_track([p["latitude"] for p in pings], [p["longitude"] for p in pings], tolerance_m))
+    if len(keep) > max_points:
+        # Still too dense for the map: thin evenly but keep both ends.
+        keep = keep[np.unique(np.linspace(0, len(keep) - 1, max_points).round().astype(np.int64))]
+    return {
+        "agent_id": agent_id,
+        "raw_points": len(pings),
+        "points": [[pings[i]["latitude"], pings[i]["longitude"], pings[i]["ts"]] for i in keep.tolist()],
+    }
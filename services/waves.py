@@ -0,0 +1,100 @@
+"""
+Wave picking planner.
+
+Pending order lines are located by their SKU's bin, walked in serpentine order
+(aisle row by row, alternating direction along each row) so neighbouring bins
+end up next to each other, and cut into waves whenever the next order would
+overflow the cart's unit capacity or order slots. Each wave's bins are then
+sequenced with a nearest-neighbour tour from the dock on the grid (Manhattan
+distance), returning to the dock at the end.
+"""
+import numpy as np
+import pandas as pd
+
+from services.bins import parse_bin_locations
+
+DEFAULT_CART_CAPACITY = 200  # units per cart
+DEFAULT_MAX_ORDERS = 40      # order slots per cart
+
+
+def cut_waves(groups, quantities, cart_capacity, max_orders):
+    """Greedy wave numbers for orders already in walking order; a group change starts a new wave."""
+    waves = np.empty(len(quantities), dtype=np.int64)
+    wave, units, orders, previous = -1, 0, 0, None
+    for i, (group, quantity) in enumerate(zip(groups.tolist(), quantities.tolist())):
+        if wave < 0 or group != previous or units + quantity > cart_capacity or orders >= max_orders:
+            wave, units, orders, previous = wave + 1, 0, 0, group
+        units += quantity
+        orders += 1
+        waves[i] = wave
+    return waves
+
+
+def nearest_neighbour_tour(rows, cols, dock=(0, 0)):
+    """Visit order for the stops and the total round-trip distance from the dock."""
+    remaining = np.ones(len(rows), dtype=bool)
+    position = np.array(dock)
+    tour, distance = [], 0
+    for _ in range(len(rows)):
+        steps = np.abs(rows - position[0]) + np.abs(cols - position[1])
+        steps = np.where(remaining, steps, np.iinfo(np.int64).max)
+        nearest = int(np.argmin(steps))
+        tour.append(nearest)
+        distance += int(steps[nearest])
+        remaining[nearest] = False
+        position = (rows[nearest], cols[nearest])
+    if tour:
+        distance += abs(int(position[0]) - dock[0]) + abs(int(position[1]) - dock[1])
+    return tour, distance
+
+
+def plan_waves(lines, cart_capacity=DEFAULT_CART_CAPACITY, max_orders=DEFAULT_MAX_ORDERS, dock=(0, 0)):
+    """
+    lines: DataFrame with order_id, quantity and bin_location, plus an optional
+    warehouse_id (waves never mix warehouses). Returns a list of waves, each
+    with its orders, units, round-trip distance and sequenced stops.
+    """
+    df = lines.reset_index(drop=True)
+    if "warehouse_id" not in df:
+        df["warehouse_id"] = None
+    df["quantity"] = df["quantity"].fillna(0).astype(np.int64)
+    df["row"], df["col"] = parse_bin_locations(df["bin_location"])
+    # Serpentine walk: even rows left to right, odd rows right to left.
+    df["walk"] = np.where(df["row"] % 2 == 0, df["col"], -df["col"])
+    groups = pd.factorize(df["warehouse_id"])[0]
+    bins = pd.factorize(df["bin_location"])[0]
+    order = np.lexsort((bins, df["walk"].to_numpy(), df["row"].to_numpy(), groups))
+    wave_of_line = cut_waves(groups[order], df["quantity"].to_numpy()[order], cart_capacity, max_orders)
+    if not len(order):
+        return []
+
+    # Lines of one bin are contiguous within a wave, so stops are runs of equal (wave, bin).
+    bins = bins[order]
+    stop_starts = np.flatnonzero(np.r_[True, (np.diff(wave_of_line) != 0) | (np.diff(bins) != 0)])
+    stop_wave = wave_of_line[stop_starts]
+    stop_units = np.add.reduceat(df["quantity"].to_numpy()[order], stop_starts)
+    stop_rows, stop_cols = df["row"].to_numpy()[order][stop_starts], df["col"].to_numpy()[order][stop_starts]
+    stop_bins = df["bin_location"].to_numpy(dtype=object)[order][stop_starts]
+    order_ids = df["order_id"].to_numpy(dtype=object)[order].tolist()
+    stop_ends = np.r_[stop_starts[1:], len(order)]
+    warehouses = df["warehouse_id"].to_numpy(dtype=object)[order]
+
+    waves = []
+    wave_bounds = np.flatnonzero(np.r_[True, np.diff(stop_wave) != 0, True])
+    for wave, (first, last) in enumerate(zip(wave_bounds[:-1], wave_bounds[1:])):
+        tour, distance = nearest_neighbour_tour(stop_rows[first:last], stop_cols[first:last], dock)
+        stops = [{
+            "bin_location": stop_bins[first + i],
+            "units": int(stop_units[first + i]),
+            "order_ids": order_ids[stop_starts[first + i]:stop_ends[first + i]],
+        } for i in tour]
+        waves.append({
+            "wave": wave + 1,
+            "warehouse_id": warehouses[stop_starts[first]],
+            "orders": int(stop_ends[last - 1] - stop_starts[first]),
+            "units": int(stop_units[first:last].sum()),
+            "distance": distance,
+            "order_ids": [oid for stop in stops for oid in stop["order_ids"]],
+            "stops": stops,
+        })
+    return waves
@@ -1,14 +1,23 @@
 import streamlit as st
-import pandas as pd
 import datetime
 import folium
 from streamlit_folium import folium_static
-from utils.api import get_data, patch_data
-from utils.helpers import display_kpi_metrics, format_date, show_notification
+from utils.api import get_data, get_snapshot, patch_data, post_data, with_params
+from utils.helpers import snapshot_caption
+from utils.frames import build_frame, register_frame
 
 @st.cache_data(ttl=10)
-def fetch_deliveries():
-    return get_data("deliveries")
+def fetch_deliveries(warehouse_id):
+    deliveries = get_data(with_params("deliveries", warehouse_id=warehouse_id))
+    return None if deliveries is None else build_frame(deliveries, "deliveries")
+
+@st.cache_data(ttl=10)
+def fetch_snapshot(warehouse_id):
+    return get_snapshot("deliveries", warehouse_id)
+
+@st.cache_data(ttl=10)
+def fetch_agent_track(agent_id):
+    return get_data(f"agents/{agent_id}/track")
 
 def app():
     """
@@ -16,37 +25,38 @@ def app():
     """
     st.header("Delivery Tracking")
 
-    deliveries = fetch_deliveries()
-
-    if deliveries is None:
-        st.warning("Could not fetch delivery data. The backend might be down or you might not have access.")
-        return
-
-    df = pd.DataFrame(deliveries)
+    warehouse_id = st.session_state.get("warehouse_id")
 
     # --- KPIs ---
+    # Served from the backend's precomputed snapshot, shared by every session. ETAs
+    # of in-transit deliveries are recomputed by the backend from live positions.
     st.subheader("Key Metrics")
-    if not df.empty:
-        today = datetime.datetime.now().date()
-        df['delivery_date_dt'] = pd.to_datetime(df['delivery_date']).dt.date
-        
-        pending_deliveries = df[df['status'] == 'in-transit'].shape[0]
-        deliveries_today = df[df['delivery_date_dt'] == today].shape[0]
-        failed_deliveries = df[df['status'] == 'failed'].shape[0]
-        
-        col1, col2, col3 = st.columns(3)
-        col1.metric("🚚 Deliveries In-Transit", pending_deliveries)
-        col2.metric("📦 Deliveries Today", deliveries_today)
-        col3.metric("❌ Failed Deliveries", failed_deliveries)
+    snapshot = fetch_snapshot(warehouse_id)
+    if snapshot:
+        kpis = snapshot['data']['kpis']
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("🚚 Deliveries In-Transit", f"{kpis['in_transit']:,}")
+        col2.metric("📦 Deliveries Today", f"{kpis['today']:,}")
+        col3.metric("❌ Failed Deliveries", f"{kpis['failed']:,}")
+        col4.metric("⏰ Running Late", f"{kpis['late']:,}")
+        snapshot_caption(snapshot)
     else:
-        st.info("No delivery data to display KPIs.")
+        st.info("Key metrics are unavailable.")
 
     st.markdown("---")
 
+    df = fetch_deliveries(warehouse_id)
+
+    if df is None:
+        st.warning("Could not fetch delivery data. The backend might be down or you might not have access.")
+        return
+
+    register_frame("deliveries", df)
+
     # --- Data Display ---
     st.subheader("All Deliveries")
     if not df.empty:
-        st.dataframe(df.drop(columns=['delivery_date_dt']), use_container_width=True)
+        st.dataframe(df, use_container_width=True)
     else:
         st.info("No delivery records found.")
 
@@ -88,6 +98,21 @@ def app():
     
     st.markdown("---")
 
+    # --- Agent Assignment ---
+    st.subheader("Assign Agents")
+    st.caption("Assigns pending and rescheduled deliveries to the nearest active agent in their region, within each agent's load cap.")
+    if st.button("Assign Pending Deliveries", key="assign_agents_button"):
+        result, error = post_data("deliveries/assign", {"warehouse_id": warehouse_id})
+        if result:
+            st.success(f"Assigned {result['assigned']:,} of {result['deliveries']:,} deliveries ({result['changed']:,} changed agent).")
+            if result['unassigned']:
+                st.warning(f"{len(result['unassigned']):,} deliveries have no agent with spare capacity in their region.")
+            st.cache_data.clear()
+        else:
+            st.error(f"Failed to assign deliveries: {error}")
+
+    st.markdown("---")
+
     # --- Live Map ---
     st.subheader("Live Delivery Tracking Map")
     if not df.empty and 'latitude' in df.columns and 'longitude' in df.columns:
@@ -106,7 +131,20 @@ def app():
                     popup=f"ID: {row['delivery_id']}<br>Status: {row['status']}",
                     icon=folium.Icon(color='blue', icon='truck', prefix='fa')
                 ).add_to(m)
-            
+
+            # Breadcrumbs arrive already simplified by the backend.
+            track_agent = st.selectbox(
+                "Show agent track", ["None"] + sorted(map_df['agent_id'].dropna().unique().tolist()),
+                key="track_agent_id"
+            )
+            if track_agent != "None":
+                track = fetch_agent_track(track_agent)
+                if track and track['points']:
+                    folium.PolyLine([p[:2] for p in track['points']], color='red', weight=3,
+                                    tooltip=f"{track_agent}: {track['raw_points']:,} pings").add_to(m)
+                elif track is not None:
+                    st.info(f"No recent pings from {track_agent}.")
+
             folium_static(m)
         else:
             st.info("No active deliveries to display on the map.")
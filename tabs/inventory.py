@@ -1,11 +1,26 @@
 import streamlit as st
 import pandas as pd
-from utils.api import get_data, post_data, patch_data
-import matplotlib.pyplot as plt
+from urllib.parse import quote
+from utils.api import get_data, get_snapshot, post_data, with_params
+from utils.helpers import category_pie_chart_image, snapshot_caption
+from utils.frames import build_frame, register_frame
 
 @st.cache_data(ttl=10)
-def fetch_inventory():
-    return get_data("inventory")
+def fetch_snapshot(warehouse_id):
+    return get_snapshot("inventory", warehouse_id)
+
+@st.cache_data(ttl=10)
+def fetch_inventory(warehouse_id):
+    inventory = get_data(with_params("inventory", warehouse_id=warehouse_id))
+    return None if inventory is None else build_frame(inventory, "inventory")
+
+@st.cache_data(ttl=10)
+def fetch_low_stock(warehouse_id):
+    return get_data(with_params("inventory/low_stock", warehouse_id=warehouse_id))
+
+@st.cache_data(ttl=60)
+def fetch_warehouse_ids():
+    return [w['warehouse_id'] for w in (get_data("warehouse") or []) if w.get('warehouse_id')]
 
 def app():
     """
@@ -13,28 +28,35 @@ def app():
     """
     st.header("Inventory Management")
 
-    inventory = fetch_inventory()
-
-    if inventory is None:
-        st.warning("Could not fetch inventory. The backend might be down or you might not have access.")
-        return
-
-    df = pd.DataFrame(inventory)
+    warehouse_id = st.session_state.get("warehouse_id")
 
     # --- KPIs ---
+    # Served from the backend's precomputed snapshot, shared by every session.
     st.subheader("Key Metrics")
-    if not df.empty:
-        low_stock_items = df[df['quantity'] < df['min_stock_level']].shape[0]
-        col1, col2 = st.columns(2)
-        col1.metric("Total Inventory Items", len(df))
-        col2.metric("Low Stock Alerts", low_stock_items)
+    snapshot = fetch_snapshot(warehouse_id)
+    if snapshot:
+        kpis = snapshot['data']['kpis']
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Inventory Items", f"{kpis['skus']:,}")
+        col2.metric("Units in Stock", f"{kpis['units']:,}")
+        col3.metric("Low Stock Alerts", f"{kpis['low_stock']:,}")
+        snapshot_caption(snapshot)
     else:
-        st.info("No inventory data to display KPIs.")
+        st.info("Key metrics are unavailable.")
 
     st.markdown("---")
 
+    df = fetch_inventory(warehouse_id)
+    low_stock = fetch_low_stock(warehouse_id)
+
+    if df is None:
+        st.warning("Could not fetch inventory. The backend might be down or you might not have access.")
+        return
+
+    register_frame("inventory", df)
+
     # --- Data Display and Filtering ---
-    tab1, tab2 = st.tabs(["Inventory Table", "Category Distribution"])
+    tab1, tab2, tab3 = st.tabs(["Inventory Table", "Category Distribution", "Low Stock Alerts"])
     
     with tab1:
         st.subheader("Inventory Details")
@@ -45,25 +67,36 @@ def app():
 
     with tab2:
         st.subheader("Inventory by Category")
-        if not df.empty and 'category' in df.columns:
-            category_counts = df['category'].value_counts()
-            fig, ax = plt.subplots()
-            ax.pie(category_counts, labels=category_counts.index, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            st.pyplot(fig)
+        if snapshot and snapshot['data']['by_category']:
+            st.image(category_pie_chart_image(pd.Series(snapshot['data']['by_category']), title="Inventory by Category"))
         else:
             st.info("No category data available for visualization.")
 
+    with tab3:
+        st.subheader("Items Below Minimum Stock")
+        if low_stock and low_stock['items']:
+            st.dataframe(build_frame(low_stock['items'], "inventory"), use_container_width=True)
+        else:
+            st.info("No low stock alerts.")
+
     st.markdown("---")
 
     # --- Actions ---
     st.subheader("Inventory Actions")
     if not df.empty:
-        selected_sku = st.selectbox(
-            "Select SKU to update stock", 
-            df['sku'].tolist(), 
+        # A SKU can be stocked in several distribution centers; each (warehouse, SKU) is its own item.
+        if 'warehouse_id' in df.columns:
+            item_warehouses = df['warehouse_id'].astype(object).where(df['warehouse_id'].notna(), None)
+        else:
+            item_warehouses = [None] * len(df)
+        items = list(zip(item_warehouses, df['sku']))
+        labels = [f"{sku} ({wid})" if wid and not warehouse_id else sku for wid, sku in items]
+        item_warehouse, selected_sku = items[st.selectbox(
+            "Select SKU to update stock",
+            range(len(items)),
+            format_func=labels.__getitem__,
             key="inventory_sku_select"
-        )
+        )]
         
         quantity_change = st.number_input(
             "Enter quantity to add (use negative to subtract)", 
@@ -73,18 +106,17 @@ def app():
 
         if st.button("Update Stock", key="update_stock_button"):
             if quantity_change != 0:
-                current_item = df[df['sku'] == selected_sku].iloc[0]
-                new_quantity = int(current_item['quantity']) + quantity_change
-                if new_quantity >= 0:
-                    success, error = patch_data(f"inventory/{selected_sku}", {"quantity": new_quantity})
-                    if success:
-                        st.success(f"Updated {selected_sku} stock to {new_quantity}.")
-                        st.cache_data.clear()
-                        st.rerun()
-                    else:
-                        st.error(f"Failed to update inventory: {error}")
+                # The backend applies the change atomically and refuses to go below zero.
+                data, error = post_data(
+                    with_params(f"inventory/{quote(selected_sku)}/adjust", warehouse_id=item_warehouse),
+                    {"delta": int(quantity_change)},
+                )
+                if data:
+                    st.success(f"Updated {selected_sku} stock to {data['quantity']}.")
+                    st.cache_data.clear()
+                    st.rerun()
                 else:
-                    st.warning("Quantity cannot be negative.")
+                    st.error(f"Failed to update inventory: {error}")
     else:
         st.info("No inventory items to perform actions on.")
 
@@ -99,15 +131,20 @@ def app():
             quantity = st.number_input("Initial Quantity", min_value=0, step=1, key="quantity_input")
             bin_location = st.text_input("Bin Location", key="bin_location_input")
             min_stock_level = st.number_input("Minimum Stock Level", min_value=1, step=1, key="min_stock_input")
+            # New stock belongs to a concrete distribution center, also when the sidebar shows all of them.
+            warehouse_ids = fetch_warehouse_ids()
+            item_warehouse = warehouse_id or st.selectbox(
+                "Distribution Center", warehouse_ids, index=None, key="sku_warehouse_input")
 
             submit_button = st.form_submit_button("Add SKU")
 
             if submit_button:
-                if all([sku, name, category, bin_location]):
+                if all([sku, name, category, bin_location]) and (item_warehouse or not warehouse_ids):
                     new_item = {
                         "sku": sku, "name": name, "category": category,
                         "quantity": quantity, "bin_location": bin_location,
-                        "min_stock_level": min_stock_level
+                        "min_stock_level": min_stock_level,
+                        "warehouse_id": item_warehouse
                     }
                     data, error = post_data("inventory", new_item)
                     if data:
@@ -1,9 +1,61 @@
 import streamlit as st
 import pandas as pd
-import io
 import folium
 from streamlit_folium import folium_static
 from utils.api import post_data
+from utils.addresses import batches, parse_addresses, parse_text
+
+OPTIMIZER_BATCH_SIZE = 500  # addresses per optimize_route request
+
+def load_upload(uploaded_file):
+    """
+    Streams an uploaded CSV/TXT manifest into deduplicated addresses, once per
+    file; reruns reuse the parsed result from the session.
+    """
+    file_key = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None))
+    cached = st.session_state.get("optimizer_upload")
+    if cached and cached[0] == file_key:
+        return cached[1]
+
+    progress = st.progress(0.0, text=f"Reading {uploaded_file.name}...")
+    collector = parse_addresses(
+        uploaded_file,
+        is_csv=uploaded_file.name.lower().endswith(".csv"),
+        on_progress=lambda fraction, c: progress.progress(
+            fraction, text=f"Read {c.lines:,} lines, {len(c.addresses):,} unique addresses"
+        ),
+    )
+    progress.empty()
+    st.session_state["optimizer_upload"] = (file_key, collector)
+    return collector
+
+def optimize_in_batches(addresses):
+    """
+    Sends the stops to the optimizer in batches, each one starting from the last
+    stop of the previous batch, and chains the partial routes. Stops are only
+    reordered within their batch, so a route of several batches is not globally
+    optimal. Returns (result, error).
+    """
+    route, coordinates = [], []
+    totals = {"total_distance": 0.0, "total_time": 0.0, "co2_emissions": 0.0}
+    progress = st.progress(0.0, text="Optimizing...")
+    batch_count = 0
+    for batch_count, batch in enumerate(batches(addresses, OPTIMIZER_BATCH_SIZE), start=1):
+        payload = {"addresses": batch}
+        if route:
+            payload["start"] = route[-1][1]
+        result, error = post_data("optimize_route", payload)
+        if error or not (result and result.get("success")):
+            progress.empty()
+            return None, error or "The optimizer returned an unexpected result."
+        route.extend((len(route) + 1, address) for _, address in result.get("route", []))
+        coordinates.extend(result.get("coordinates", []))
+        for key in totals:
+            totals[key] += result.get(key, 0)
+        progress.progress(min(batch_count * OPTIMIZER_BATCH_SIZE / len(addresses), 1.0),
+                          text=f"Optimized {len(route):,} of {len(addresses):,} stops")
+    progress.empty()
+    return dict(totals, success=True, route=route, coordinates=coordinates, batches=batch_count), None
 
 def app():
     """
@@ -12,7 +64,7 @@ def app():
     st.header("Route Optimizer")
 
     # --- Address Input ---
-    addresses = []
+    collector = None
     input_method = st.radio(
         "Select Address Input Method",
         ["Enter Manually", "Upload File"],
@@ -26,7 +78,7 @@ def app():
             key="optimizer_address_text"
         )
         if address_text:
-            addresses = [addr.strip() for addr in address_text.split('\\n') if addr.strip()]
+            collector = parse_text(address_text)
     else:
         uploaded_file = st.file_uploader(
             "Upload a CSV or TXT file",
@@ -35,40 +87,38 @@ def app():
         )
         if uploaded_file:
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
-                    # Simple assumption: the first column has the addresses
-                    addresses = df.iloc[:, 0].dropna().astype(str).tolist()
-                else:
-                    string_data = io.StringIO(uploaded_file.getvalue().decode("utf-8")).read()
-                    addresses = [line.strip() for line in string_data.split('\\n') if line.strip()]
-                st.success(f"Successfully loaded {len(addresses)} addresses from {uploaded_file.name}.")
+                collector = load_upload(uploaded_file)
+                st.success(f"Successfully loaded {len(collector.addresses):,} addresses from {uploaded_file.name}.")
             except Exception as e:
                 st.error(f"Error reading file: {e}")
 
     # --- Optimization ---
+    addresses = collector.addresses if collector else []
     if addresses:
-        st.info(f"{len(addresses)} addresses loaded.")
+        st.info(
+            f"{len(addresses):,} addresses loaded "
+            f"({collector.duplicates:,} duplicates and {collector.blank:,} blank lines skipped)."
+        )
         if st.button("Optimize Route", key="optimize_button"):
-            with st.spinner("Optimizing..."):
-                payload = {"addresses": addresses}
-                result, error = post_data("optimize_route", payload)
+            result, error = optimize_in_batches(addresses)
+            if error:
+                st.error(f"Optimization failed: {error}")
+            else:
+                st.success("Route optimized successfully!")
 
-                if error:
-                    st.error(f"Optimization failed: {error}")
-                elif result and result.get("success"):
-                    st.success("Route optimized successfully!")
-                    
-                    # Store result in session state to persist it
-                    st.session_state['optimization_result'] = result
-                else:
-                    st.error("Optimization failed. The optimizer returned an unexpected result.")
+                # Store result in session state to persist it
+                st.session_state['optimization_result'] = result
     
     # --- Display Results ---
     if 'optimization_result' in st.session_state:
         result = st.session_state['optimization_result']
         
         st.subheader("Optimized Route")
+        if result.get('batches', 1) > 1:
+            st.caption(
+                f"Optimized in {result['batches']} batches of up to {OPTIMIZER_BATCH_SIZE:,} stops, each "
+                "continuing from the previous batch's last stop; stops are only reordered within their batch."
+            )
         
         # Metrics
         col1, col2, col3 = st.columns(3)
@@ -78,7 +128,7 @@ def app():
 
         # Route Table
         route_df = pd.DataFrame(result.get("route", []), columns=["Stop", "Address"])
-        st.table(route_df)
+        st.dataframe(route_df, hide_index=True, use_container_width=True)
 
         # Map
         st.subheader("Route Map")
@@ -2,12 +2,34 @@ import streamlit as st
 import pandas as pd
 import datetime
 import uuid
-from utils.api import get_data, post_data, patch_data
-from utils.helpers import display_kpi_metrics, format_date, show_notification
+from urllib.parse import quote
+from utils.api import get_data, get_snapshot, post_data, patch_data, with_params
+from utils.helpers import filter_dataframe, snapshot_caption
+from utils.frames import build_frame, register_frame
 
 @st.cache_data(ttl=10)
-def fetch_orders():
-    return get_data("orders")
+def fetch_snapshot(warehouse_id):
+    return get_snapshot("orders", warehouse_id)
+
+@st.cache_data(ttl=10)
+def fetch_orders(warehouse_id):
+    """The orders frame and a version that changes whenever the data is refetched."""
+    orders = get_data(with_params("orders", warehouse_id=warehouse_id))
+    return None if orders is None else build_frame(orders, "orders"), uuid.uuid4().hex
+
+@st.cache_data(ttl=10)
+def search_orders(query, page, page_size=20):
+    return get_data(f"orders/search?q={quote(query)}&page={page}&page_size={page_size}")
+
+@st.cache_data(ttl=10)
+def fetch_order_trends(granularity, start, end, warehouse_id):
+    return get_data(with_params("orders/trends", granularity=granularity, start=start, end=end,
+                                warehouse_id=warehouse_id))
+
+@st.cache_data(ttl=10)
+def fetch_order_waves(warehouse_id, cart_capacity, max_orders):
+    return get_data(with_params("orders/waves", warehouse_id=warehouse_id, cart_capacity=cart_capacity,
+                                max_orders=max_orders))
 
 def app():
     """
@@ -15,35 +37,81 @@ def app():
     """
     st.header("Orders Management")
 
-    orders = fetch_orders()
-
-    if orders is None:
-        st.warning("Could not fetch orders. The backend might be down or you might not have access.")
-        return
-
-    df = pd.DataFrame(orders)
+    warehouse_id = st.session_state.get("warehouse_id")
 
     # --- KPIs ---
+    # Served from the backend's precomputed snapshot, shared by every session.
     st.subheader("Key Metrics")
-    if not df.empty:
-        today = datetime.datetime.now().strftime('%Y-%m-%d')
-        orders_today = sum(1 for order in orders if order.get('order_date', '').startswith(today))
-        pending_orders = sum(1 for order in orders if order.get('status') == 'pending')
-        delivered_count = sum(1 for order in orders if order.get('status') == 'delivered')
-        
+    snapshot = fetch_snapshot(warehouse_id)
+    if snapshot:
+        kpis = snapshot['data']['kpis']
         col1, col2, col3 = st.columns(3)
-        col1.metric("📦 Orders Today", orders_today)
-        col2.metric("⏳ Pending Orders", pending_orders)
-        col3.metric("✅ Delivered", delivered_count)
+        col1.metric("📦 Orders Today", f"{kpis['orders_today']:,}")
+        col2.metric("⏳ Pending Orders", f"{kpis['pending']:,}")
+        col3.metric("✅ Delivered", f"{kpis['delivered']:,}")
+        snapshot_caption(snapshot)
     else:
-        st.info("No orders found to display KPIs.")
-    
+        st.info("Key metrics are unavailable.")
+
+    st.markdown("---")
+
+    df, orders_version = fetch_orders(warehouse_id)
+
+    if df is None:
+        st.warning("Could not fetch orders. The backend might be down or you might not have access.")
+        return
+
+    register_frame("orders", df)
+
+    # --- Trends ---
+    st.subheader("Order Trends")
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        granularity = st.radio("Granularity", ["day", "week"], key="order_trend_granularity")
+        days = st.selectbox("Period", [30, 90, 365, 1095], index=1,
+                            format_func=lambda d: f"Last {d} days", key="order_trend_period")
+    with col2:
+        end = datetime.date.today()
+        trends = fetch_order_trends(
+            granularity, (end - datetime.timedelta(days=days)).isoformat(), end.isoformat(), warehouse_id
+        )
+        if trends and trends['series']:
+            trend_df = pd.DataFrame(trends['series']).set_index('period')[['orders', 'units']]
+            st.line_chart(trend_df)
+        else:
+            st.info("No order history for this period.")
+
+    st.markdown("---")
+
+    # --- Search ---
+    st.subheader("Search Orders")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search_query = st.text_input(
+            "Customer name, address or order ID", key="order_search_query"
+        )
+    with col2:
+        search_page = st.number_input("Page", min_value=1, step=1, key="order_search_page")
+    if search_query.strip():
+        found = search_orders(search_query.strip(), int(search_page))
+        if found and found['results']:
+            st.dataframe(pd.DataFrame(found['results']), use_container_width=True)
+            if found['has_more']:
+                st.caption("More results on the next page.")
+        elif found is not None:
+            st.info("No matching orders.")
+
     st.markdown("---")
 
     # --- Filters and Display ---
     st.subheader("All Orders")
     if not df.empty:
-        filtered_df = df.copy()
+        status_filter = st.multiselect(
+            "Filter by status",
+            sorted(df['status'].dropna().unique().tolist()),
+            key="order_status_filter"
+        )
+        filtered_df = filter_dataframe(df, {"status": status_filter}, cache_key=orders_version)
         st.dataframe(filtered_df, use_container_width=True)
     else:
         st.info("No orders found in the system.")
@@ -81,6 +149,40 @@ def app():
 
     st.markdown("---")
 
+    # --- Pick Waves ---
+    st.subheader("Pick Waves")
+    col1, col2 = st.columns(2)
+    cart_capacity = col1.number_input("Cart capacity (units)", min_value=1, value=200, step=10, key="wave_capacity")
+    max_orders = col2.number_input("Orders per cart", min_value=1, value=40, step=5, key="wave_max_orders")
+    if st.button("Plan Waves", key="plan_waves"):
+        st.session_state["wave_plan"] = (cart_capacity, max_orders)
+    if st.session_state.get("wave_plan") == (cart_capacity, max_orders):
+        plan = fetch_order_waves(warehouse_id, cart_capacity, max_orders)
+        if plan and plan['waves']:
+            waves_df = pd.DataFrame(plan['waves'])
+            waves_df['stops_count'] = waves_df['stops'].str.len()
+            st.dataframe(
+                waves_df[['wave', 'warehouse_id', 'orders', 'units', 'stops_count', 'distance']],
+                use_container_width=True
+            )
+            if plan['unlocated']:
+                st.caption(f"{len(plan['unlocated'])} pending orders have no bin for their product and were skipped.")
+            wave_number = st.selectbox("Wave", waves_df['wave'].tolist(), key="select_wave")
+            wave = plan['waves'][wave_number - 1]
+            st.dataframe(pd.DataFrame(wave['stops']), use_container_width=True)
+            if st.button("Dispatch Wave", key="dispatch_wave"):
+                data, error = post_data("orders/waves/dispatch", {"order_ids": wave['order_ids']})
+                if data:
+                    st.success(f"Dispatched {len(data['dispatched'])} orders from wave {wave_number}.")
+                    st.cache_data.clear()
+                    st.rerun()
+                else:
+                    st.error(f"Failed to dispatch wave: {error}")
+        elif plan is not None:
+            st.info("No pending orders to plan.")
+
+    st.markdown("---")
+
     # --- Add New Order ---
     with st.expander("Add New Order"):
         with st.form("new_order_form", clear_on_submit=True):
@@ -100,9 +202,10 @@ def app():
                         "quantity": quantity,
                         "delivery_address": delivery_address,
                         "status": "pending",
-                        "order_date": datetime.datetime.now().isoformat()
+                        "order_date": datetime.datetime.now().isoformat(),
+                        "warehouse_id": warehouse_id
                     }
-                    data, error = post_data("orders", new_order)
+                    data, error = post_data("orders/place", new_order)
                     if data:
                         st.success("Order created successfully!")
                         st.cache_data.clear()
@@ -1,16 +1,28 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from utils.api import get_data
+from utils.api import get_data, get_snapshot, with_params
+from utils.helpers import snapshot_caption
+from utils.charts import render_chart
+
+def draw_heatmap(fig, grid):
+    ax = fig.subplots()
+    heatmap = ax.imshow(grid, cmap='hot', interpolation='nearest', aspect='auto')
+    fig.colorbar(heatmap, ax=ax, label='Item Quantity')
+    ax.set_title("Warehouse Inventory Heatmap")
 
 @st.cache_data(ttl=10)
 def fetch_warehouse():
     return get_data("warehouse")
 
 @st.cache_data(ttl=10)
-def fetch_inventory():
-    return get_data("inventory")
+def fetch_snapshot(warehouse_id):
+    # Per-DC stats and heatmap bins, precomputed by the backend and shared by every session.
+    return get_snapshot("warehouse", warehouse_id)
+
+@st.cache_data(ttl=300)
+def fetch_slotting(warehouse_id, days):
+    return get_data(with_params("warehouse/slotting", warehouse_id=warehouse_id, days=days))
 
 def app():
     """
@@ -18,34 +30,36 @@ def app():
     """
     st.header("Warehouse Management")
 
+    warehouse_id = st.session_state.get("warehouse_id")
     warehouse_data = fetch_warehouse()
-    inventory_data = fetch_inventory()
+    snapshot = fetch_snapshot(warehouse_id)
 
-    if warehouse_data is None or inventory_data is None:
-        st.warning("Could not fetch warehouse or inventory data. The backend might be down.")
+    if warehouse_data is None or snapshot is None:
+        st.warning("Could not fetch warehouse data. The backend might be down.")
         return
-        
-    # Since the new API returns a list of warehouses, we'll take the first one.
-    warehouse = warehouse_data[0] if warehouse_data else {}
+
+    # Details are shown for the selected distribution center, or the first one network-wide.
+    warehouse = next((w for w in warehouse_data if w.get('warehouse_id') == warehouse_id), None)
+    if warehouse is None:
+        warehouse = warehouse_data[0] if warehouse_data else {}
+
+    stats = snapshot['data']['stats']
 
     # --- KPIs ---
     st.subheader("Key Metrics")
-    if warehouse and "capacity" in warehouse:
-        inventory_df = pd.DataFrame(inventory_data)
-        total_items = inventory_df['quantity'].sum()
-        capacity = warehouse.get('capacity', 0)
-        utilization = (total_items / capacity * 100) if capacity > 0 else 0
-        
+    if stats:
+        kpis = snapshot['data']['kpis']
         col1, col2, col3 = st.columns(3)
-        col1.metric("📦 Total Items", f"{total_items:,}")
-        col2.metric("🏢 Warehouse Capacity", f"{capacity:,}")
-        col3.metric("📈 Utilization", f"{utilization:.2f}%")
+        col1.metric("📦 Total Items", f"{kpis['total_items']:,}")
+        col2.metric("🏢 Warehouse Capacity", f"{kpis['capacity']:,}")
+        col3.metric("📈 Utilization", f"{kpis['utilization']:.2f}%")
+        snapshot_caption(snapshot)
     else:
         st.info("No warehouse data available to display KPIs.")
 
     st.markdown("---")
 
-    tab1, tab2 = st.tabs(["Warehouse Details", "Inventory Heatmap"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Warehouse Details", "Inventory Heatmap", "Distribution Centers", "Slotting"])
 
     with tab1:
         st.subheader("Warehouse Information")
@@ -59,41 +73,47 @@ def app():
     
     with tab2:
         st.subheader("Inventory Location Heatmap")
-        if not pd.DataFrame(inventory_data).empty:
-            df_inv = pd.DataFrame(inventory_data)
-            # Assuming bin_location is in a 'A1', 'B12' format
-            df_inv['row'] = (
-                df_inv['bin_location']
-                .str.extract(r'([A-Z])')[0]
-                .fillna('A')
-                .apply(lambda x: ord(x) - ord('A'))
-            )
-            df_inv['col'] = (
-                df_inv['bin_location']
-                .str.extract(r'(\d+)')[0]
-                .fillna(0)
-                .astype(int)
-            )
-
-            if not df_inv.empty and 'row' in df_inv.columns and 'col' in df_inv.columns:
-                max_row = df_inv['row'].max()
-                max_col = df_inv['col'].max()
-                
-                heatmap_grid = np.zeros((max_row + 1, max_col + 1))
-                
-                for _, item in df_inv.iterrows():
-                    heatmap_grid[item['row'], item['col']] = item['quantity']
-                
-                fig, ax = plt.subplots(figsize=(12, 8))
-                heatmap = ax.imshow(heatmap_grid, cmap='hot', interpolation='nearest')
-                plt.colorbar(heatmap, ax=ax, label='Item Quantity')
-                ax.set_title("Warehouse Inventory Heatmap")
-                st.pyplot(fig)
-            else:
-                st.info("Could not generate heatmap due to missing location data.")
+        heatmap = snapshot['data']['heatmap']
+        # Bin labels repeat across distribution centers; network-wide, map the one shown in the details.
+        shown = np.asarray(heatmap['warehouse_ids'], dtype=object) == (warehouse_id or warehouse.get('warehouse_id'))
+        if shown.any():
+            if not warehouse_id:
+                st.caption(f"Showing {warehouse.get('name', warehouse.get('warehouse_id'))}; "
+                           "select a distribution center in the sidebar to switch.")
+            # Bins arrive pre-aggregated; np.add.at still sums any bins that map to the same cell.
+            heatmap_grid = np.zeros(heatmap['shape'])
+            np.add.at(heatmap_grid, (np.asarray(heatmap['rows'])[shown], np.asarray(heatmap['cols'])[shown]),
+                      np.asarray(heatmap['quantity'])[shown])
+            st.image(render_chart("warehouse_heatmap", heatmap_grid, draw_heatmap, figsize=(12, 8)))
         else:
             st.info("No inventory data for heatmap.")
 
+    with tab3:
+        st.subheader("Stock and Utilization by Distribution Center")
+        if stats:
+            st.dataframe(pd.DataFrame(stats), use_container_width=True)
+        else:
+            st.info("No distribution centers found.")
+
+    with tab4:
+        st.subheader("ABC Slotting Proposal")
+        days = st.selectbox("Order history", [30, 90, 180, 365], index=1, format_func=lambda d: f"Last {d} days")
+        # The proposal scans the whole order history, so it is only computed on request.
+        if st.button("Compute Proposal"):
+            st.session_state["slotting_days"] = days
+        if st.session_state.get("slotting_days") == days:
+            slotting = fetch_slotting(warehouse_id, days)
+            if slotting:
+                col1, col2, col3 = st.columns(3)
+                col1.metric("SKUs Analysed", f"{slotting['skus']:,}")
+                col2.metric("Proposed Moves", f"{slotting['moves']:,}")
+                col3.metric("Travel Saved", f"{slotting['savings_pct']:.1f}%")
+                st.bar_chart(pd.Series(slotting['class_counts'], name="SKUs"))
+                if slotting['top_moves']:
+                    st.dataframe(pd.DataFrame(slotting['top_moves']), use_container_width=True)
+                else:
+                    st.info("Current slotting is already optimal.")
+
     st.markdown("---")
     # Add form can be added here if needed
     # with st.expander("Add New Warehouse"): ...
@@ -0,0 +1,44 @@
+import threading
+
+import mongomock
+
+from services import bootstrap
+
+
+def steps(log):
+    return [("record", lambda: log.append(1))]
+
+
+def test_steps_run_once_per_version_across_restarts():
+    db = mongomock.MongoClient().db
+    log = []
+    assert bootstrap.run_once(db, steps(log), "1.0", owner="a")
+    # A restart long after the lease expired still finds the version completed.
+    assert not bootstrap.run_once(db, steps(log), "1.0", owner="b")
+    assert bootstrap.completed(db, "1.0")
+    assert log == [1]
+    # A new version runs at once: completing frees the lease.
+    assert bootstrap.run_once(db, steps(log), "1.1", owner="b")
+    assert log == [1, 1]
+    assert not bootstrap.completed(db, "1.0")
+
+
+def test_failed_bootstrap_is_retried_by_the_holder():
+    db = mongomock.MongoClient().db
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    assert bootstrap.run(db, [("flaky", flaky)], threading.Event(), "1.0", poll_seconds=0)
+    assert len(calls) == 2
+    assert bootstrap.completed(db, "1.0")
+
+
+def test_other_workers_wait_for_the_holder():
+    db = mongomock.MongoClient().db
+    assert bootstrap.claim(db, "a", "1.0")
+    assert not bootstrap.run_once(db, steps([]), "1.0", owner="b")
+    assert not bootstrap.completed(db, "1.0")
@@ -0,0 +1,23 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from utils.charts import CHART_CACHE
+from utils.helpers import plot_bar_chart, plot_category_pie_chart
+
+
+def test_plot_helpers_render_through_the_chart_cache():
+    CHART_CACHE.clear()
+    inventory = pd.DataFrame({"category": ["Toys", "Home", "Toys"]})
+    sales = pd.DataFrame({"day": ["mon", "tue"], "units": [3, 5]})
+    open_figures = len(plt.get_fignums())
+    misses = CHART_CACHE.misses
+
+    pie = plot_category_pie_chart(inventory)
+    bar = plot_bar_chart(sales, "day", "units")
+    assert pie.startswith(b"\x89PNG") and bar.startswith(b"\x89PNG")
+    assert CHART_CACHE.misses == misses + 2
+
+    hits = CHART_CACHE.hits
+    assert plot_category_pie_chart(inventory) == pie
+    assert CHART_CACHE.hits == hits + 1
+    assert len(plt.get_fignums()) == open_figures
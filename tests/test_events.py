@@ -0,0 +1,99 @@
+import datetime
+
+import mongomock
+import pytest
+from pymongo import DeleteOne
+
+from services import events
+
+NOW = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _bulk_write(self, requests, ordered=True):
+    """Applies the operations one by one; mongomock's bulk_write rejects newer pymongo operations."""
+    for request in requests:
+        if isinstance(request, DeleteOne):
+            self.delete_one(request._filter)
+        else:
+            self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", _bulk_write)
+    return mongomock.MongoClient().db
+
+
+def event(seq, entity_id, from_status, to_status, logged_at=NOW, entity="order"):
+    return {"seq": seq, "logged_at": logged_at, "entity": entity, "entity_id": entity_id,
+            "warehouse_id": "WH-01", "from_status": from_status, "to_status": to_status,
+            "ts": logged_at, "changes": {}}
+
+
+def counts(db):
+    return events.status_counts(db, "order")
+
+
+def test_settled_stops_at_a_fresh_gap_and_skips_an_old_one():
+    fresh = [event(1, "O1", None, "pending"), event(3, "O3", None, "pending")]
+    assert [e["seq"] for e in events.settled(fresh, 0, NOW)] == [1]
+    old = [event(1, "O1", None, "pending"), event(3, "O3", None, "pending", NOW - datetime.timedelta(minutes=5))]
+    assert [e["seq"] for e in events.settled(old, 0, NOW)] == [1, 3]
+
+
+def test_flush_assigns_consecutive_seqs(db):
+    log = events.EventLog(db, interval=0)
+    log.extend([events.transition("order", None, {"order_id": f"O{i}", "status": "pending"}) for i in range(3)])
+    log.extend([events.transition("order", None, {"order_id": "O3", "status": "pending"})])
+    assert [e["seq"] for e in db.events.find().sort("seq")] == [1, 2, 3, 4]
+
+
+def test_compact_waits_for_a_batch_written_out_of_order(db):
+    # seq 2 became visible before seq 1: nothing may be applied past the gap yet.
+    db.events.insert_one(event(2, "O1", "pending", "shipped"))
+    assert events.compact(db, now=NOW) == 0
+    assert counts(db) == {}
+
+    db.events.insert_one(event(1, "O1", None, "pending"))
+    assert events.compact(db, now=NOW) == 2
+    assert counts(db) == {"shipped": 1}
+    assert db.entity_state.find_one({"_id": "order:O1"})["status"] == "shipped"
+    assert events.compact(db, now=NOW) == 0
+    assert counts(db) == {"shipped": 1}
+
+
+def test_compact_skips_a_gap_once_it_settles(db):
+    db.events.insert_one(event(2, "O2", None, "pending", NOW - datetime.timedelta(minutes=5)))
+    assert events.compact(db, now=NOW) == 1
+    assert db.event_checkpoints.find_one({"_id": events.CHECKPOINT_ID})["last_seq"] == 2
+
+
+def test_compact_does_not_apply_a_batch_claimed_by_another_compactor(db):
+    db.events.insert_many([event(1, "O1", None, "pending"), event(2, "O2", None, "pending")])
+    stale = {}  # read before the other compactor created the checkpoint
+    assert events.compact(db, now=NOW) == 2
+    assert not events._claim(db, stale, 2)
+    assert events.compact(db, now=NOW) == 0
+    assert counts(db) == {"pending": 2}
+
+
+def test_feed_cursor_moves_past_other_entities(db):
+    db.events.insert_many([
+        event(1, "O1", None, "pending"),
+        event(2, "D1", None, "scheduled", entity="delivery"),
+        event(3, "D2", None, "scheduled", entity="delivery"),
+    ])
+    found, cursor = events.feed(db, 0, "order", now=NOW)
+    assert [e["seq"] for e in found] == [1] and cursor == 3
+    assert events.feed(db, cursor, "order", now=NOW) == ([], 3)
+    found, cursor = events.feed(db, 0, limit=2, now=NOW)
+    assert [e["seq"] for e in found] == [1, 2] and cursor == 2
+
+
+def test_rebuild_counts_moves_the_checkpoint_past_the_log(db):
+    db.events.insert_one(event(1, "O1", None, "pending"))
+    db.orders.insert_many([{"order_id": "O1", "warehouse_id": "WH-01", "status": "pending"},
+                           {"order_id": "O2", "warehouse_id": "WH-01", "status": "shipped"}])
+    events.rebuild_counts(db)
+    assert counts(db) == {"pending": 1, "shipped": 1}
+    assert events.compact(db, now=NOW) == 0
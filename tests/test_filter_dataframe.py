@@ -0,0 +1,46 @@
+import pandas as pd
+
+from utils import helpers
+from utils.helpers import filter_dataframe
+
+
+def make_frame():
+    return pd.DataFrame({
+        "status": pd.Categorical(["pending", "shipped", "pending", "delivered"]),
+        "customer_name": ["Ann Lee", "Bob Stone", "Cara Lee", "Dan Park"],
+        "quantity": [1, 2, 3, 4],
+    })
+
+
+def test_no_applicable_filter_returns_a_new_frame():
+    df = make_frame()
+    result = filter_dataframe(df, {"status": [], "missing": "x"})
+    assert result is not df
+    result.loc[0, "quantity"] = 99
+    assert df.loc[0, "quantity"] == 1
+
+
+def test_filters_are_combined():
+    df = make_frame()
+    result = filter_dataframe(df, {"status": ["pending"], "customer_name": "lee", "quantity": (2, 4)})
+    assert result["customer_name"].tolist() == ["Cara Lee"]
+
+
+def test_cached_masks_are_keyed_by_the_callers_version():
+    df = make_frame()
+    assert len(filter_dataframe(df, {"status": ["pending"]}, cache_key="v1")) == 2
+    changed = df.assign(status=pd.Categorical(["shipped"] * 4))
+    assert len(filter_dataframe(changed, {"status": ["pending"]}, cache_key="v2")) == 0
+    assert len(filter_dataframe(df, {"status": ["pending"]}, cache_key="v1")) == 2
+
+
+def test_mask_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(helpers, "_MASK_CACHE", helpers.collections.OrderedDict())
+    monkeypatch.setattr(helpers, "_mask_cache_bytes", 0)
+    monkeypatch.setattr(helpers, "_MASK_CACHE_BYTES", 10)
+    df = make_frame()
+    for version in range(5):
+        filter_dataframe(df, {"status": ["pending"]}, cache_key=version)
+    assert helpers._mask_cache_bytes <= 10
+    assert sum(mask.nbytes for mask in helpers._MASK_CACHE.values()) == helpers._mask_cache_bytes
+    assert list(helpers._MASK_CACHE)[-1][0] == 4
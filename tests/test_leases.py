@@ -0,0 +1,44 @@
+import datetime
+
+import mongomock
+
+from services import leases
+
+NOW = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def later(seconds):
+    return NOW + datetime.timedelta(seconds=seconds)
+
+
+def test_one_worker_holds_a_lease_until_it_expires():
+    collection = mongomock.MongoClient().db[leases.LEASES_COLLECTION]
+    assert leases.acquire(collection, "job", "a", 30, now=NOW)
+    assert not leases.acquire(collection, "job", "b", 30, now=later(10))
+    # The holder renews; the lease now runs until 50s.
+    assert leases.acquire(collection, "job", "a", 30, now=later(20))
+    assert not leases.acquire(collection, "job", "b", 30, now=later(40))
+    assert leases.acquire(collection, "job", "b", 30, now=later(51))
+    assert collection.find_one({"_id": "job"})["owner"] == "b"
+
+
+def test_released_lease_is_taken_over_at_once():
+    collection = mongomock.MongoClient().db[leases.LEASES_COLLECTION]
+    assert leases.acquire(collection, "job", "a", 300, now=NOW)
+    leases.release(collection, "job", "b")  # Not the holder: no effect.
+    assert not leases.acquire(collection, "job", "b", 300, now=later(1))
+    leases.release(collection, "job", "a")
+    assert leases.acquire(collection, "job", "b", 300, now=later(2))
+
+
+def test_leases_are_independent():
+    collection = mongomock.MongoClient().db[leases.LEASES_COLLECTION]
+    assert leases.acquire(collection, "eta-refresh", "a", 30, now=NOW)
+    assert leases.acquire(collection, "compaction", "b", 30, now=NOW)
+
+
+def test_lease_query_must_match_to_claim():
+    collection = mongomock.MongoClient().db[leases.LEASES_COLLECTION]
+    assert leases.acquire(collection, "job", "a", 30, now=NOW, fields={"done": True})
+    assert not leases.acquire(collection, "job", "b", 30, now=later(60), query={"done": False})
+    assert leases.acquire(collection, "job", "b", 30, now=later(60), query={"done": True})
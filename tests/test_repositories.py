@@ -0,0 +1,106 @@
+import mongomock
+import pytest
+
+from services import repositories
+from services.repositories import CachedRepository, MemoryRepository, MongoRepository
+
+KEY = ("warehouse_id", "sku")
+
+
+@pytest.fixture
+def store():
+    inner = MemoryRepository(KEY)
+    inner.insert({"warehouse_id": "WH-01", "sku": "A", "quantity": 5})
+    inner.insert({"warehouse_id": "WH-02", "sku": "A", "quantity": 50})
+    return inner
+
+
+def test_reads_are_cached_until_a_write_through_the_repository(store):
+    cached = CachedRepository(store, ttl=60)
+    assert cached.get(("WH-01", "A"))["quantity"] == 5
+    store.increment(("WH-01", "A"), "quantity", -1)  # Bypasses the cache.
+    assert cached.get(("WH-01", "A"))["quantity"] == 5
+    cached.increment(("WH-01", "A"), "quantity", -1)
+    assert cached.get(("WH-01", "A"))["quantity"] == 3
+    assert (cached.hits, cached.misses) == (1, 2)
+
+
+def test_compound_keys_are_cached_per_warehouse(store):
+    cached = CachedRepository(store, ttl=60)
+    assert cached.get(("WH-02", "A"))["quantity"] == 50
+    cached.update(("WH-01", "A"), {"quantity": 0})
+    assert cached.get(("WH-02", "A"))["quantity"] == 50
+    assert cached.get(("WH-01", "A"))["quantity"] == 0
+
+
+def test_moving_a_document_invalidates_both_keys(store):
+    cached = CachedRepository(store, ttl=60)
+    assert cached.get(("WH-03", "A")) is None  # Cached as missing.
+    cached.update(("WH-01", "A"), {"warehouse_id": "WH-03"})
+    assert cached.get(("WH-01", "A")) is None
+    assert cached.get(("WH-03", "A"))["quantity"] == 5
+
+
+def test_writes_invalidate_cached_finds(store):
+    cached = CachedRepository(store, ttl=60)
+    assert len(cached.find({"sku": "A"})) == 2
+    cached.delete(("WH-02", "A"))
+    assert len(cached.find({"sku": "A"})) == 1
+
+
+def test_a_read_racing_a_write_does_not_repopulate_the_cache(store):
+    cached = CachedRepository(store, ttl=60)
+    inner_get = store.get
+
+    def get_then_write(key):
+        doc = inner_get(key)
+        cached.increment(key, "quantity", -5)  # Lands after the read, before it is cached.
+        return doc
+
+    store.get = get_then_write
+    assert cached.get(("WH-01", "A"))["quantity"] == 5
+    store.get = inner_get
+    assert cached.get(("WH-01", "A"))["quantity"] == 0
+
+
+def test_entries_expire_after_the_ttl(store, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(repositories.time, "monotonic", lambda: clock[0])
+    cached = CachedRepository(store, ttl=2)
+    cached.get(("WH-01", "A"))
+    store.increment(("WH-01", "A"), "quantity", -1)
+    clock[0] += 1
+    assert cached.get(("WH-01", "A"))["quantity"] == 5
+    clock[0] += 2
+    assert cached.get(("WH-01", "A"))["quantity"] == 4
+
+
+def test_least_recently_used_entries_are_evicted(store):
+    cached = CachedRepository(store, max_entries=1, ttl=60)
+    cached.get(("WH-01", "A"))
+    cached.get(("WH-02", "A"))
+    cached.get(("WH-01", "A"))
+    assert (cached.hits, cached.misses) == (0, 3)
+
+
+def test_open_repository_leaves_users_uncached():
+    db = mongomock.MongoClient().db
+    assert isinstance(repositories.open_repository(db, "users", "username", cache_entries=0), MongoRepository)
+    inventory = repositories.open_repository(db, "inventory", KEY)
+    inventory.insert({"warehouse_id": "WH-01", "sku": "A", "quantity": 5})
+    assert inventory.increment(("WH-01", "A"), "quantity", -6, minimum=0) is None
+    assert inventory.get(("WH-01", "A"))["quantity"] == 5
+
+
+def test_cached_finds_are_bounded_and_expire(store, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(repositories.time, "monotonic", lambda: clock[0])
+    cached = CachedRepository(store, max_entries=2, ttl=2)
+    for warehouse_id in ("WH-01", "WH-02", "WH-03", "WH-04"):
+        cached.find({"warehouse_id": warehouse_id})
+    assert len(cached._finds) == 2
+    clock[0] += 3
+    cached.find({"warehouse_id": "WH-04"})
+    assert list(cached._finds) == [frozenset({("warehouse_id", "WH-03")}), frozenset({("warehouse_id", "WH-04")})]
+    cached.find({"warehouse_id": "WH-03"})  # Expired: dropped on lookup, then cached again.
+    assert cached.misses == 6
@@ -0,0 +1,75 @@
+import mongomock
+import pytest
+
+from services import reservations
+from services.reservations import InsufficientStock
+
+
+@pytest.fixture
+def inventory():
+    collection = mongomock.MongoClient().db.inventory
+    collection.insert_many([
+        {"sku": "A", "warehouse_id": "WH-01", "quantity": 5},
+        {"sku": "A", "warehouse_id": "WH-02", "quantity": 50},
+        {"sku": "B", "warehouse_id": "WH-01", "quantity": 3},
+    ])
+    return collection
+
+
+def stock(inventory, sku, warehouse_id="WH-01"):
+    return inventory.find_one({"sku": sku, "warehouse_id": warehouse_id})["quantity"]
+
+
+def line(sku, quantity, warehouse_id="WH-01"):
+    return {"product_id": sku, "quantity": quantity, "warehouse_id": warehouse_id}
+
+
+def test_take_never_goes_below_zero(inventory):
+    assert reservations.take(inventory, ("A", "WH-01"), 5)["quantity"] == 0
+    assert reservations.take(inventory, ("A", "WH-01"), 1) is None
+    assert stock(inventory, "A") == 0
+
+
+def test_reserve_all_sums_lines_per_item(inventory):
+    docs = reservations.reserve_all(inventory, [line("A", 2), line("A", 3), line("B", 1)])
+    assert {key: doc["quantity"] for key, doc in docs.items()} == {("A", "WH-01"): 0, ("B", "WH-01"): 2}
+    assert stock(inventory, "A", "WH-02") == 50
+
+
+def test_reserve_all_gives_back_when_a_later_item_is_short(inventory):
+    with pytest.raises(InsufficientStock) as error:
+        reservations.reserve_all(inventory, [line("A", 2), line("B", 4)])
+    assert (error.value.sku, error.value.requested, error.value.available) == ("B", 4, 3)
+    assert stock(inventory, "A") == 5
+    assert stock(inventory, "B") == 3
+
+
+def test_reserve_all_reports_unknown_skus(inventory):
+    with pytest.raises(InsufficientStock) as error:
+        reservations.reserve_all(inventory, [line("Z", 1)])
+    assert error.value.available is None
+
+
+def test_reserve_all_rejects_non_positive_quantities(inventory):
+    with pytest.raises(ValueError):
+        reservations.reserve_all(inventory, [line("A", 0)])
+    assert stock(inventory, "A") == 5
+
+
+def test_reserve_each_accepts_what_fits_in_input_order(inventory):
+    lines = [line("A", 3), line("A", 3), line("A", 2), line("B", 1), line("Z", 1)]
+    accepted, rejected, docs = reservations.reserve_each(inventory, lines)
+    assert accepted == [0, 2, 3]
+    assert sorted(rejected) == [1, 4]
+    assert rejected[1].available == 0
+    assert rejected[4].available is None
+    assert stock(inventory, "A") == 0
+    assert stock(inventory, "B") == 2
+    assert docs[("B", "WH-01")]["quantity"] == 2
+
+
+def test_give_back_returns_units_to_the_right_warehouse(inventory):
+    reservations.reserve_all(inventory, [line("A", 4, "WH-02")])
+    reservations.give_back(inventory, reservations.demand([line("A", 4, "WH-02")]))
+    assert stock(inventory, "A", "WH-02") == 50
+    assert stock(inventory, "A") == 5
@@ -0,0 +1,20 @@
+import datetime
+
+from services.rollups import order_day
+
+
+def test_order_day_converts_aware_datetimes_to_utc():
+    eastern = datetime.timezone(datetime.timedelta(hours=-5))
+    assert order_day(datetime.datetime(2024, 3, 1, 23, 30, tzinfo=eastern)) == "2024-03-02"
+
+
+def test_order_day_parses_iso_strings_with_offsets():
+    assert order_day("2024-03-01T23:30:00-05:00") == "2024-03-02"
+    assert order_day("2024-03-01T23:30:00") == "2024-03-01"
+    assert order_day("2024-03-01") == "2024-03-01"
+
+
+def test_order_day_keeps_naive_datetimes_and_unparseable_values():
+    assert order_day(datetime.datetime(2024, 3, 1, 23, 59)) == "2024-03-01"
+    assert order_day(None) == ""
+    assert order_day("03/01/2024 10:00") == "03/01/2024"
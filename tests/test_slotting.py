@@ -0,0 +1,40 @@
+import pandas as pd
+
+from services import slotting
+
+VELOCITY_COLUMNS = ["warehouse_id", "sku", "picks", "units"]
+INVENTORY_COLUMNS = ["warehouse_id", "sku", "bin_location"]
+
+
+def inventory(*rows):
+    return pd.DataFrame([dict(zip(INVENTORY_COLUMNS, row)) for row in rows], columns=INVENTORY_COLUMNS)
+
+
+def velocity(*rows):
+    return pd.DataFrame([dict(zip(VELOCITY_COLUMNS, row)) for row in rows], columns=VELOCITY_COLUMNS)
+
+
+def test_fast_movers_take_the_closest_bins():
+    proposal = slotting.propose_slotting(
+        inventory(("WH-01", "FAST", "J9"), ("WH-01", "SLOW", "A1")), velocity(("WH-01", "FAST", 10, 12)))
+    summary = slotting.summarize(proposal)
+    assert summary["moves"] == 2
+    assert summary["top_moves"][0]["sku"] == "FAST"
+    assert summary["top_moves"][0]["proposed_bin"] == "A1"
+    assert summary["class_counts"] == {"A": 1, "C": 1}
+
+
+def test_no_orders_in_the_window_proposes_no_moves():
+    proposal = slotting.propose_slotting(inventory(("WH-01", "A", "J9"), ("WH-01", "B", "A1")), velocity())
+    summary = slotting.summarize(proposal)
+    assert summary["skus"] == 2
+    assert summary["moves"] == 0
+    assert summary["top_moves"] == []
+    assert summary["class_counts"] == {"C": 2}
+
+
+def test_empty_inventory_proposes_nothing():
+    for picked in (velocity(), velocity(("WH-01", "A", 3, 3))):
+        summary = slotting.summarize(slotting.propose_slotting(inventory(), picked))
+        assert summary["skus"] == 0
+        assert summary["top_moves"] == []
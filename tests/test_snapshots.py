@@ -0,0 +1,82 @@
+import time
+
+import mongomock
+
+from services import leases
+from services.snapshots import SnapshotStore
+
+
+class Counter:
+    def __init__(self, name="a"):
+        self.name = name
+        self.builds = 0
+
+    def __call__(self, warehouse_id):
+        self.builds += 1
+        return {"warehouse_id": warehouse_id, "build": f"{self.name}{self.builds}"}
+
+
+def stores():
+    db = mongomock.MongoClient().db
+    builders = [Counter("a"), Counter("b")]
+    workers = [SnapshotStore({"orders": builder}) for builder in builders]
+    for owner, store in zip("ab", workers):
+        store.bind(db.snapshots, leases.Lease(db, "snapshot-refresh", 60, owner=owner))
+    return db, builders, workers
+
+
+def test_only_the_lease_holder_rebuilds_shared_snapshots():
+    db, (leader_builds, follower_builds), (leader, follower) = stores()
+    leader.refresh()  # Takes the lease.
+    assert follower.get("orders", "WH-01")["data"]["build"] == "b1"
+
+    follower.refresh()
+    leader.refresh()
+    assert follower_builds.builds == 1
+    assert leader_builds.builds == 1
+    # The follower picks up the leader's rebuild on its next refresh.
+    follower.refresh()
+    assert follower.get("orders", "WH-01")["data"]["build"] == "a1"
+    assert db.snapshots.count_documents({}) == 1
+
+
+def test_snapshots_stored_by_another_worker_are_not_rebuilt_on_first_request():
+    _, (leader_builds, follower_builds), (leader, follower) = stores()
+    leader.get("orders")
+    assert follower.get("orders")["data"] == {"warehouse_id": None, "build": "a1"}
+    assert follower_builds.builds == 0
+
+
+def test_unbound_store_builds_its_own_snapshots():
+    builder = Counter()
+    store = SnapshotStore({"orders": builder})
+    store.get("orders")
+    store.refresh()
+    assert store.get("orders")["data"]["build"] == "a2"
+
+
+def test_refresh_errors_do_not_stop_the_builder_thread():
+    db = mongomock.MongoClient().db
+    builder = Counter()
+    store = SnapshotStore({"orders": builder}, interval=0.01)
+    store.bind(db.snapshots)
+    store.get("orders")
+    calls = []
+    refresh = store.refresh
+
+    def failing_refresh():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        refresh()
+
+    store.refresh = failing_refresh
+    store.start()
+    try:
+        for _ in range(500):
+            if builder.builds >= 2:
+                break
+            time.sleep(0.01)
+    finally:
+        store.stop()
+    assert builder.builds >= 2
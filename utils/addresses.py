@@ -0,0 +1,97 @@
+"""
+Streaming address parsing for the Route Optimizer.
+
+Uploads are decoded and split incrementally (CSV rows or text lines, with any
+newline convention), so a large manifest never exists as one big string, list
+of lines and DataFrame at the same time. Addresses are normalized and
+deduplicated as they stream in, and the caller gets progress callbacks.
+"""
+import csv
+import io
+import re
+
+PROGRESS_EVERY = 5000  # lines between progress callbacks
+
+_WHITESPACE = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([,;])")
+_KEY_PUNCT = re.compile(r"[.,;#]")
+
+
+def normalize_address(raw):
+    """Cleans one address for display: trims quotes, separators and repeated whitespace."""
+    address = _WHITESPACE.sub(" ", raw).strip().strip("\"'").strip(" ,;")
+    return _SPACE_BEFORE_PUNCT.sub(r"\1", address)
+
+
+def address_key(address):
+    """Dedupe key: case and punctuation differences do not make a new stop."""
+    return _WHITESPACE.sub(" ", _KEY_PUNCT.sub(" ", address.casefold())).strip()
+
+
+class AddressCollector:
+    """Keeps the first spelling of each distinct address, in input order."""
+
+    def __init__(self):
+        self.addresses = []
+        self.lines = 0
+        self.blank = 0
+        self.duplicates = 0
+        self._seen = set()
+
+    def add(self, raw):
+        self.lines += 1
+        address = normalize_address(raw)
+        if not address:
+            self.blank += 1
+            return
+        key = address_key(address)
+        if key in self._seen:
+            self.duplicates += 1
+            return
+        self._seen.add(key)
+        self.addresses.append(address)
+
+
+def _looks_like_header(cell):
+    return cell.strip().casefold() in {"address", "addresses", "delivery_address", "delivery address", "stop"}
+
+
+def parse_addresses(binary, is_csv=False, on_progress=None):
+    """
+    Parses an uploaded file object (bytes) into an AddressCollector. For CSV
+    the first column holds the address and a header row is skipped.
+    on_progress(fraction, collector) is called every PROGRESS_EVERY lines.
+    """
+    size = binary.seek(0, io.SEEK_END) or 1
+    binary.seek(0)
+    # utf-8-sig drops a BOM; undecodable bytes are replaced rather than failing the upload.
+    # newline="" lets csv handle quoted line breaks; plain lines accept \n, \r\n and \r.
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", errors="replace", newline="")
+    rows = (row[0] if row else "" for row in csv.reader(text)) if is_csv else text
+    collector = AddressCollector()
+    try:
+        for index, value in enumerate(rows):
+            if index == 0 and is_csv and _looks_like_header(value):
+                continue
+            collector.add(value)
+            if on_progress and collector.lines % PROGRESS_EVERY == 0:
+                on_progress(min(binary.tell() / size, 1.0), collector)
+    finally:
+        # Detach so the wrapper does not close the caller's file object.
+        text.detach()
+    if on_progress:
+        on_progress(1.0, collector)
+    return collector
+
+
+def parse_text(text):
+    """Collector for addresses typed one per line."""
+    collector = AddressCollector()
+    for line in text.splitlines():
+        collector.add(line)
+    return collector
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -1,9 +1,19 @@
 import requests
 import streamlit as st
+from urllib.parse import urlencode
 
 # API Configuration
 API_BASE = "http://localhost:8000/api"
 
+def with_params(endpoint, **params):
+    """
+    Appends the non-empty params to an endpoint as a query string.
+    """
+    query = urlencode({k: v for k, v in params.items() if v not in (None, "")})
+    if not query:
+        return endpoint
+    return f"{endpoint}{'&' if '?' in endpoint else '?'}{query}"
+
 def get_data(endpoint):
     """
     Gets data from a protected endpoint.
@@ -73,4 +83,9 @@ def delete_data(endpoint):
         return False, detail
     except requests.exceptions.RequestException as e:
         return False, f"Connection error: {e}"
-    
\ No newline at end of file
+    
+def get_snapshot(page, warehouse_id=None):
+    """
+    Gets the backend's precomputed snapshot (KPIs and aggregates) for a dashboard page.
+    """
+    return get_data(with_params(f"snapshots/{page}", warehouse_id=warehouse_id))
@@ -0,0 +1,106 @@
+"""
+Render cache for dashboard charts.
+
+Charts are drawn on standalone matplotlib Figures (not registered with pyplot,
+so nothing accumulates across Streamlit reruns), saved to PNG/SVG bytes and
+kept in a process-wide LRU keyed by a hash of the aggregated data and the chart
+parameters. Identical charts are rendered once and served from memory for every
+session; the cache evicts least recently used images beyond a byte budget.
+"""
+import collections
+import hashlib
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ChartCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._images:
+                self.size -= len(self._images.pop(key))
+            self._images[key] = image
+            self.size += len(image)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.size = 0
+
+
+CHART_CACHE = ChartCache()
+
+
+def _update_hash(digest, value):
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        digest.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+        labels = value.columns if isinstance(value, pd.DataFrame) else [getattr(value, "name", None)]
+        digest.update(repr(list(labels)).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"{value.dtype}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for k in sorted(value, key=repr):
+            digest.update(repr(k).encode())
+            _update_hash(digest, value[k])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_hash(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def chart_key(kind, data, params):
+    """Stable hash of the chart kind, its aggregated input data and parameters."""
+    digest = hashlib.sha1(kind.encode())
+    _update_hash(digest, data)
+    _update_hash(digest, params)
+    return digest.hexdigest()
+
+
+def render_chart(kind, data, draw, fmt="png", figsize=(10, 6), cache=CHART_CACHE, **params):
+    """
+    Returns the chart as image bytes, drawing it with draw(fig, data, **params)
+    only when no identical chart is cached.
+    """
+    key = chart_key(kind, data, dict(params, fmt=fmt, figsize=figsize))
+    image = cache.get(key)
+    if image is not None:
+        return image
+    fig = Figure(figsize=figsize)
+    try:
+        draw(fig, data, **params)
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt, bbox_inches="tight")
+    finally:
+        fig.clear()
+    image = buf.getvalue()
+    cache.put(key, image)
+    return image
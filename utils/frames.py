@@ -0,0 +1,86 @@
+"""
+Schema-driven DataFrame construction for the dashboard tabs.
+
+API records arrive as lists of dicts. Building frames from them with default
+dtypes keeps every repeated label (status, region, category, ...) as its own
+Python string and every number as 64 bits. build_frame applies a per-collection
+schema instead: low-cardinality labels become categoricals, integers and floats
+are downcast, and ISO dates are parsed once.
+
+Tabs fetch frames through st.cache_data so a frame is built once per TTL and
+reused by every section of the page; register_frame records what the current
+session holds so the sidebar can report it.
+"""
+import pandas as pd
+import streamlit as st
+
+# column -> kind; columns not listed keep the dtype pandas infers.
+SCHEMAS = {
+    "orders": {
+        "status": "category", "product_id": "category", "warehouse_id": "category",
+        "quantity": "int", "order_date": "datetime",
+    },
+    "inventory": {
+        "category": "category", "bin_location": "category", "warehouse_id": "category",
+        "quantity": "int", "min_stock_level": "int", "shortfall": "int",
+    },
+    "deliveries": {
+        "status": "category", "region": "category", "agent_id": "category", "warehouse_id": "category",
+        "latitude": "float", "longitude": "float", "last_latitude": "float", "last_longitude": "float",
+        "delivery_date": "datetime", "eta": "datetime",
+    },
+}
+
+
+def _convert(series, kind):
+    if kind == "category":
+        return series.astype("category")
+    if kind == "int":
+        numbers = pd.to_numeric(series, errors="coerce")
+        if numbers.isna().any():
+            return numbers.astype("Int32")
+        return pd.to_numeric(numbers.astype("int64"), downcast="integer")
+    if kind == "float":
+        # float32 keeps coordinates to about a metre, plenty for maps and KPIs.
+        return pd.to_numeric(series, errors="coerce").astype("float32")
+    if kind == "datetime":
+        return pd.to_datetime(series, errors="coerce", format="ISO8601")
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def build_frame(records, schema):
+    """DataFrame from API records with the named schema's dtypes applied."""
+    df = pd.DataFrame(records or [])
+    for column, kind in SCHEMAS[schema].items():
+        if column in df.columns:
+            df[column] = _convert(df[column], kind)
+    return df
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} GB"
+
+
+def register_frame(name, df):
+    """Records the memory of a frame the current render holds."""
+    st.session_state.setdefault("frame_memory", {})[name] = frame_bytes(df)
+    return df
+
+
+def memory_report():
+    """Sidebar summary of the frames registered by this session."""
+    usage = st.session_state.get("frame_memory", {})
+    if not usage:
+        return
+    st.markdown("### Session Memory")
+    st.caption(f"{_format_bytes(sum(usage.values()))} in {len(usage)} frames")
+    for name, size in sorted(usage.items(), key=lambda item: -item[1]):
+        st.caption(f"{name}: {_format_bytes(size)}")
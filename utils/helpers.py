@@ -6,8 +6,10 @@ import matplotlib.colors as mcolors
 import datetime
 import folium
 from streamlit_folium import folium_static
-import io
 import base64
+import collections
+import threading
+from utils.charts import render_chart
 
 def display_kpi_metrics(kpi_data):
     """Display KPI metrics in a row of 3-4 metric cards"""
@@ -45,38 +47,48 @@ def display_custom_metrics(metrics_data):
         </div>
         """, unsafe_allow_html=True)
 
-def plot_category_pie_chart(data, title="Category Distribution", custom_colors=None):
-    """Generate pie chart for category distribution"""
-    fig, ax = plt.subplots(figsize=(10, 6))
-    
-    categories = data['category'].value_counts()
-    
+def _draw_category_pie(fig, categories, title="Category Distribution", custom_colors=None):
+    ax = fig.subplots()
+
     # Use custom colors if provided
     if custom_colors and len(custom_colors) >= len(categories):
         colors = custom_colors[:len(categories)]
     else:
         colors = plt.cm.tab20.colors[:len(categories)]
-    
-    ax.pie(categories.values, labels=categories.index, autopct='%1.1f%%', 
+
+    ax.pie(categories.values, labels=categories.index, autopct='%1.1f%%',
            shadow=True, startangle=90, colors=colors)
     ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-    
-    plt.title(title)
-    return fig
+    ax.set_title(title)
 
-def plot_bar_chart(data, x_col, y_col, title="", xlabel="", ylabel=""):
-    """Generate bar chart from DataFrame columns"""
-    fig, ax = plt.subplots(figsize=(10, 6))
-    
+def _draw_bar_chart(fig, data, x_col, y_col, title="", xlabel="", ylabel=""):
+    ax = fig.subplots()
     data.plot(kind='bar', x=x_col, y=y_col, ax=ax, color='#0071ce')
-    
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    return fig
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+def plot_category_pie_chart(data, title="Category Distribution", custom_colors=None):
+    """Pie chart of category distribution as PNG bytes for st.image, drawn on a standalone Figure and cached"""
+    return category_pie_chart_image(data, title, custom_colors)
+
+def plot_bar_chart(data, x_col, y_col, title="", xlabel="", ylabel=""):
+    """Bar chart from DataFrame columns as PNG bytes for st.image, drawn on a standalone Figure and cached"""
+    return bar_chart_image(data, x_col, y_col, title, xlabel, ylabel)
+
+def category_pie_chart_image(data, title="Category Distribution", custom_colors=None, fmt="png"):
+    """Render the category pie chart to image bytes, reusing cached renders of identical data.
+    data is a DataFrame with a 'category' column or a Series of counts per category"""
+    counts = data if isinstance(data, pd.Series) else data['category'].value_counts()
+    return render_chart("category_pie", counts, _draw_category_pie,
+                        fmt=fmt, title=title, custom_colors=custom_colors)
+
+def bar_chart_image(data, x_col, y_col, title="", xlabel="", ylabel="", fmt="png"):
+    """Render a bar chart to image bytes, reusing cached renders of identical data"""
+    return render_chart("bar", data[[x_col, y_col]], _draw_bar_chart, fmt=fmt,
+                        x_col=x_col, y_col=y_col, title=title, xlabel=xlabel, ylabel=ylabel)
 
 def format_date(date_str):
     """Format date string to YYYY-MM-DD format"""
@@ -95,6 +107,11 @@ def format_date(date_str):
     except:
         return str(date_str)
 
+def snapshot_caption(snapshot):
+    """Show when the backend built a dashboard snapshot and its version stamp"""
+    built_at = str(snapshot.get('built_at', ''))[:19].replace('T', ' ')
+    st.caption(f"Precomputed at {built_at} UTC · version {snapshot.get('version', '?')}")
+
 def format_currency(value):
     """Format value as currency"""
     if value is None:
@@ -170,30 +187,133 @@ def get_color_for_value(value, min_val, max_val, palette='viridis'):
     cmap = plt.get_cmap(palette)
     return mcolors.rgb2hex(cmap(norm_value))
 
-def filter_dataframe(df, filters):
-    """Filter a DataFrame based on a dictionary of filters"""
-    filtered_df = df.copy()
-    
+# Boolean masks per (cache_key, column, value), reused across reruns when the
+# caller passes a cache_key identifying the data (e.g. a snapshot version).
+# Shared by every Streamlit session thread, so guarded by a lock and bounded by bytes.
+_MASK_CACHE = collections.OrderedDict()
+_MASK_CACHE_BYTES = 64 * 1024 * 1024
+_mask_cache_bytes = 0
+_mask_cache_lock = threading.Lock()
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+def _column_mask(series, value):
+    """Boolean mask for one filter, or None when the filter does not apply."""
+    if isinstance(value, list):
+        if not value:  # Only apply if list is not empty
+            return None
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Evaluate once per category, then index by the integer codes.
+            return _categorical_mask(series, series.cat.categories.isin(value))
+        return series.isin(value).to_numpy(dtype=bool, na_value=False)
+    if isinstance(value, tuple) and len(value) == 2:
+        # Range filter for dates or numbers
+        start, end = value
+        if not (start and end):
+            return None
+        return ((series >= start) & (series <= end)).to_numpy(dtype=bool, na_value=False)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if categories.dtype == 'object' or isinstance(categories.dtype, pd.StringDtype):
+            lut = categories.str.contains(str(value), case=False, na=False)
+        else:
+            lut = categories == value
+        return _categorical_mask(series, np.asarray(lut, dtype=bool))
+    # Exact match or string contains
+    if isinstance(series.dtype, pd.StringDtype) or series.dtype == 'object':
+        return series.str.contains(str(value), case=False, na=False).to_numpy(dtype=bool)
+    return (series == value).to_numpy(dtype=bool, na_value=False)
+
+def _categorical_mask(series, category_mask):
+    codes = series.cat.codes.to_numpy()
+    # Append False so missing values (code -1) index into it.
+    lut = np.append(np.asarray(category_mask, dtype=bool), False)
+    return lut[codes]
+
+def _is_text_filter(series, value):
+    return not isinstance(value, (list, tuple)) and (
+        isinstance(series.dtype, pd.StringDtype) or series.dtype == 'object')
+
+def _cache_key(cache_key, df, column, value):
+    if cache_key is None:
+        return None
+    key = (cache_key, len(df), column, _freeze(value))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _cached_mask(key):
+    if key is None:
+        return None
+    with _mask_cache_lock:
+        mask = _MASK_CACHE.get(key)
+        if mask is not None:
+            _MASK_CACHE.move_to_end(key)
+        return mask
+
+def _store_mask(key, mask):
+    global _mask_cache_bytes
+    if key is None or mask is None or mask.nbytes > _MASK_CACHE_BYTES:
+        return mask
+    # Cached masks are shared and combined with `&` into new arrays; never modify them in place.
+    mask.setflags(write=False)
+    with _mask_cache_lock:
+        previous = _MASK_CACHE.pop(key, None)
+        if previous is not None:
+            _mask_cache_bytes -= previous.nbytes
+        _MASK_CACHE[key] = mask
+        _mask_cache_bytes += mask.nbytes
+        while _mask_cache_bytes > _MASK_CACHE_BYTES:
+            _, evicted = _MASK_CACHE.popitem(last=False)
+            _mask_cache_bytes -= evicted.nbytes
+    return mask
+
+def filter_dataframe(df, filters, cache_key=None):
+    """
+    Filter a DataFrame based on a dictionary of filters.
+
+    All predicates are combined into one boolean mask and the frame is indexed
+    once. The result is always a new frame, also when no filter applies.
+    Pass a cache_key identifying the data (not just the query) to reuse masks
+    across reruns.
+    """
+    mask = None
+    text_filters = []
     for column, value in filters.items():
-        if column in filtered_df.columns:
-            if value is not None:
-                if isinstance(value, list):
-                    if value:  # Only apply if list is not empty
-                        filtered_df = filtered_df[filtered_df[column].isin(value)]
-                elif isinstance(value, tuple) and len(value) == 2:
-                    # Range filter for dates or numbers
-                    start, end = value
-                    if start and end:
-                        filtered_df = filtered_df[(filtered_df[column] >= start) & 
-                                                (filtered_df[column] <= end)]
-                else:
-                    # Exact match or string contains
-                    if isinstance(filtered_df[column].dtype, pd.StringDtype) or filtered_df[column].dtype == 'object':
-                        filtered_df = filtered_df[filtered_df[column].str.contains(str(value), case=False, na=False)]
-                    else:
-                        filtered_df = filtered_df[filtered_df[column] == value]
-    
-    return filtered_df
+        if column not in df.columns or value is None:
+            continue
+        if _is_text_filter(df[column], value):
+            text_filters.append((column, value))
+            continue
+        key = _cache_key(cache_key, df, column, value)
+        column_mask = _cached_mask(key)
+        if column_mask is None:
+            column_mask = _store_mask(key, _column_mask(df[column], value))
+        if column_mask is not None:
+            mask = column_mask if mask is None else mask & column_mask
+
+    # Substring matching is the most expensive predicate, so unless a cached
+    # mask exists it only runs on the rows that passed the other filters.
+    for column, value in text_filters:
+        key = _cache_key(cache_key, df, column, value)
+        column_mask = _cached_mask(key)
+        if column_mask is None and mask is None:
+            column_mask = _store_mask(key, _column_mask(df[column], value))
+        if column_mask is not None:
+            mask = column_mask if mask is None else mask & column_mask
+        else:
+            rows = np.flatnonzero(mask)
+            matches = _column_mask(df[column].iloc[rows], value)
+            mask = np.zeros(len(df), dtype=bool)
+            mask[rows[matches]] = True
+
+    if mask is None:
+        # Shallow copy: with copy-on-write it behaves like df[mask] without copying the data.
+        return df.copy(deep=False)
+    return df[mask]
 
 def optimize_route(addresses):
     """Simulated route optimization function"""